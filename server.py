@@ -13,6 +13,7 @@ import sys
 
 from pathlib import Path
 import http.server
+import socket
 import socketserver
 import json
 import urllib.parse
@@ -23,24 +24,66 @@ import signal
 import subprocess
 
 from urllib.parse import quote
-from typing import Dict, Any, Optional, Tuple, List
+from typing import Dict, Any, Optional, Tuple, List, Callable
 import hashlib
+import hmac
+import fcntl
 import logging
+import logging.handlers
+import atexit
+import re
+import shutil
+import sqlite3
+import zipfile
 import time
 
 from datetime import datetime
 import threading
+import contextvars
 
 from queue import Queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
 class ThreadingHTTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     daemon_threads = True
     allow_reuse_address = True
+
+    def server_bind(self) -> None:
+        # Im Worker-Modus nehmen mehrere Prozesse auf demselben Port an, der Kernel verteilt die Verbindungen
+        if STRIMDL_WORKERS > 1:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+        super().server_bind()
 APP_ROOT = Path(__file__).resolve().parent
 HOSTNAME = '0.0.0.0'
-PORT = 10001
+PORT_RAW = os.environ.get('STRIMDL_PORT', '10001').strip()
+PORT = int(PORT_RAW) if PORT_RAW.isdigit() else 10001
+STRIMDL_WORKERS_RAW = os.environ.get('STRIMDL_WORKERS', '1').strip()
+STRIMDL_WORKERS = int(STRIMDL_WORKERS_RAW) if STRIMDL_WORKERS_RAW.isdigit() and int(STRIMDL_WORKERS_RAW) > 0 else 1
+# Wird vom Supervisor an seine Worker-Prozesse vergeben, nicht zum Setzen von Hand gedacht
+STRIMDL_WORKER_INDEX = os.environ.get('STRIMDL_WORKER_INDEX', '').strip()
+
+IS_WORKER_SUPERVISOR = STRIMDL_WORKERS > 1 and not STRIMDL_WORKER_INDEX
+SHARED_SESSION_POLL_SECONDS = 0.1
+WORKER_STABLE_SECONDS = 10
+WORKER_BACKOFF_MAX_SECONDS = 60
 APP_VERSION = '3.0.5'
 VIDEO_NAMING_PATTERN = os.environ.get('VIDEO_NAMING_PATTERN', '{userId}@twitter-{tweetId}')
 
+IMAGE_NAMING_PATTERN = os.environ.get('IMAGE_NAMING_PATTERN', '{userId}@twitter-{tweetId}')
+
+X_MEDIA_WORKERS_RAW = os.environ.get('X_MEDIA_WORKERS', '4').strip()
+X_MEDIA_WORKERS = int(X_MEDIA_WORKERS_RAW) if X_MEDIA_WORKERS_RAW.isdigit() and int(X_MEDIA_WORKERS_RAW) > 0 else 4
+X_SYNDICATION_URL = 'https://cdn.syndication.twimg.com/tweet-result'
+X_MEDIA_CONTENT_TYPES = {
+    '.mp4': 'video/mp4',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+}
+
 YTDLP_COOKIES_PATH = os.environ.get('YTDLP_COOKIES_PATH', '').strip()
 
 YTDLP_UPDATE_ON_START = os.environ.get('YTDLP_UPDATE_ON_START', 'true').strip().lower() in ('1', 'true', 'yes', 'on')
@@ -57,9 +100,147 @@ FFMPEG_VIDEO_CRF = os.environ.get('FFMPEG_VIDEO_CRF', '24').strip() or '24'
 FFMPEG_MAX_HEIGHT_RAW = os.environ.get('FFMPEG_MAX_HEIGHT', '1440').strip()
 
 FFMPEG_MAX_HEIGHT = int(FFMPEG_MAX_HEIGHT_RAW) if FFMPEG_MAX_HEIGHT_RAW.isdigit() and int(FFMPEG_MAX_HEIGHT_RAW) > 0 else None
-CACHE_DIR = Path(APP_ROOT / 'cache')
-
-CACHE_DIR.mkdir(exist_ok=True)
+ENCODE_PROFILES: Dict[str, Dict[str, Any]] = {
+    'balanced': {'preset': FFMPEG_VIDEO_PRESET, 'crf': FFMPEG_VIDEO_CRF, 'max_height': FFMPEG_MAX_HEIGHT, 'audio_bitrate': 128, 'mp3_quality': '0'},
+    'fast-small': {'preset': 'veryfast', 'crf': '30', 'max_height': 720, 'audio_bitrate': 96, 'mp3_quality': '5'},
+    'archive': {'preset': 'slow', 'crf': '18', 'max_height': None, 'audio_bitrate': 192, 'mp3_quality': '0'},
+}
+DEFAULT_ENCODE_PROFILE = 'balanced'
+TARGET_SIZE_HEADROOM = 0.95
+STRIMDL_PREFETCH = os.environ.get('STRIMDL_PREFETCH', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+
+STRIMDL_PREFETCH_IDLE_SECONDS_RAW = os.environ.get('STRIMDL_PREFETCH_IDLE_SECONDS', '300').strip()
+STRIMDL_PREFETCH_IDLE_SECONDS = int(STRIMDL_PREFETCH_IDLE_SECONDS_RAW) if STRIMDL_PREFETCH_IDLE_SECONDS_RAW.isdigit() else 300
+STRIMDL_DOWNLOAD_ACCELERATION = os.environ.get('STRIMDL_DOWNLOAD_ACCELERATION', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+
+YTDLP_CONCURRENT_FRAGMENTS_RAW = os.environ.get('YTDLP_CONCURRENT_FRAGMENTS', '4').strip()
+YTDLP_CONCURRENT_FRAGMENTS = int(YTDLP_CONCURRENT_FRAGMENTS_RAW) if YTDLP_CONCURRENT_FRAGMENTS_RAW.isdigit() and int(YTDLP_CONCURRENT_FRAGMENTS_RAW) > 0 else 4
+STRIMDL_BANDWIDTH_LIMIT_RAW = os.environ.get('STRIMDL_BANDWIDTH_LIMIT', '0').strip()
+
+STRIMDL_PIPELINE = os.environ.get('STRIMDL_PIPELINE', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+
+STRIMDL_PREVIEW = os.environ.get('STRIMDL_PREVIEW', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+STRIMDL_SAVE_DIR = os.environ.get('STRIMDL_SAVE_DIR', '/download').strip()
+
+FICLONE = 0x40049409
+
+PREVIEW_HEIGHT = 360
+PREVIEW_TTL_SECONDS = 600
+PREVIEW_NICE = 19
+PREVIEW_STALL_SECONDS = 5
+PREVIEW_MIN_ENCODE_SECONDS = 10.0
+CLIP_EXACT_PREROLL_SECONDS = 30.0
+
+PIPELINE_CHUNK_SIZE = 256 * 1024
+BANDWIDTH_TICK_SECONDS = 0.25
+BANDWIDTH_REPORT_SECONDS = 2.0
+BANDWIDTH_MIN_LIMIT = 16 * 1024
+BANDWIDTH_WAIT_SECONDS = 0.5
+DOWNLOAD_PART_PATTERN = re.compile(r'\.part(-Frag\d+)?$|\.f[0-9A-Za-z_-]+\.[A-Za-z0-9]+$')
+FFMPEG_NICE_RAW = os.environ.get('FFMPEG_NICE', '10').strip()
+FFMPEG_NICE = int(FFMPEG_NICE_RAW) if FFMPEG_NICE_RAW.isdigit() else 10
+FFMPEG_IONICE = os.environ.get('FFMPEG_IONICE', 'true').strip().lower() in ('1', 'true', 'yes', 'on')
+
+STRIMDL_RESERVED_CPUS_RAW = os.environ.get('STRIMDL_RESERVED_CPUS', '0').strip()
+STRIMDL_RESERVED_CPUS = int(STRIMDL_RESERVED_CPUS_RAW) if STRIMDL_RESERVED_CPUS_RAW.isdigit() else 0
+STRIMDL_ENCODE_SLOTS_RAW = os.environ.get('STRIMDL_ENCODE_SLOTS', '0').strip()
+STRIMDL_ENCODE_SLOTS = int(STRIMDL_ENCODE_SLOTS_RAW) if STRIMDL_ENCODE_SLOTS_RAW.isdigit() else 0
+STRIMDL_ENCODE_PREEMPT = os.environ.get('STRIMDL_ENCODE_PREEMPT', 'true').strip().lower() in ('1', 'true', 'yes', 'on')
+
+ENCODE_PREEMPT_RATIO = 4.0
+ENCODE_PREEMPT_MIN_SECONDS = 60.0
+ENCODE_AGING_SECONDS = 600.0
+ENCODE_REPORT_SECONDS = 2.0
+ENCODE_REALTIME_FACTORS = {'copy': 0.02, 'mp3': 0.05, 'h264': 0.5}
+STRIMDL_AUTOTUNE = os.environ.get('STRIMDL_AUTOTUNE', 'true').strip().lower() in ('1', 'true', 'yes', 'on')
+
+STRIMDL_AUTOTUNE_MIN_SPEED_RAW = os.environ.get('STRIMDL_AUTOTUNE_MIN_SPEED', '2.0').strip()
+STRIMDL_AUTOTUNE_MIN_SPEED = float(STRIMDL_AUTOTUNE_MIN_SPEED_RAW) if re.fullmatch(r'\d+(\.\d+)?', STRIMDL_AUTOTUNE_MIN_SPEED_RAW) else 2.0
+
+AUTOTUNE_PRESETS = ['ultrafast', 'superfast', 'veryfast', 'faster', 'fast', 'medium', 'slow']
+AUTOTUNE_HEIGHTS = [360, 480, 720, 1080, 1440, 2160]
+AUTOTUNE_CLIP_SECONDS = 4
+AUTOTUNE_FPS = 30
+AUTOTUNE_SOURCE_CODECS = {
+    'h264': ['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '16'],
+    'vp9': ['-c:v', 'libvpx-vp9', '-deadline', 'realtime', '-cpu-used', '8', '-b:v', '0', '-crf', '30'],
+}
+STRIMDL_SESSION_TTL_SECONDS_RAW = os.environ.get('STRIMDL_SESSION_TTL_SECONDS', '900').strip()
+STRIMDL_SESSION_TTL_SECONDS = int(STRIMDL_SESSION_TTL_SECONDS_RAW) if STRIMDL_SESSION_TTL_SECONDS_RAW.isdigit() and int(STRIMDL_SESSION_TTL_SECONDS_RAW) > 0 else 900
+STATUS_COMPLETE = 'Processing complete'
+STATUS_SAVED = 'Saved on server'
+STATUS_FAILED = 'Download failed'
+STATUS_CANCELLED = 'Download cancelled'
+# Nach diesen Meldungen beendet /status den Event-Stream
+TERMINAL_STATUSES = (STATUS_COMPLETE, STATUS_SAVED, STATUS_FAILED, STATUS_CANCELLED)
+STRIMDL_METADATA_WORKERS_RAW = os.environ.get('STRIMDL_METADATA_WORKERS', '4').strip()
+STRIMDL_METADATA_WORKERS = int(STRIMDL_METADATA_WORKERS_RAW) if STRIMDL_METADATA_WORKERS_RAW.isdigit() and int(STRIMDL_METADATA_WORKERS_RAW) > 0 else 4
+STRIMDL_METADATA_TIMEOUT_RAW = os.environ.get('STRIMDL_METADATA_TIMEOUT', '30').strip()
+STRIMDL_METADATA_TIMEOUT = int(STRIMDL_METADATA_TIMEOUT_RAW) if STRIMDL_METADATA_TIMEOUT_RAW.isdigit() and int(STRIMDL_METADATA_TIMEOUT_RAW) > 0 else 30
+STRIMDL_METADATA_CACHE_SECONDS_RAW = os.environ.get('STRIMDL_METADATA_CACHE_SECONDS', '3600').strip()
+STRIMDL_METADATA_CACHE_SECONDS = int(STRIMDL_METADATA_CACHE_SECONDS_RAW) if STRIMDL_METADATA_CACHE_SECONDS_RAW.isdigit() else 3600
+METADATA_CACHE_MAX_ENTRIES = 2000
+MEDIA_ID_CACHE_MAX_ENTRIES = 10000
+METADATA_BATCH_MAX_URLS = 200
+STRIMDL_TRACE = os.environ.get('STRIMDL_TRACE', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+STRIMDL_LOG_FORMAT = os.environ.get('STRIMDL_LOG_FORMAT', 'json').strip().lower()
+
+STRIMDL_LOG_PROGRESS_SECONDS_RAW = os.environ.get('STRIMDL_LOG_PROGRESS_SECONDS', '10').strip()
+STRIMDL_LOG_PROGRESS_SECONDS = int(STRIMDL_LOG_PROGRESS_SECONDS_RAW) if STRIMDL_LOG_PROGRESS_SECONDS_RAW.isdigit() else 10
+STRIMDL_MAX_JOBS_RAW = os.environ.get('STRIMDL_MAX_JOBS', '0').strip()
+STRIMDL_MAX_JOBS = int(STRIMDL_MAX_JOBS_RAW) if STRIMDL_MAX_JOBS_RAW.isdigit() else 0
+STRIMDL_MAX_LOAD_RAW = os.environ.get('STRIMDL_MAX_LOAD', '2.0').strip()
+STRIMDL_MAX_LOAD = float(STRIMDL_MAX_LOAD_RAW) if re.fullmatch(r'\d+(\.\d+)?', STRIMDL_MAX_LOAD_RAW) else 2.0
+STRIMDL_MIN_FREE_DISK_RAW = os.environ.get('STRIMDL_MIN_FREE_DISK', '1G').strip()
+
+STRIMDL_MIN_FREE_MEMORY_RAW = os.environ.get('STRIMDL_MIN_FREE_MEMORY', '256M').strip()
+
+STRIMDL_RETRY_AFTER_SECONDS_RAW = os.environ.get('STRIMDL_RETRY_AFTER_SECONDS', '15').strip()
+STRIMDL_RETRY_AFTER_SECONDS = int(STRIMDL_RETRY_AFTER_SECONDS_RAW) if STRIMDL_RETRY_AFTER_SECONDS_RAW.isdigit() and int(STRIMDL_RETRY_AFTER_SECONDS_RAW) > 0 else 15
+STRIMDL_DRAIN_SECONDS_RAW = os.environ.get('STRIMDL_DRAIN_SECONDS', '25').strip()
+STRIMDL_DRAIN_SECONDS = int(STRIMDL_DRAIN_SECONDS_RAW) if STRIMDL_DRAIN_SECONDS_RAW.isdigit() else 25
+DRAIN_INTERRUPT_SECONDS = 5
+
+STRIMDL_PEER_TOKEN = os.environ.get('STRIMDL_PEER_TOKEN', '').strip()
+
+# Ohne gemeinsames Token bleiben die /peer-Endpunkte gesperrt, Peer-Sharing ist dann aus
+STRIMDL_PEERS = [peer.strip().rstrip('/') for peer in os.environ.get('STRIMDL_PEERS', '').split(',') if peer.strip()] if STRIMDL_PEER_TOKEN else []
+
+STRIMDL_PEER_SELF_URL = os.environ.get('STRIMDL_PEER_SELF_URL', '').strip().rstrip('/')
+
+STRIMDL_CACHE_CONVERTED = os.environ.get('STRIMDL_CACHE_CONVERTED', 'false').strip().lower() in ('1', 'true', 'yes', 'on')
+
+PEER_RING_REPLICAS = 64
+PEER_CHUNK_SIZE = 1024 * 1024
+CACHE_DIR = Path(os.environ.get('STRIMDL_CACHE_DIR', '').strip() or APP_ROOT / 'cache')
+
+STRIMDL_RAM_CACHE_DIR = os.environ.get('STRIMDL_RAM_CACHE_DIR', '').strip()
+
+STRIMDL_RAM_CACHE_SIZE_RAW = os.environ.get('STRIMDL_RAM_CACHE_SIZE', '256M').strip()
+
+STRIMDL_RAM_CACHE_MAX_FILE_RAW = os.environ.get('STRIMDL_RAM_CACHE_MAX_FILE', '32M').strip()
+
+RAM_CACHE_PROMOTE_HITS = 2
+RAM_CACHE_MAX_TRACKED = 10000
+
+CACHE_CATALOG_PATH = CACHE_DIR / 'catalog.sqlite3'
+JOB_HISTORY_MAX_ROWS = 10000
+PREVIEW_DIR = CACHE_DIR / 'previews'
+STRIMDL_AUTOTUNE_PATH = Path(os.environ.get('STRIMDL_AUTOTUNE_PATH', '').strip() or CACHE_DIR / 'autotune.json')
+
+STRIMDL_TRACE_PATH = Path(os.environ.get('STRIMDL_TRACE_PATH', '').strip() or CACHE_DIR / 'traces.jsonl')
+TRACE_MAX_BYTES = 16 * 1024 ** 2
+CATALOG_FILE_SUFFIXES = ('.mp4', '.mp3', '.jpg', '.jpeg', '.png', '.webp', '.zip')
+PEER_FILE_PATTERN = re.compile(r'[0-9a-f]{32}[A-Za-z0-9_.+-]*\.(mp4|mp3|jpg|jpeg|png|webp|zip)')
+YOUTUBE_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{11}')
+CACHE_KEY_UNSAFE_PATTERN = re.compile(r'[^A-Za-z0-9_.+-]')
+
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+INFLIGHT_LOCK_DIR = CACHE_DIR / 'locks'
+
+if STRIMDL_WORKERS > 1:
+    INFLIGHT_LOCK_DIR.mkdir(exist_ok=True)
 
 INSTANCE_ID_FILE = CACHE_DIR / 'instance_id'
 def get_instance_id() -> str:
@@ -78,15 +259,99 @@ def get_instance_id() -> str:
         INSTANCE_ID_FILE.write_text(instance_id, encoding='utf-8')
 
     except Exception as e:
-        logger.warning(f"Could not persist update instance id: {e}")
+        logger.warning("Could not persist update instance id: %s", e)
 
     return instance_id
-download_status: Dict[str, Queue] = {}
-
-status_buffer: Dict[str, List[str]] = {}
-
-status_lock = threading.Lock()
-
+class Session:
+    """Zustand einer Download-Session: Status-Queue, Puffer, Prozesse und Abbruch-Flag"""
+    __slots__ = ('session_id', 'lock', 'queue', 'buffer', 'processes', 'cancelled', 'created_at', 'last_seen')
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.lock = threading.Lock()
+
+        self.queue: Optional[Queue] = None
+        self.buffer: List[str] = []
+        self.processes: List[subprocess.Popen] = []
+        self.cancelled = False
+        self.created_at = time.time()
+
+        self.last_seen = self.created_at
+
+    def is_idle(self) -> bool:
+        return self.queue is None and not self.buffer and not self.processes and not self.cancelled
+
+    def has_running_process(self) -> bool:
+        return any(process.poll() is None for process in self.processes)
+class SessionRegistry:
+    """Alle Sessions an einer Stelle; Sperren pro Session, abgelaufene Einträge räumt ein Sweeper weg"""
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.sessions: Dict[str, Session] = {}
+
+        self.lock = threading.Lock()
+
+        self.swept = 0
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self.lock:
+            return self.sessions.get(session_id)
+
+    def get_or_create(self, session_id: str) -> Session:
+        with self.lock:
+            session = self.sessions.get(session_id)
+
+            if session is None:
+                session = self.sessions[session_id] = Session(session_id)
+            session.last_seen = time.time()
+
+            return session
+
+    def discard_if_idle(self, session: Session) -> None:
+        with self.lock, session.lock:
+            if session.is_idle() and self.sessions.get(session.session_id) is session:
+                del self.sessions[session.session_id]
+
+    def sweep(self) -> int:
+        """Entfernt Sessions ohne laufenden Prozess, die länger als die TTL inaktiv waren"""
+        cutoff = time.time() - self.ttl_seconds
+        with self.lock:
+            candidates = [session for session in self.sessions.values() if session.last_seen < cutoff]
+
+        removed = 0
+        for session in candidates:
+            with self.lock, session.lock:
+                if session.last_seen < cutoff and not session.has_running_process() and self.sessions.get(session.session_id) is session:
+                    del self.sessions[session.session_id]
+
+                    removed += 1
+        self.swept += removed
+        return removed
+
+    def running_processes(self) -> List[subprocess.Popen]:
+        with self.lock:
+            sessions = list(self.sessions.values())
+
+        processes = []
+        for session in sessions:
+            with session.lock:
+                processes.extend(process for process in session.processes if process.poll() is None)
+
+        return processes
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            sessions = list(self.sessions.values())
+
+        return {
+            'live': len(sessions),
+            'with_subscriber': sum(1 for session in sessions if session.queue is not None),
+            'with_process': sum(1 for session in sessions if session.processes),
+            'cancelled': sum(1 for session in sessions if session.cancelled),
+            'swept_total': self.swept,
+            'ttl_seconds': self.ttl_seconds,
+        }
 update_status: Dict[str, Any] = {
     'ok': True,
     'status': 'unchecked',
@@ -98,514 +363,4237 @@ update_status: Dict[str, Any] = {
 update_status_checked_at = 0.0
 update_status_lock = threading.Lock()
 
-active_processes: Dict[str, subprocess.Popen] = {}
+session_registry = SessionRegistry(STRIMDL_SESSION_TTL_SECONDS)
+class SharedSessionStore:
+    """Session-Zustand für den Worker-Modus in einer gemeinsamen SQLite-Datei (WAL).
+
+    Status-Meldungen, Abbruch-Flags und die Prozessgruppen einer Session liegen hier statt im Speicher
+    eines Workers, damit jeder Worker /status und /cancel für jede Session bedienen kann. Ein Pump-Thread
+    pro Worker liest neue Meldungen und verteilt sie auf die lokalen SSE-Queues. worker_load hält pro
+    Worker die belegten Encode-Plätze, Jobs und Downloads, damit die Grenzwerte für alle Worker zusammen gelten.
+    """
+
+    def __init__(self, db_path: Path):
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None, timeout=5)
+
+        self.conn.execute('PRAGMA journal_mode=WAL')
+
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+
+        self.lock = threading.Lock()
+
+        self.pump_lock = threading.Lock()
+
+        with self.lock:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS session_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_session_events_session ON session_events(session_id, id);
+                CREATE TABLE IF NOT EXISTS session_state (
+                    session_id TEXT PRIMARY KEY,
+                    cancelled INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS session_processes (
+                    pid INTEGER PRIMARY KEY,
+                    session_id TEXT NOT NULL,
+                    worker_pid INTEGER NOT NULL,
+                    started_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS worker_load (
+                    worker_pid INTEGER NOT NULL,
+                    resource TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (worker_pid, resource)
+                );
+            """)
+
+            self.cursor = self.conn.execute('SELECT COALESCE(MAX(id), 0) FROM session_events').fetchone()[0]
+
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if not self.thread:
+            self.thread = threading.Thread(target=self.pump, daemon=True)
+
+            self.thread.start()
+
+    def execute(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Tuple[Any, ...]]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def publish(self, session_id: str, status: str) -> None:
+        self.execute('INSERT INTO session_events (session_id, status, created_at) VALUES (?, ?, ?)', (session_id, status, time.time()))
+
+    def subscribe(self, session: Session) -> Queue:
+        """Legt die lokale SSE-Queue an und füllt sie mit den letzten Meldungen, die der Pump schon verteilt hat"""
+        with self.pump_lock, session.lock:
+            if session.queue is None:
+                session.queue = Queue()
+
+                rows = self.execute(
+                    'SELECT status FROM session_events WHERE session_id = ? AND id <= ? ORDER BY id DESC LIMIT 10',
+                    (session.session_id, self.cursor)
+                )
 
-cancelled_sessions = set()
+                for (status,) in reversed(rows):
+                    session.queue.put(status)
 
-process_lock = threading.Lock()
+            return session.queue
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
+    def pump(self) -> None:
+        while True:
+            time.sleep(SHARED_SESSION_POLL_SECONDS)
 
-    ]
-)
+            try:
+                with self.pump_lock:
+                    rows = self.execute('SELECT id, session_id, status FROM session_events WHERE id > ? ORDER BY id', (self.cursor,))
 
-logger = logging.getLogger(__name__)
+                    for event_id, session_id, status in rows:
+                        session = session_registry.get(session_id)
 
-pipe_args = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
-class RequestHandler(http.server.SimpleHTTPRequestHandler):
-    def is_session_cancelled(self, session_id: Optional[str]) -> bool:
-        if not session_id:
-            return False
-        with process_lock:
-            return session_id in cancelled_sessions
-    def cancel_download_session(self, session_id: str) -> bool:
-        killed = False
-        with process_lock:
-            cancelled_sessions.add(session_id)
+                        if session:
+                            with session.lock:
+                                if session.queue is not None:
+                                    session.queue.put(status)
 
-            process = active_processes.get(session_id)
+                        self.cursor = event_id
+            except sqlite3.Error as e:
+                logger.warning("Shared session pump failed: %s", e)
 
-        if process and process.poll() is None:
-            try:
-                os.killpg(process.pid, signal.SIGTERM)
+    def set_cancelled(self, session_id: str, cancelled: bool) -> None:
+        self.execute(
+            'INSERT OR REPLACE INTO session_state (session_id, cancelled, updated_at) VALUES (?, ?, ?)',
+            (session_id, int(cancelled), time.time())
+        )
 
-                killed = True
-            except ProcessLookupError:
-                pass
-            except Exception as e:
-                logger.warning(f"Could not terminate process for session {session_id}: {e}")
+    def is_cancelled(self, session_id: str) -> bool:
+        rows = self.execute('SELECT cancelled FROM session_state WHERE session_id = ?', (session_id,))
 
-        self.send_status_update(session_id, "Download cancelled")
+        return bool(rows and rows[0][0])
 
-        return killed
-    def cleanup_download_session(self, session_id: Optional[str]) -> None:
-        if not session_id:
-            return
-        with process_lock:
-            active_processes.pop(session_id, None)
+    def add_process(self, session_id: str, pid: int) -> None:
+        self.execute(
+            'INSERT OR REPLACE INTO session_processes (pid, session_id, worker_pid, started_at) VALUES (?, ?, ?, ?)',
+            (pid, session_id, os.getpid(), time.time())
+        )
 
-            cancelled_sessions.discard(session_id)
+    def remove_process(self, pid: int) -> None:
+        self.execute('DELETE FROM session_processes WHERE pid = ? AND worker_pid = ?', (pid, os.getpid()))
 
-    def run_managed_command(
-        self,
-        cmd: List[str],
-        session_id: Optional[str] = None,
-        timeout: Optional[int] = None,
-        text: bool = False
-    ) -> subprocess.CompletedProcess:
-        if self.is_session_cancelled(session_id):
-            empty = '' if text else b''
-            return subprocess.CompletedProcess(cmd, -signal.SIGTERM, empty, 'Cancelled' if text else b'Cancelled')
+    def session_pids(self, session_id: str) -> List[int]:
+        return [pid for (pid,) in self.execute('SELECT pid FROM session_processes WHERE session_id = ?', (session_id,))]
 
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=text,
-            start_new_session=True
-        )
+    def clear(self, session_id: str) -> None:
+        self.execute('DELETE FROM session_state WHERE session_id = ?', (session_id,))
 
-        if session_id:
-            with process_lock:
-                active_processes[session_id] = process
+        self.execute('DELETE FROM session_processes WHERE session_id = ? AND worker_pid = ?', (session_id, os.getpid()))
+
+    @staticmethod
+    def worker_alive(worker_pid: int) -> bool:
+        if worker_pid == os.getpid():
+            return True
         try:
-            stdout, stderr = process.communicate(timeout=timeout)
+            os.kill(worker_pid, 0)
 
-        except subprocess.TimeoutExpired:
-            try:
-                os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
 
-                stdout, stderr = process.communicate(timeout=5)
+    def set_load(self, resource: str, count: int) -> None:
+        self.execute('INSERT OR REPLACE INTO worker_load (worker_pid, resource, count) VALUES (?, ?, ?)', (os.getpid(), resource, count))
+
+    def load(self, resource: str) -> int:
+        """Summe eines Zählers über alle laufenden Worker"""
+        rows = self.execute('SELECT worker_pid, count FROM worker_load WHERE resource = ?', (resource,))
+
+        return sum(count for worker_pid, count in rows if self.worker_alive(worker_pid))
+
+    def try_acquire(self, resource: str, limit: int, own_count: int) -> bool:
+        """Setzt den eigenen Zähler auf own_count + 1, wenn die Summe aller Worker dann limit nicht überschreitet"""
+        return self.reserve(resource, limit, own_count, 1, 1) > 0
+
+    def reserve(self, resource: str, limit: int, own_total: int, wanted: int, minimum: int) -> int:
+        """Reserviert bis zu wanted aus dem Rest von limit über alle Worker; 0, wenn weniger als minimum frei ist.
+
+        Prüfen und Erhöhen laufen in einer BEGIN-IMMEDIATE-Transaktion, damit zwei Worker nicht
+        gleichzeitig den letzten Platz bekommen.
+        """
+        with self.lock:
+            try:
+                self.conn.execute('BEGIN IMMEDIATE')
 
-            except Exception:
                 try:
-                    os.killpg(process.pid, signal.SIGKILL)
+                    rows = self.conn.execute('SELECT worker_pid, count FROM worker_load WHERE resource = ?', (resource,)).fetchall()
 
-                except Exception:
-                    pass
-                stdout, stderr = process.communicate()
+                    others = sum(count for worker_pid, count in rows if worker_pid != os.getpid() and self.worker_alive(worker_pid))
 
-            timeout_msg = 'Command timed out'
-            if text:
-                stderr = f"{stderr or ''}\n{timeout_msg}".strip()
+                    left = limit - others - own_total
+                    granted = min(wanted, left) if left >= minimum else 0
+                    if granted:
+                        self.conn.execute('INSERT OR REPLACE INTO worker_load (worker_pid, resource, count) VALUES (?, ?, ?)', (os.getpid(), resource, own_total + granted))
 
-            else:
-                stderr = (stderr or b'') + f"\n{timeout_msg}".encode()
+                    self.conn.execute('COMMIT')
 
-            return subprocess.CompletedProcess(cmd, 124, stdout, stderr)
+                except Exception:
+                    self.conn.execute('ROLLBACK')
 
-        finally:
-            if session_id:
-                with process_lock:
-                    if active_processes.get(session_id) is process:
-                        active_processes.pop(session_id, None)
+                    raise
+            except sqlite3.Error as e:
+                logger.warning("Shared %s limit unavailable, using the local count: %s", resource, e)
 
-        if self.is_session_cancelled(session_id) and process.returncode != 0:
-            if text:
-                stderr = f"{stderr or ''}\nCancelled".strip()
+                left = limit - own_total
+                return min(wanted, left) if left >= minimum else 0
+        return granted
 
-            else:
-                stderr = (stderr or b'') + b'\nCancelled'
-        return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+    def sweep(self, ttl_seconds: int) -> None:
+        """Löscht alte Meldungen sowie Prozess- und Last-Einträge abgestürzter Worker"""
+        cutoff = time.time() - ttl_seconds
+        self.execute('DELETE FROM session_events WHERE created_at < ?', (cutoff,))
 
-    def check_for_strimdl_update(self, force: bool = False) -> Dict[str, Any]:
-        global update_status_checked_at, update_status
-        now = time.time()
+        self.execute('DELETE FROM session_state WHERE updated_at < ?', (cutoff,))
 
-        with update_status_lock:
-            if not force and update_status_checked_at and now - update_status_checked_at < UPDATE_CHECK_INTERVAL_SECONDS:
-                cached = dict(update_status)
+        for (worker_pid,) in self.execute('SELECT DISTINCT worker_pid FROM session_processes UNION SELECT DISTINCT worker_pid FROM worker_load'):
+            if not self.worker_alive(worker_pid):
+                self.execute('DELETE FROM session_processes WHERE worker_pid = ?', (worker_pid,))
 
-                cached['cached'] = True
-                cached['next_check_seconds'] = max(0, int(UPDATE_CHECK_INTERVAL_SECONDS - (now - update_status_checked_at)))
+                self.execute('DELETE FROM worker_load WHERE worker_pid = ?', (worker_pid,))
+shared_sessions = SharedSessionStore(CACHE_DIR / 'sessions.sqlite3') if STRIMDL_WORKERS > 1 else None
 
-                return cached
-        request_id = str(uuid.uuid4())
+# LRU: URL -> (extractor, id), die ältesten Einträge fallen über MEDIA_ID_CACHE_MAX_ENTRIES heraus
+media_id_cache: 'OrderedDict[str, Tuple[str, str]]' = OrderedDict()
 
-        payload = {
-            'project': {
-                'id': STRIMDL_UPDATE_PROJECT_ID,
-                'instance_id': get_instance_id(),
-            },
-            'current': {
-                'version': APP_VERSION,
-            },
-            'channel': 'stable',
-            'platform': {
-                'os': platform.system().lower() or 'linux',
-                'arch': platform.machine(),
-                'container': 'docker',
-            },
-            'capabilities': {
-                'accept_prerelease': False,
-                'supports_delta': False,
-            },
-        }
+media_id_lock = threading.Lock()
 
-        endpoint = f"{STRIMDL_UPDATE_SERVER_URL}/api/updates/v1/updates/check"
-        body = json.dumps(payload).encode('utf-8')
+metadata_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
 
-        request = urllib.request.Request(
-            endpoint,
-            data=body,
-            method='POST',
-            headers={
-                'Authorization': f'Bearer {STRIMDL_UPDATE_API_KEY}',
-                'Content-Type': 'application/json',
-                'X-Request-ID': request_id,
-                'User-Agent': f'StrimDL/{APP_VERSION}',
-            },
-        )
+metadata_lock = threading.Lock()
 
-        try:
-            with urllib.request.urlopen(request, timeout=10) as response:
-                data = json.loads(response.read().decode('utf-8'))
+preview_jobs: Dict[str, Dict[str, Any]] = {}
 
-            normalized = {
-                'ok': True,
-                'status': data.get('status', 'unknown'),
-                'current_version': data.get('current', {}).get('version', APP_VERSION),
-                'project': data.get('project') or {},
-                'update': data.get('update'),
-                'message': data.get('message'),
-                'server_time': data.get('server_time'),
-                'request_id': data.get('request_id', request_id),
-                'devmode': STRIMDL_UPDATE_DEVMODE,
-                'check_interval_seconds': UPDATE_CHECK_INTERVAL_SECONDS,
-                'cached': False,
-                'next_check_seconds': UPDATE_CHECK_INTERVAL_SECONDS,
-            }
+preview_lock = threading.Lock()
 
-            logger.info(f"StrimDL update check: {normalized['status']}")
+save_lock = threading.Lock()
 
-        except urllib.error.HTTPError as e:
-            try:
-                error_data = json.loads(e.read().decode('utf-8'))
+metadata_executor = ThreadPoolExecutor(max_workers=STRIMDL_METADATA_WORKERS, thread_name_prefix='metadata')
 
-            except Exception:
-                error_data = {'message': str(e)}
+prefetch_jobs: Dict[str, Dict[str, Any]] = {}
 
-            normalized = {
-                'ok': False,
-                'status': error_data.get('status', 'error'),
-                'current_version': APP_VERSION,
-                'message': error_data.get('message', str(e)),
-                'devmode': STRIMDL_UPDATE_DEVMODE,
-                'check_interval_seconds': UPDATE_CHECK_INTERVAL_SECONDS,
-                'cached': False,
-                'next_check_seconds': UPDATE_CHECK_INTERVAL_SECONDS,
-            }
+prefetched_cache_keys = set()
 
-            logger.warning(f"StrimDL update check failed: {normalized['message']}")
+prefetch_metrics: Dict[str, int] = {
+    'started': 0,
+    'completed': 0,
+    'failed': 0,
+    'cancelled': 0,
+    'hits': 0,
+}
 
-        except Exception as e:
-            normalized = {
-                'ok': False,
-                'status': 'error',
-                'current_version': APP_VERSION,
-                'message': f'Update check unavailable: {e}',
-                'devmode': STRIMDL_UPDATE_DEVMODE,
-                'check_interval_seconds': UPDATE_CHECK_INTERVAL_SECONDS,
-                'cached': False,
-                'next_check_seconds': UPDATE_CHECK_INTERVAL_SECONDS,
-            }
+prefetch_lock = threading.Lock()
 
-            logger.warning(f"StrimDL update check failed: {e}")
+inflight_keys: Dict[str, List[Any]] = {}
 
-        with update_status_lock:
-            update_status = normalized
-            update_status_checked_at = time.time()
+inflight_lock = threading.Lock()
 
-        return dict(normalized)
+# ContextVar statt threading.local: Worker-Threads übernehmen die Felder per contextvars.copy_context().run
+log_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar('log_context', default={})
 
-    def build_yt_dlp_cmd(self, *args: str) -> List[str]:
-        cmd = ['yt-dlp', *pipe_args]
-        if YTDLP_COOKIES_PATH:
-            cmd.extend(['--cookies', YTDLP_COOKIES_PATH])
+@contextmanager
+def log_scope(**fields: Any):
+    """Setzt Korrelationsfelder (session_id, stage) für alle Log-Einträge des aktuellen Kontexts"""
+    previous = log_context.get()
 
-        cmd.extend(args)
+    now = time.monotonic()
+    fields = {**previous, **fields}
+    fields.setdefault('started', now)
 
-        return cmd
-    def clean_yt_dlp_error(self, stderr: str) -> str:
-        error_msg = stderr.strip() or 'yt-dlp failed without an error message.'
-        if 'Sign in to confirm' in error_msg and '--cookies' in error_msg:
-            if YTDLP_COOKIES_PATH:
-                error_msg += f"\n\nCookies are configured via YTDLP_COOKIES_PATH={YTDLP_COOKIES_PATH}. Make sure the file is mounted into the container and still valid."
-            else:
-                error_msg += "\n\nYouTube is asking for browser cookies. Export a cookies.txt file and set YTDLP_COOKIES_PATH to its path inside the container."
-        return error_msg
-    def send_json_response(self, status_code: int, data: Dict[str, Any]) -> None:
-        self.send_response(status_code)
+    if 'stage' in fields and fields.get('stage') != previous.get('stage'):
+        fields['stage_started'] = now
+    token = log_context.set(fields)
+    try:
+        yield
+    finally:
+        log_context.reset(token)
 
-        self.send_header('Content-type', 'application/json')
+class LogCommand:
+    """Baut die Kommandozeile erst im Log-Thread zusammen, wenn der Eintrag wirklich geschrieben wird"""
 
-        self.end_headers()
+    __slots__ = ('cmd',)
 
-        self.wfile.write(json.dumps(data).encode())
+    def __init__(self, cmd: List[str]):
+        self.cmd = tuple(cmd)
 
-    def send_status_update(self, session_id: str, status: str) -> None:
-        """Sende Status-Update an SSE-Client"""
-        with status_lock:
-            if session_id in download_status:
-                download_status[session_id].put(status)
+    def __str__(self) -> str:
+        return ' '.join(self.cmd)
 
-            if session_id not in status_buffer:
-                status_buffer[session_id] = []
-            status_buffer[session_id].append(status)
+class LogContextFilter(logging.Filter):
+    """Hängt Session, Stage und Laufzeiten an und drosselt häufige Fortschritts-Einträge pro Session"""
 
-            if len(status_buffer[session_id]) > 10:
-                status_buffer[session_id] = status_buffer[session_id][-10:]
-    def get_status_queue(self, session_id: str) -> Queue:
-        """Hole oder erstelle Status-Queue für Session"""
-        with status_lock:
-            if session_id not in download_status:
-                download_status[session_id] = Queue()
+    def __init__(self, progress_interval: int):
+        super().__init__()
+        self.progress_interval = progress_interval
+        self.progress_seen: Dict[str, float] = {}
+        self.lock = threading.Lock()
 
-                if session_id in status_buffer:
-                    for buffered_status in status_buffer[session_id]:
-                        download_status[session_id].put(buffered_status)
+    def filter(self, record: logging.LogRecord) -> bool:
+        fields = log_context.get()
 
-            return download_status[session_id]
-    def cleanup_status_queue(self, session_id: str) -> None:
-        """Entferne Status-Queue nach Download"""
-        with status_lock:
-            if session_id in download_status:
-                del download_status[session_id]
-            if session_id in status_buffer:
-                del status_buffer[session_id]
-    def do_POST(self):
-        parsed_path = urllib.parse.urlparse(self.path)
+        now = time.monotonic()
+        record.session_id = getattr(record, 'session_id', None) or fields.get('session_id')
+        record.stage = getattr(record, 'stage', None) or fields.get('stage')
 
-        if parsed_path.path == '/login':
-            content_length = int(self.headers.get('Content-Length', 0))
+        record.elapsed_ms = int((now - fields['started']) * 1000) if 'started' in fields else None
+        record.stage_ms = int((now - fields['stage_started']) * 1000) if 'stage_started' in fields else None
 
-            body = self.rfile.read(content_length)
+        if getattr(record, 'progress', False):
+            key = record.session_id or '-'
+            with self.lock:
+                if now - self.progress_seen.get(key, 0.0) < self.progress_interval:
+                    return False
+                self.progress_seen[key] = now
 
-            try:
-                data = json.loads(body)
+                if len(self.progress_seen) > 1000:
+                    for stale in [k for k, seen in self.progress_seen.items() if now - seen > self.progress_interval]:
+                        del self.progress_seen[stale]
+        return True
 
-                username = data.get('username', '')
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Reicht Einträge unformatiert an den Log-Thread weiter; nur Tracebacks werden sofort aufbereitet"""
 
-                password = data.get('password', '')
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
 
-                env_user = os.environ.get('STRIMDL_USER', '')
+        record.exc_info = None
+        return record
 
-                env_pass = os.environ.get('STRIMDL_PASS', '')
+class JsonLogFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'msg': record.getMessage(),
+        }
 
-                if username == env_user and password == env_pass:
-                    session = hashlib.sha256(f'{username}:{password}'.encode()).hexdigest()
+        if STRIMDL_WORKER_INDEX:
+            entry['worker'] = int(STRIMDL_WORKER_INDEX)
 
-                    self.send_response(200)
+        for field in ('session_id', 'stage', 'elapsed_ms', 'stage_ms'):
+            value = getattr(record, field, None)
 
-                    self.send_header('Content-type', 'application/json')
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
 
-                    self.send_header('Set-Cookie', f'session={session}; Path=/; HttpOnly')
+log_queue: Queue = Queue(-1)
+log_stream_handler = logging.StreamHandler(sys.stdout)
 
-                    self.end_headers()
+if STRIMDL_LOG_FORMAT == 'text':
+    log_stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 
-                    self.wfile.write(json.dumps({'ok': True}).encode())
+else:
+    log_stream_handler.setFormatter(JsonLogFormatter())
 
-                else:
-                    self.send_json_response(401, {'ok': False, 'reason': 'Invalid credentials'})
+log_queue_handler = DeferredQueueHandler(log_queue)
+log_queue_handler.addFilter(LogContextFilter(STRIMDL_LOG_PROGRESS_SECONDS))
 
-            except Exception as e:
-                self.send_json_response(400, {'ok': False, 'reason': str(e)})
+logging.basicConfig(level=logging.INFO, handlers=[log_queue_handler])
 
-        elif parsed_path.path == '/cancel':
-            if not self.is_authenticated():
-                self.send_json_response(401, {'ok': False, 'reason': 'Not authenticated'})
+log_listener = logging.handlers.QueueListener(log_queue, log_stream_handler)
+log_listener.start()
 
-                return
-            content_length = int(self.headers.get('Content-Length', 0))
+atexit.register(log_listener.stop)
 
-            body = self.rfile.read(content_length) if content_length else b'{}'
-            try:
-                data = json.loads(body)
+logger = logging.getLogger(__name__)
+
+pipe_args = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+class CacheCatalog:
+    """SQLite-Katalog (WAL) für Cache-Artefakte und Job-Historie"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+
+        with self.lock:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    cache_key TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    source_id TEXT,
+                    source_url TEXT,
+                    format_id TEXT,
+                    codec TEXT,
+                    height INTEGER,
+                    size_bytes INTEGER NOT NULL DEFAULT 0,
+                    duration REAL,
+                    hit_count INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    download_seconds REAL,
+                    encode_seconds REAL,
+                    sha256 TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_artifacts_last_access ON artifacts(last_access);
+                CREATE INDEX IF NOT EXISTS idx_artifacts_source_id ON artifacts(source_id);
+                CREATE INDEX IF NOT EXISTS idx_artifacts_size ON artifacts(size_bytes);
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT,
+                    url TEXT,
+                    output_format TEXT,
+                    quality TEXT,
+                    cache_key TEXT,
+                    status TEXT NOT NULL,
+                    http_status INTEGER,
+                    started_at REAL NOT NULL,
+                    finished_at REAL,
+                    download_seconds REAL,
+                    encode_seconds REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_started_at ON jobs(started_at);
+                CREATE TABLE IF NOT EXISTS resume_downloads (
+                    cache_key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    quality TEXT,
+                    recorded_at REAL NOT NULL
+                );
+            """)
+
+            columns = {row['name'] for row in self.conn.execute('PRAGMA table_info(artifacts)')}
+
+            if 'sha256' not in columns:
+                self.conn.execute('ALTER TABLE artifacts ADD COLUMN sha256 TEXT')
+
+            if 'height' not in columns:
+                self.conn.execute('ALTER TABLE artifacts ADD COLUMN height INTEGER')
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
 
+            try:
+                yield self.conn
             except Exception:
-                data = {}
+                self.conn.execute('ROLLBACK')
 
-            session_id = data.get('session_id', '')
+                raise
+            else:
+                self.conn.execute('COMMIT')
 
-            if not session_id:
-                self.send_json_response(400, {'ok': False, 'reason': 'Missing session_id'})
+    def record_artifact(self, path: Path, kind: str, source_id: Optional[str] = None, source_url: Optional[str] = None, format_id: Optional[str] = None, download_seconds: Optional[float] = None) -> None:
+        now = time.time()
 
-                return
-            killed = self.cancel_download_session(session_id)
+        try:
+            size_bytes = path.stat().st_size
+        except OSError:
+            size_bytes = 0
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO artifacts (cache_key, file_name, kind, source_id, source_url, format_id, size_bytes, created_at, last_access, download_seconds)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(cache_key) DO UPDATE SET
+                    file_name = excluded.file_name,
+                    size_bytes = excluded.size_bytes,
+                    last_access = excluded.last_access,
+                    sha256 = NULL,
+                    download_seconds = COALESCE(excluded.download_seconds, artifacts.download_seconds)
+                """,
+                (path.stem, path.name, kind, source_id, source_url, format_id, size_bytes, now, now, download_seconds)
+            )
 
-            self.send_json_response(200, {'ok': True, 'cancelled': True, 'killed_process': killed})
+    def record_hit(self, path: Path) -> None:
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE artifacts SET hit_count = hit_count + 1, last_access = ? WHERE cache_key = ?',
+                (time.time(), path.stem)
+            )
 
-        elif parsed_path.path == '/logout':
-            self.send_response(200)
+        if not cursor.rowcount:
+            self.record_artifact(path, 'unknown')
 
-            self.send_header('Content-type', 'application/json')
+    def record_probe(self, path: Path, codec: Optional[str], duration: Optional[float], height: Optional[int] = None) -> None:
+        with self.transaction() as conn:
+            conn.execute(
+                'UPDATE artifacts SET codec = COALESCE(?, codec), duration = COALESCE(?, duration), height = COALESCE(?, height) WHERE cache_key = ?',
+                (codec, duration, height, path.stem)
+            )
 
-            self.send_header('Set-Cookie', 'session=deleted; Path=/; Expires=Thu, 01 Jan 1970 00:00:00 GMT; HttpOnly')
+    def get_probe(self, path: Path) -> Optional[Dict[str, Any]]:
+        """Zuletzt mit ffprobe ermittelter Videocodec und Höhe eines Artefakts, None wenn nie geprüft"""
+        with self.lock:
+            row = self.conn.execute('SELECT codec, height FROM artifacts WHERE cache_key = ?', (path.stem,)).fetchone()
 
-            self.end_headers()
+        if not row or not row['codec'] or not row['height']:
+            return None
+        return {'codec': row['codec'], 'height': row['height']}
 
-            self.wfile.write(json.dumps({'ok': True}).encode())
+    def record_encode(self, path: Path, encode_seconds: float) -> None:
+        with self.transaction() as conn:
+            conn.execute('UPDATE artifacts SET encode_seconds = ? WHERE cache_key = ?', (encode_seconds, path.stem))
 
-        else:
-            self.send_json_response(404, {'ok': False, 'reason': f'Unknown POST endpoint: {self.path}'})
+    def get_sha256(self, path: Path) -> str:
+        """Liefert die SHA-256-Prüfsumme eines Artefakts, berechnet sie bei Bedarf einmalig"""
+        with self.lock:
+            row = self.conn.execute('SELECT sha256 FROM artifacts WHERE cache_key = ?', (path.stem,)).fetchone()
 
-    def is_authenticated(self):
-        env_user = os.environ.get('STRIMDL_USER', '')
+        if row and row['sha256']:
+            return row['sha256']
+        digest = hashlib.sha256()
 
-        env_pass = os.environ.get('STRIMDL_PASS', '')
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(PEER_CHUNK_SIZE), b''):
+                digest.update(chunk)
 
-        if not env_user or not env_pass:
-            return True
-        cookie = self.headers.get('Cookie', '')
+        sha256 = digest.hexdigest()
 
-        session = hashlib.sha256(f'{env_user}:{env_pass}'.encode()).hexdigest()
+        with self.transaction() as conn:
+            conn.execute('UPDATE artifacts SET sha256 = ? WHERE cache_key = ?', (sha256, path.stem))
 
-        return f'session={session}' in cookie
-    def handle_index_page(self) -> None:
-        if not self.is_authenticated():
-            try:
+        return sha256
+
+    def remove_prefix(self, prefix: str) -> None:
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM artifacts WHERE cache_key LIKE ?', (f"{prefix}%",))
+
+    def start_job(self, session_id: str, url: str, output_format: str, quality: str) -> int:
+        with self.transaction() as conn:
+            cursor = conn.execute(
+                'INSERT INTO jobs (session_id, url, output_format, quality, status, started_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (session_id, url, output_format, quality, 'running', time.time())
+            )
+
+        return cursor.lastrowid
+
+    def finish_job(self, job_id: int, http_status: Optional[int], timings: Dict[str, Any]) -> None:
+        if http_status == 200:
+            status = 'completed'
+        elif http_status == 499:
+            status = 'cancelled'
+        else:
+            status = 'failed'
+        with self.transaction() as conn:
+            conn.execute(
+                'UPDATE jobs SET status = ?, http_status = ?, finished_at = ?, cache_key = ?, download_seconds = ?, encode_seconds = ? WHERE id = ?',
+                (status, http_status, time.time(), timings.get('cache_key'), timings.get('download_seconds'), timings.get('encode_seconds'), job_id)
+            )
+
+    def prune_jobs(self, keep: int) -> int:
+        """Begrenzt die Job-Historie auf die neuesten `keep` Einträge"""
+        with self.transaction() as conn:
+            cursor = conn.execute('DELETE FROM jobs WHERE id <= (SELECT MAX(id) FROM jobs) - ?', (keep,))
+
+        return cursor.rowcount
+
+    def list_artifacts(self, order: str = 'recent', limit: int = 100) -> List[Dict[str, Any]]:
+        order_by = {
+            'recent': 'last_access DESC',
+            'lru': 'last_access ASC',
+            'size': 'size_bytes DESC',
+            'hits': 'hit_count DESC',
+        }.get(order, 'last_access DESC')
+
+        with self.lock:
+            rows = self.conn.execute(f'SELECT * FROM artifacts ORDER BY {order_by} LIMIT ?', (limit,)).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def summary(self) -> Dict[str, Any]:
+        with self.lock:
+            artifacts = self.conn.execute('SELECT COUNT(*) AS count, COALESCE(SUM(size_bytes), 0) AS size_bytes, COALESCE(SUM(hit_count), 0) AS hits FROM artifacts').fetchone()
+
+            jobs = self.conn.execute('SELECT status, COUNT(*) AS count, AVG(encode_seconds) AS avg_encode_seconds FROM jobs GROUP BY status').fetchall()
+
+        return {
+            'artifacts': dict(artifacts),
+            'jobs': {row['status']: {'count': row['count'], 'avg_encode_seconds': row['avg_encode_seconds']} for row in jobs},
+        }
+
+    def recent_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute('SELECT * FROM jobs ORDER BY started_at DESC LIMIT ?', (limit,)).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def record_resume(self, cache_key: str, url: str, quality: Optional[str]) -> None:
+        """Merkt einen laufenden Download vor, damit er nach einem Neustart fortgesetzt werden kann"""
+        with self.transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO resume_downloads (cache_key, url, quality, recorded_at) VALUES (?, ?, ?, ?)',
+                (cache_key, url, quality, time.time())
+            )
+
+    def clear_resume(self, cache_key: str) -> None:
+        with self.transaction() as conn:
+            conn.execute('DELETE FROM resume_downloads WHERE cache_key = ?', (cache_key,))
+
+    def pending_resumes(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute('SELECT * FROM resume_downloads ORDER BY recorded_at').fetchall()
+
+        return [dict(row) for row in rows]
+
+    def reconcile(self, cache_dir: Path) -> None:
+        """Gleicht den Katalog beim Start einmalig mit dem Cache-Verzeichnis ab"""
+        with self.lock:
+            known = {row['file_name'] for row in self.conn.execute('SELECT file_name FROM artifacts')}
+
+        present = {
+            path.name: path for path in cache_dir.iterdir()
+            if path.is_file() and path.suffix in CATALOG_FILE_SUFFIXES
+        }
+
+        with self.transaction() as conn:
+            for file_name in known - present.keys():
+                conn.execute('DELETE FROM artifacts WHERE file_name = ?', (file_name,))
+
+        for file_name in present.keys() - known:
+            self.record_artifact(present[file_name], 'unknown')
+cache_catalog = CacheCatalog(CACHE_CATALOG_PATH)
+class CacheTiers:
+    """Kleiner RAM-Tier (tmpfs) vor dem Disk-Cache für häufig gelesene kleine Dateien (Audio, kurze Clips, Bilder).
+
+    Der Disk-Tier bleibt maßgeblich; der RAM-Tier hält nur Kopien. Eine Datei wird nach
+    RAM_CACHE_PROMOTE_HITS Zugriffen hochgestuft, ist der Tier voll, fallen die am seltensten
+    (bei Gleichstand am längsten nicht) gelesenen Kopien wieder heraus. Maßgeblich für die Belegung
+    ist der Inhalt des RAM-Verzeichnisses, das sich alle Worker teilen.
+    """
+
+    def __init__(self, ram_dir: Optional[Path], capacity: int, max_file: int):
+        self.ram_dir = ram_dir
+        self.capacity = capacity
+        self.max_file = max_file
+        self.access: Dict[str, List[float]] = {}
+        self.promoting = set()
+        self.stats = {'ram_hits': 0, 'disk_hits': 0, 'misses': 0, 'promotions': 0, 'demotions': 0}
+        self.lock = threading.Lock()
+
+    def enabled(self) -> bool:
+        return bool(self.ram_dir and self.capacity > 0)
+
+    def start(self) -> None:
+        """Übernimmt gültige RAM-Kopien eines früheren Laufs und entfernt veraltete"""
+        if not self.enabled():
+            return
+        try:
+            self.ram_dir.mkdir(parents=True, exist_ok=True)
+
+        except OSError as e:
+            logger.warning("RAM cache tier disabled, cannot use %s: %s", self.ram_dir, e)
+
+            self.ram_dir = None
+            return
+        with self.dir_lock():
+            for ram_path in self.ram_dir.iterdir():
+                try:
+                    if ram_path.name.startswith('.'):
+                        # Angefangene Kopie; nur entfernen, wenn ihr Worker nicht mehr läuft
+                        pid = ram_path.name.rsplit('.', 2)[-2]
+                        if pid.isdigit() and not os.path.exists(f"/proc/{pid}"):
+                            ram_path.unlink()
+
+                        continue
+                    disk_path = CACHE_DIR / ram_path.name
+                    if PEER_FILE_PATTERN.fullmatch(ram_path.name) and disk_path.exists() and disk_path.stat().st_size == ram_path.stat().st_size:
+                        self.access.setdefault(ram_path.name, [RAM_CACHE_PROMOTE_HITS, time.time()])
+                    else:
+                        ram_path.unlink()
+
+                except OSError:
+                    pass
+            used = self.make_room_locked(0)
+            copies = len(self.copies())
+        logger.info("RAM cache tier at %s: %s file(s), %s MB of %s MB", self.ram_dir, copies, used // 1024 // 1024, self.capacity // 1024 // 1024)
+
+    @contextmanager
+    def dir_lock(self):
+        """Sperrt das RAM-Verzeichnis für diesen Prozess und über flock für alle anderen Worker"""
+        with self.lock, open(self.ram_dir / '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            yield
+
+    def copies(self) -> List[str]:
+        try:
+            return [ram_path.name for ram_path in self.ram_dir.iterdir() if not ram_path.name.startswith('.')]
+
+        except OSError:
+            return []
+
+    def used(self) -> int:
+        """Belegung des RAM-Verzeichnisses; angefangene Kopien werden vorab in voller Größe angelegt und zählen mit"""
+        if not self.ram_dir:
+            return 0
+        total = 0
+        try:
+            for ram_path in self.ram_dir.iterdir():
+                try:
+                    total += ram_path.stat().st_size
+                except OSError:
+                    pass
+        except OSError:
+            pass
+        return total
+
+    def make_room_locked(self, size: int) -> int:
+        """Verdrängt selten gelesene Kopien, bis size Bytes frei sind; liefert die Belegung danach"""
+        used = self.used()
+        copies = self.copies()
+        while copies and used + size > self.capacity:
+            victim = min(copies, key=lambda key: tuple(self.access.get(key, [0, 0.0])))
+
+            copies.remove(victim)
+            used -= self.demote_locked(victim)
+        return used
+
+    def resolve(self, path: Path, promote: bool = True) -> Path:
+        """Zählt einen Cache-Treffer und liefert die schnellste vorhandene Kopie der Datei"""
+        name = path.name
+        with self.lock:
+            entry = self.access.setdefault(name, [0, 0.0])
+
+            entry[0] += 1
+            entry[1] = time.time()
+            if len(self.access) > RAM_CACHE_MAX_TRACKED:
+                for stale in sorted(self.access, key=lambda key: self.access[key][1])[:RAM_CACHE_MAX_TRACKED // 10]:
+                    del self.access[stale]
+
+            if self.ram_dir and (self.ram_dir / name).exists():
+                self.stats['ram_hits'] += 1
+                return self.ram_dir / name
+            self.stats['disk_hits'] += 1
+            should_promote = promote and self.enabled() and entry[0] >= RAM_CACHE_PROMOTE_HITS and name not in self.promoting
+            if should_promote:
+                self.promoting.add(name)
+
+        if should_promote:
+            threading.Thread(target=self.promote, args=(path,), daemon=True).start()
+
+        return path
+
+    def locate(self, path: Path) -> Path:
+        """Liefert die RAM-Kopie einer Datei falls vorhanden, ohne einen Zugriff zu zählen"""
+        if self.ram_dir and (self.ram_dir / path.name).exists():
+            return self.ram_dir / path.name
+        return path
+
+    def record_miss(self) -> None:
+        with self.lock:
+            self.stats['misses'] += 1
+
+    def promote(self, path: Path) -> None:
+        name = path.name
+        tmp_path = self.ram_dir / f".{name}.{os.getpid()}.tmp"
+        try:
+            size = path.stat().st_size
+
+            if size > self.max_file or size > self.capacity:
+                return
+            with self.dir_lock():
+                # Ein anderer Worker kann die Datei inzwischen hochgestuft haben
+                if (self.ram_dir / name).exists():
+                    return
+                if self.make_room_locked(size) + size > self.capacity:
+                    return
+                # Sofort in voller Größe anlegen, damit parallele Hochstufungen aller Worker den Platz sehen
+                with open(tmp_path, 'wb') as target:
+                    target.truncate(size)
+
+            with open(path, 'rb') as source, open(tmp_path, 'r+b') as target:
+                shutil.copyfileobj(source, target, PEER_CHUNK_SIZE)
+
+            tmp_path.replace(self.ram_dir / name)
+
+            with self.lock:
+                self.stats['promotions'] += 1
+        except OSError as e:
+            logger.warning("Could not promote %s to RAM cache: %s", name, e)
+
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+            with self.lock:
+                self.promoting.discard(name)
+
+    def demote_locked(self, name: str) -> int:
+        ram_path = self.ram_dir / name
+        try:
+            size = ram_path.stat().st_size
+
+            ram_path.unlink()
+
+        except OSError:
+            return 0
+        self.stats['demotions'] += 1
+        return size
+
+    def discard_prefix(self, prefix: str) -> None:
+        """Entfernt RAM-Kopien, deren Disk-Datei gelöscht wurde"""
+        if not self.ram_dir:
+            return
+        with self.dir_lock():
+            for name in [name for name in self.copies() if name.startswith(prefix)]:
+                self.demote_locked(name)
+
+            for name in [name for name in self.access if name.startswith(prefix)]:
+                del self.access[name]
+
+    def snapshot(self) -> Dict[str, Any]:
+        used = self.used()
+        copies = len(self.copies()) if self.ram_dir else 0
+        with self.lock:
+            stats = dict(self.stats)
+
+            lookups = stats['ram_hits'] + stats['disk_hits'] + stats['misses']
+            return {
+                'ram_enabled': self.enabled(),
+                'ram_dir': str(self.ram_dir) if self.ram_dir else None,
+                'ram_capacity_bytes': self.capacity,
+                'ram_used_bytes': used,
+                'ram_files': copies,
+                'disk_dir': str(CACHE_DIR),
+                **stats,
+                'ram_hit_rate': round(stats['ram_hits'] / lookups, 3) if lookups else None,
+                'disk_hit_rate': round(stats['disk_hits'] / lookups, 3) if lookups else None,
+            }
+def parse_rate(value: str) -> int:
+    """Wandelt Angaben wie 500K, 20M oder 1.5G (Bytes pro Sekunde) in Bytes um"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([KMG]?)i?B?', value.strip(), re.IGNORECASE)
+
+    if not match:
+        return 0
+    factor = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}[match.group(2).upper()]
+    return int(float(match.group(1)) * factor)
+def get_encode_profile(name: Optional[str], max_size: Optional[str] = None) -> Dict[str, Any]:
+    """Encode-Profil für eine Anfrage; max_size (z.B. 25M) begrenzt die Bitrate, damit die Datei hineinpasst"""
+    profile_name = (name or DEFAULT_ENCODE_PROFILE).strip().lower()
+
+    if profile_name not in ENCODE_PROFILES:
+        raise ValueError(f"Unknown profile '{profile_name}'. Available: {', '.join(ENCODE_PROFILES)}")
+    target_bytes = parse_rate(max_size) if max_size else 0
+    if max_size and not target_bytes:
+        raise ValueError(f"Invalid max_size '{max_size}'. Use values like 25M or 1G.")
+    return {'name': profile_name, **ENCODE_PROFILES[profile_name], 'target_bytes': target_bytes}
+def profile_requires_encode(profile: Dict[str, Any]) -> bool:
+    """Ein anderes Profil als das Standardprofil wird immer neu kodiert, sonst blieben CRF und Audiobitrate wirkungslos"""
+    default = ENCODE_PROFILES[DEFAULT_ENCODE_PROFILE]
+
+    return profile['name'] != DEFAULT_ENCODE_PROFILE or profile['crf'] != default['crf'] or profile['audio_bitrate'] != default['audio_bitrate']
+def get_profile_tag(profile: Dict[str, Any], output_format: str) -> str:
+    """Teil des Cache-Keys für konvertierte Dateien; das Standardprofil behält die bisherigen Namen"""
+    if output_format == 'mp3':
+        settings = f"{profile['mp3_quality']}:{profile['target_bytes']}"
+        return '' if settings == '0:0' else hashlib.md5(settings.encode()).hexdigest()[:8]
+    settings = f"{profile['preset']}:{profile['crf']}:{profile['max_height']}"
+    if profile['name'] != DEFAULT_ENCODE_PROFILE or profile['target_bytes']:
+        settings += f":{profile['audio_bitrate']}:{profile['target_bytes']}"
+    if profile_requires_encode(profile):
+        settings += ':encoded'
+    return hashlib.md5(settings.encode()).hexdigest()[:8]
+def get_target_bitrate(profile: Dict[str, Any], duration: Optional[float]) -> Optional[int]:
+    """Gesamtbitrate in kbit/s, mit der die Ausgabe unter target_bytes bleibt"""
+    if not profile['target_bytes'] or not duration:
+        return None
+    return int(profile['target_bytes'] * 8 * TARGET_SIZE_HEADROOM / duration / 1000)
+def build_video_encode_args(profile: Dict[str, Any], duration: Optional[float]) -> List[str]:
+    args = ['-c:v', 'libx264', '-preset', profile['preset'], '-crf', profile['crf']]
+    total_kbps = get_target_bitrate(profile, duration)
+
+    audio_kbps = profile['audio_bitrate']
+    if total_kbps:
+        audio_kbps = min(audio_kbps, max(32, total_kbps // 8))
+        video_kbps = max(100, total_kbps - audio_kbps)
+        args.extend(['-maxrate', f'{video_kbps}k', '-bufsize', f'{video_kbps * 2}k'])
+
+    args.extend(['-c:a', 'aac', '-b:a', f'{audio_kbps}k', '-movflags', '+faststart', '-pix_fmt', 'yuv420p'])
+
+    return args
+def build_mp3_encode_args(profile: Dict[str, Any], duration: Optional[float]) -> List[str]:
+    total_kbps = get_target_bitrate(profile, duration)
+
+    quality = ['-b:a', f'{min(320, max(32, total_kbps))}k'] if total_kbps else ['-q:a', profile['mp3_quality']]
+    return ['-codec:a', 'libmp3lame', *quality, '-write_xing', '1', '-ar', '44100', '-ac', '2', '-id3v2_version', '3']
+def parse_timestamp(value: str) -> float:
+    """Wandelt Zeitangaben wie 90, 1:30 oder 01:02:03.5 in Sekunden um"""
+    parts = value.strip().split(':')
+
+    if len(parts) > 3 or not all(re.fullmatch(r'\d+(\.\d+)?', part) for part in parts):
+        raise ValueError(f"Invalid time '{value}'. Use seconds, MM:SS or HH:MM:SS.")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+def get_clip_range(start: Optional[str], end: Optional[str]) -> Optional[Tuple[float, Optional[float]]]:
+    """(start, end) in Sekunden für einen Ausschnitt, None für das ganze Video; end None = bis zum Ende"""
+    if not start and not end:
+        return None
+    start_seconds = parse_timestamp(start) if start else 0.0
+    end_seconds = parse_timestamp(end) if end else None
+    if end_seconds is not None and end_seconds <= start_seconds:
+        raise ValueError('end must be after start')
+    return start_seconds, end_seconds
+def get_clip_suffix(clip: Tuple[float, Optional[float]]) -> str:
+    start, end = clip
+    return f"_clip-{int(start * 1000)}-{int(end * 1000) if end is not None else 'end'}"
+def get_clip_seek_args(clip: Tuple[float, Optional[float]]) -> Tuple[List[str], List[str]]:
+    """ffmpeg-Argumente vor und nach -i für einen framegenauen Schnitt.
+
+    Schneller Sprung bis kurz vor den Start, den Rest erledigt der genaue Ausgabe-Seek; Ton und Bild beginnen exakt bei start.
+    """
+    start, end = clip
+    preroll = min(start, CLIP_EXACT_PREROLL_SECONDS)
+    output_args = ['-ss', f'{preroll:.3f}']
+    if end is not None:
+        output_args.extend(['-t', f'{end - start:.3f}'])
+    return ['-ss', f'{start - preroll:.3f}'], output_args
+def get_clip_duration(clip: Tuple[float, Optional[float]], duration: Optional[float]) -> Optional[float]:
+    start, end = clip
+    if end is not None:
+        return end - start
+    return max(0.0, duration - start) if duration else None
+def format_clip_time(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return 'end'
+    seconds = int(seconds)
+
+    return f"{seconds // 3600:02d}.{seconds % 3600 // 60:02d}.{seconds % 60:02d}"
+def get_safe_file_name(name: str) -> str:
+    """Macht einen Anzeigenamen (Titel) als Dateinamen im Download-Verzeichnis verwendbar"""
+    name = re.sub(r'[\x00-\x1f/\\]', '_', name).strip().lstrip('.')
+
+    return name[:200] or 'download'
+def is_save_dir_available() -> bool:
+    return bool(STRIMDL_SAVE_DIR) and os.path.isdir(STRIMDL_SAVE_DIR) and os.access(STRIMDL_SAVE_DIR, os.W_OK)
+def save_to_download_dir(source_path: Path, file_name: str) -> Tuple[Path, str]:
+    """Legt ein fertiges Artefakt in STRIMDL_SAVE_DIR ab, ohne es über HTTP zu übertragen.
+
+    Auf demselben Dateisystem wird ein Reflink (Copy-on-Write) oder Hardlink auf die Cache-Datei
+    angelegt, sonst kopiert. Die Datei erscheint erst per Rename unter ihrem Namen, nie halb geschrieben;
+    ein vorhandener Name wird nicht überschrieben, sondern um " (n)" ergänzt.
+    """
+    save_dir = Path(STRIMDL_SAVE_DIR)
+    safe_name = get_safe_file_name(file_name)
+
+    stem, suffix = os.path.splitext(safe_name)
+    tmp_path = save_dir / f".{safe_name}.{uuid.uuid4().hex[:8]}.part"
+    method = None
+    try:
+        with open(source_path, 'rb') as source, open(tmp_path, 'wb') as target:
+            try:
+                fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+
+                method = 'reflink'
+            except OSError:
+                pass
+        if not method:
+            tmp_path.unlink()
+
+            try:
+                os.link(source_path, tmp_path)
+
+                method = 'hardlink'
+            except OSError:
+                shutil.copyfile(source_path, tmp_path)
+
+                method = 'copy'
+        with save_lock:
+            dest_path = save_dir / safe_name
+            counter = 1
+            while dest_path.exists():
+                dest_path = save_dir / f"{stem} ({counter}){suffix}"
+                counter += 1
+            os.replace(tmp_path, dest_path)
+
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    return dest_path, method
+def format_rate(bytes_per_second: float) -> str:
+    return f"{bytes_per_second / 1024 / 1024:.1f} MB/s"
+class BandwidthGovernor:
+    """Server-weites Bandbreitenbudget, fair auf die laufenden Downloads verteilt.
+
+    Jeder neue Download reserviert seinen Anteil (Budget / laufende Downloads inklusive des neuen) aus
+    dem noch nicht vergebenen Rest und gibt ihn als --limit-rate an yt-dlp, das damit selbst drosselt.
+    yt-dlp kann das Limit zur Laufzeit nicht ändern; damit die Summe trotzdem nie über dem Budget liegt,
+    wartet ein Download, solange weniger als BANDWIDTH_MIN_LIMIT je Stream frei ist. Im Worker-Modus
+    liegen die Reservierungen im Session-Store. Gemessen wird nur der Zuwachs der Download-Teildateien
+    (.part, .fNNN), nicht Merge- oder Remux-Ausgaben.
+    """
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+
+        self.reserved: Dict[str, int] = {}
+
+        self.waiting = 0
+        self.lock = threading.Lock()
+
+        self.thread: Optional[threading.Thread] = None
+
+    def enabled(self) -> bool:
+        return self.budget > 0 or STRIMDL_DOWNLOAD_ACCELERATION
+
+    def start(self) -> None:
+        if self.enabled() and not self.thread:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+
+            self.thread.start()
+
+    def active_downloads(self, local: int) -> int:
+        """Laufende Downloads aller Worker; das Budget gilt für den ganzen Server"""
+        return max(local, shared_sessions.load('downloads')) if shared_sessions else local
+
+    def try_reserve(self, key: str, minimum: int) -> int:
+        """Reserviert den Anteil eines startenden Downloads aus dem freien Budget; 0, wenn zu wenig frei ist"""
+        with self.lock:
+            own_total = sum(self.reserved.values())
+            wanted = max(minimum, int(self.budget / (self.active_downloads(len(self.reserved)) + 1)))
+            if shared_sessions:
+                granted = shared_sessions.reserve('bandwidth', self.budget, own_total, wanted, minimum)
+
+            else:
+                left = self.budget - own_total
+                granted = min(wanted, left) if left >= minimum else 0
+            if granted:
+                self.reserved[key] = granted
+            return granted
+
+    @contextmanager
+    def share(self, streams: int = 1, abort: Optional[Callable[[], bool]] = None, report: Optional[Callable[[str], None]] = None):
+        """Hält einen Anteil am Budget für die Dauer eines Downloads.
+
+        Liefert das --limit-rate je Stream (0 ohne Budget) oder None, wenn abort während des Wartens
+        auf freie Bandbreite zutrifft.
+        """
+        if not self.budget:
+            yield 0
+            return
+        key = uuid.uuid4().hex
+        last_report = time.monotonic()
+        with self.lock:
+            self.waiting += 1
+        try:
+            try:
+                while True:
+                    granted = self.try_reserve(key, BANDWIDTH_MIN_LIMIT * streams)
+
+                    if granted or (abort and abort()):
+                        break
+                    if report and time.monotonic() - last_report >= BANDWIDTH_REPORT_SECONDS:
+                        last_report = time.monotonic()
+                        report("Waiting for free download bandwidth")
+
+                    time.sleep(BANDWIDTH_WAIT_SECONDS)
+
+            finally:
+                with self.lock:
+                    self.waiting -= 1
+            yield granted // streams if granted else None
+        finally:
+            with self.lock:
+                self.reserved.pop(key, None)
+
+                if shared_sessions:
+                    shared_sessions.set_load('bandwidth', sum(self.reserved.values()))
+
+    def limit_args(self, limit: Optional[int]) -> List[str]:
+        return ['--limit-rate', str(limit)] if limit else []
+
+    def register(self, job_key: str, process: subprocess.Popen, cache_stem: str, report: Optional[Callable[[str], None]], limit: Optional[int] = None) -> None:
+        if not self.enabled():
+            return
+        now = time.monotonic()
+
+        with self.lock:
+            self.jobs[job_key] = {
+                'process': process,
+                'cache_stem': cache_stem,
+                'report': report,
+                'limit': limit,
+                'bytes': 0,
+                'rate': 0.0,
+                'last_report': now,
+            }
+
+            if shared_sessions:
+                shared_sessions.set_load('downloads', len(self.jobs))
+
+    def unregister(self, job_key: str) -> None:
+        with self.lock:
+            job = self.jobs.pop(job_key, None)
+
+            if shared_sessions and job:
+                shared_sessions.set_load('downloads', len(self.jobs))
+
+    def measure(self, cache_stem: str) -> int:
+        total = 0
+        for path in CACHE_DIR.glob(f"{cache_stem}*"):
+            if not DOWNLOAD_PART_PATTERN.search(path.name):
+                continue
+            try:
+                total += path.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def run(self) -> None:
+        while True:
+            time.sleep(BANDWIDTH_TICK_SECONDS)
+
+            with self.lock:
+                jobs = list(self.jobs.values())
+
+            now = time.monotonic()
+
+            for job in jobs:
+                if job['process'].poll() is not None:
+                    continue
+                size = self.measure(job['cache_stem'])
+
+                # Wird eine Teildatei fertig umbenannt oder gemergt, schrumpft die Summe; das zählt nicht als Download
+                delta = max(0, size - job['bytes'])
+
+                job['bytes'] = size
+                job['rate'] = job['rate'] * 0.7 + (delta / BANDWIDTH_TICK_SECONDS) * 0.3
+                if job['report'] and now - job['last_report'] >= BANDWIDTH_REPORT_SECONDS:
+                    job['last_report'] = now
+                    limit = f" (limit {format_rate(job['limit'])})" if job['limit'] else ''
+                    job['report'](f"Downloading at {format_rate(job['rate'])}{limit}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            jobs = list(self.jobs.values())
+
+            reserved = sum(self.reserved.values())
+            waiting = self.waiting
+        return {
+            'acceleration': STRIMDL_DOWNLOAD_ACCELERATION,
+            'concurrent_fragments': YTDLP_CONCURRENT_FRAGMENTS if STRIMDL_DOWNLOAD_ACCELERATION else 1,
+            'budget_bytes_per_second': self.budget,
+            'active_jobs': len(jobs),
+            'reserved_bytes_per_second': reserved,
+            'waiting_jobs': waiting,
+            'limits_bytes_per_second': [job['limit'] for job in jobs],
+            'rates_bytes_per_second': [round(job['rate']) for job in jobs],
+        }
+bandwidth_governor = BandwidthGovernor(parse_rate(STRIMDL_BANDWIDTH_LIMIT_RAW))
+cache_tiers = CacheTiers(
+    Path(STRIMDL_RAM_CACHE_DIR) if STRIMDL_RAM_CACHE_DIR else None,
+    parse_rate(STRIMDL_RAM_CACHE_SIZE_RAW),
+    parse_rate(STRIMDL_RAM_CACHE_MAX_FILE_RAW)
+)
+def get_cgroup_cpu_limit() -> Optional[float]:
+    """CPU-Quota des Containers (cgroup v2 cpu.max oder v1 cfs_quota), None wenn unbegrenzt"""
+    try:
+        quota, period = Path('/sys/fs/cgroup/cpu.max').read_text().split()[:2]
+
+        if quota != 'max':
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(Path('/sys/fs/cgroup/cpu/cpu.cfs_quota_us').read_text())
+
+        period = int(Path('/sys/fs/cgroup/cpu/cpu.cfs_period_us').read_text())
+
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+def format_eta(seconds: float) -> str:
+    seconds = int(max(0, seconds))
+
+    return f"{seconds // 60}m {seconds % 60:02d}s" if seconds >= 60 else f"{seconds}s"
+class EncodeGovernor:
+    """Plant ffmpeg-Encodes nach geschätzten Kosten und verteilt die verfügbaren CPUs auf die laufenden.
+
+    Die Kosten eines Jobs sind Dauer × Realtime-Faktor seiner Encode-Art; die Faktoren werden aus den
+    abgeschlossenen Encodes nachgeführt. Freie Plätze gehen an den günstigsten wartenden Job (mit Aging,
+    damit lange Jobs nicht verhungern). Sind alle Plätze belegt und kommt ein deutlich kürzerer Job, wird
+    der teuerste laufende Encode per SIGSTOP angehalten und später per SIGCONT fortgesetzt. Restzeit und
+    Timeout zählen nur aktive Laufzeit, damit ETA und Abbruch über Pausen hinweg stimmen. Reines Remuxing
+    (kind='copy') belegt keinen Platz und wartet nie hinter vollen Encodes.
+    """
+
+    def __init__(self):
+        try:
+            affinity = sorted(os.sched_getaffinity(0))
+
+        except AttributeError:
+            affinity = list(range(os.cpu_count() or 1))
+
+        self.server_cpus: List[int] = []
+        self.encode_cpus = affinity
+        if STRIMDL_RESERVED_CPUS and len(affinity) > STRIMDL_RESERVED_CPUS:
+            self.server_cpus = affinity[:STRIMDL_RESERVED_CPUS]
+            self.encode_cpus = affinity[STRIMDL_RESERVED_CPUS:]
+        cpu_limit = get_cgroup_cpu_limit()
+
+        self.cpu_budget = max(1, min(len(self.encode_cpus), int(cpu_limit) if cpu_limit else len(self.encode_cpus)))
+
+        # Im Worker-Modus gelten Plätze und CPU-Budget für alle Worker zusammen (worker_load im Session-Store)
+        self.slots = max(1, STRIMDL_ENCODE_SLOTS or self.cpu_budget // 2)
+        self.running: List[Dict[str, Any]] = []
+        self.waiting: List[Dict[str, Any]] = []
+        self.copies: List[Dict[str, Any]] = []
+        self.realtime_factors = dict(ENCODE_REALTIME_FACTORS)
+        self.preemptions = 0
+        self.lock = threading.Lock()
+
+        self.thread: Optional[threading.Thread] = None
+
+        self.nice_cmd = shutil.which('nice')
+
+        self.ionice_cmd = shutil.which('ionice') if FFMPEG_IONICE else None
+        self.taskset_cmd = shutil.which('taskset') if self.server_cpus else None
+
+    def threads_per_encode(self) -> int:
+        """Fester CPU-Anteil je Encode-Platz.
+
+        ffmpeg kann -threads nach dem Start nicht mehr ändern; ein Anteil nach aktuell laufenden Encodes
+        würde dem ersten Encode alle Kerne lassen, sobald ein zweiter startet. Mit dem Anteil je Platz
+        überbuchen auch volle Plätze das CPU-Budget nicht.
+        """
+        return max(1, self.cpu_budget // self.slots)
+
+    def isolate_server(self) -> None:
+        """Bindet alle Threads des Server-Prozesses an die reservierten CPUs; Encodes laufen nur auf den übrigen.
+
+        sched_setaffinity wirkt nur auf einen einzelnen Thread, deshalb wird jeder bereits laufende Thread
+        gebunden. Später gestartete Threads und Kindprozesse (yt-dlp, ffprobe) erben die Maske, ffmpeg wird
+        per taskset auf die Encode-CPUs gesetzt.
+        """
+        if not self.server_cpus or not self.taskset_cmd:
+            return
+        try:
+            thread_ids = [int(tid) for tid in os.listdir('/proc/self/task')]
+
+        except OSError:
+            thread_ids = [threading.get_native_id()]
+
+        for tid in thread_ids:
+            try:
+                os.sched_setaffinity(tid, self.server_cpus)
+
+            except ProcessLookupError:
+                continue
+            except OSError as e:
+                logger.warning("Could not set CPU affinity: %s", e)
+
+                return
+        logger.info("Server threads pinned to CPUs %s, encodes to %s", self.server_cpus, self.encode_cpus)
+
+    def start(self) -> None:
+        if not self.thread:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+
+            self.thread.start()
+
+    def estimate(self, kind: str, duration: Optional[float]) -> float:
+        """Geschätzte Encode-Zeit in Sekunden; ohne bekannte Dauer wird eine Minute Material angenommen"""
+        with self.lock:
+            factor = self.realtime_factors.get(kind, self.realtime_factors['h264'])
+
+        return (duration or 60.0) * factor
+
+    def active_seconds(self, job: Dict[str, Any], now: float) -> float:
+        return job['active_seconds'] + (now - job['resumed_at'] if job['resumed_at'] else 0.0)
+
+    def remaining(self, job: Dict[str, Any], now: float) -> float:
+        return max(0.0, job['estimate'] - self.active_seconds(job, now))
+
+    def priority(self, job: Dict[str, Any], now: float) -> float:
+        return self.remaining(job, now) / (1 + (now - job['queued_at']) / ENCODE_AGING_SECONDS)
+
+    def signal(self, job: Dict[str, Any], sig: int) -> bool:
+        try:
+            os.killpg(job['process'].pid, sig)
+
+            return True
+        except ProcessLookupError:
+            return False
+        except Exception as e:
+            logger.warning("Could not signal encode process: %s", e)
+
+            return False
+
+    def take_slot(self) -> bool:
+        """Prüft und belegt einen freien Platz, im Worker-Modus über alle Worker hinweg (Lock muss gehalten werden)"""
+        if len(self.running) >= self.slots:
+            return False
+        return not shared_sessions or shared_sessions.try_acquire('encodes', self.slots, len(self.running))
+
+    def publish_load(self) -> None:
+        if shared_sessions:
+            shared_sessions.set_load('encodes', len(self.running))
+
+    def running_total(self) -> int:
+        return max(len(self.running), shared_sessions.load('encodes')) if shared_sessions else len(self.running)
+
+    def grant(self, job: Dict[str, Any], now: float) -> None:
+        self.waiting.remove(job)
+
+        self.running.append(job)
+
+        job['resumed_at'] = now
+        if job['paused']:
+            job['paused'] = False
+            self.signal(job, signal.SIGCONT)
+
+        else:
+            job['granted'].set()
+
+    def dispatch(self) -> None:
+        """Vergibt freie Plätze und hält bei Bedarf den teuersten laufenden Encode an (Lock muss gehalten werden)"""
+        now = time.monotonic()
+
+        while self.waiting:
+            candidate = min(self.waiting, key=lambda job: self.priority(job, now))
+
+            if self.take_slot():
+                self.grant(candidate, now)
+
+                continue
+            if not STRIMDL_ENCODE_PREEMPT:
+                break
+            victims = [
+                job for job in self.running
+                if job['preemptible'] and job['process'] and job['process'].poll() is None
+                and self.remaining(job, now) > ENCODE_PREEMPT_MIN_SECONDS
+            ]
+
+            victim = max(victims, key=lambda job: self.remaining(job, now), default=None)
+
+            if not victim or self.remaining(candidate, now) * ENCODE_PREEMPT_RATIO > self.remaining(victim, now):
+                break
+            if not self.signal(victim, signal.SIGSTOP):
+                break
+            logger.info("Pausing encode with ~%.0fs left for a shorter job (~%.0fs)", self.remaining(victim, now), self.remaining(candidate, now))
+
+            victim['active_seconds'] = self.active_seconds(victim, now)
+            victim['resumed_at'] = None
+            victim['paused'] = True
+            victim['queued_at'] = now
+            self.running.remove(victim)
+
+            self.waiting.append(victim)
+
+            self.preemptions += 1
+
+            # Der Platz des angehaltenen Encodes geht direkt an den kürzeren Job über
+            self.grant(candidate, now)
+
+    @contextmanager
+    def slot(self, kind: str = 'h264', duration: Optional[float] = None, preemptible: bool = True, report: Optional[Callable[[str], None]] = None, abort: Optional[Callable[[], bool]] = None, timeout: Optional[float] = None):
+        """Wartet auf einen Encode-Platz; liefert den Job, dessen 'threads' das ffmpeg-Thread-Budget angibt.
+
+        Liefert None, wenn abort() während des Wartens wahr wird (z.B. abgebrochene Session). Mit timeout
+        wird der angehängte Prozess nach so vielen Sekunden aktiver Laufzeit beendet ('timed_out').
+        """
+        now = time.monotonic()
+
+        job = {
+            'kind': kind,
+            'duration': duration,
+            'estimate': self.estimate(kind, duration),
+            'preemptible': preemptible,
+            'report': report,
+            'process': None,
+            'paused': False,
+            'granted': threading.Event(),
+            'queued_at': now,
+            'resumed_at': None,
+            'active_seconds': 0.0,
+            'last_report': 0.0,
+            'threads': 1,
+            'timeout': timeout,
+            'timed_out': False,
+        }
+
+        with self.lock:
+            if kind == 'copy':
+                self.copies.append(job)
+
+                job['resumed_at'] = now
+                job['granted'].set()
+
+            else:
+                self.waiting.append(job)
+
+                self.dispatch()
+
+        try:
+            while not job['granted'].wait(0.5):
+                if abort and abort():
+                    break
+            if not job['granted'].is_set():
+                yield None
+            else:
+                with self.lock:
+                    job['threads'] = self.threads_per_encode()
+
+                yield job
+        finally:
+            with self.lock:
+                now = time.monotonic()
+
+                if job in self.waiting:
+                    self.waiting.remove(job)
+
+                if job in self.running:
+                    self.running.remove(job)
+
+                if job in self.copies:
+                    self.copies.remove(job)
+
+                active = self.active_seconds(job, now) if job['granted'].is_set() else 0.0
+                job['resumed_at'] = None
+                if job['process'] and job['process'].returncode == 0 and duration and duration >= 1 and active > 0:
+                    self.realtime_factors[kind] = self.realtime_factors[kind] * 0.7 + (active / duration) * 0.3
+                job['active_seconds'] = active
+                self.publish_load()
+
+                self.dispatch()
+
+    def attach(self, job: Dict[str, Any], process: subprocess.Popen) -> None:
+        with self.lock:
+            job['process'] = process
+
+    def run(self) -> None:
+        """Meldet den Sessions regelmäßig Warteposition, Pausen und die verbleibende Encode-Zeit"""
+        while True:
+            time.sleep(ENCODE_REPORT_SECONDS)
+
+            now = time.monotonic()
+
+            updates = []
+            with self.lock:
+                # Plätze, die ein anderer Worker freigegeben hat, sieht nur dieser periodische Versuch
+                if shared_sessions and self.waiting:
+                    self.dispatch()
+
+                for job in [*self.running, *self.copies]:
+                    if job['timeout'] and not job['timed_out'] and job['process'] and job['process'].poll() is None and self.active_seconds(job, now) > job['timeout']:
+                        logger.error("Encode exceeded %ds of active time, stopping it", job['timeout'])
+
+                        job['timed_out'] = self.signal(job, signal.SIGKILL)
+
+                queue = sorted((job for job in self.waiting if not job['paused']), key=lambda job: self.priority(job, now))
+
+                for job in [*self.running, *self.waiting]:
+                    if not job['report'] or now - job['last_report'] < ENCODE_REPORT_SECONDS:
+                        continue
+                    job['last_report'] = now
+                    left = format_eta(self.remaining(job, now))
+                    if job['paused']:
+                        updates.append((job['report'], f"Paused for shorter conversions, ~{left} left"))
+
+                    elif job in queue:
+                        updates.append((job['report'], f"Waiting for a free encoder (position {queue.index(job) + 1}), ~{left} once started"))
+
+                    else:
+                        updates.append((job['report'], f"Converting, ~{left} left" if self.remaining(job, now) > 0 else "Converting, almost done"))
+
+            for report, status in updates:
+                report(status)
+
+    def wrap(self, cmd: List[str], threads: int, nice: Optional[int] = None) -> List[str]:
+        if cmd and cmd[0] == 'ffmpeg':
+            cmd = [*cmd[:-1], '-threads', str(threads), cmd[-1]]
+        prefix: List[str] = []
+        if self.taskset_cmd:
+            prefix.extend([self.taskset_cmd, '-c', ','.join(str(cpu) for cpu in self.encode_cpus)])
+
+        if self.ionice_cmd:
+            prefix.extend([self.ionice_cmd, '-c', '2', '-n', '7'])
+
+        nice = FFMPEG_NICE if nice is None else nice
+        if self.nice_cmd and nice:
+            prefix.extend([self.nice_cmd, '-n', str(nice)])
+
+        return [*prefix, *cmd]
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+
+        with self.lock:
+            running = len(self.running)
+
+            return {
+                'cpu_budget': self.cpu_budget,
+                'encode_cpus': self.encode_cpus,
+                'server_cpus': self.server_cpus,
+                'slots': self.slots,
+                'running_encodes': running,
+                'running_copies': len(self.copies),
+                'queued_encodes': sum(1 for job in self.waiting if not job['paused']),
+                'paused_encodes': sum(1 for job in self.waiting if job['paused']),
+                'preemptions': self.preemptions,
+                'remaining_seconds': [round(self.remaining(job, now), 1) for job in self.running],
+                'realtime_factors': {kind: round(factor, 3) for kind, factor in self.realtime_factors.items()},
+                'running_encodes_all_workers': self.running_total() if shared_sessions else running,
+                'threads_per_encode': self.threads_per_encode(),
+                'nice': FFMPEG_NICE if self.nice_cmd else None,
+                'ionice': bool(self.ionice_cmd),
+            }
+encode_governor = EncodeGovernor()
+def normalize_video_codec(codec: Optional[str]) -> str:
+    """ffprobe- und yt-dlp-Codecnamen (avc1.64001f, vp09.00…, av01…) auf h264/vp9/av1 abbilden"""
+    codec = (codec or '').lower()
+
+    if codec.startswith(('avc', 'h264')):
+        return 'h264'
+    if codec.startswith(('vp09', 'vp9')):
+        return 'vp9'
+    if codec.startswith(('av01', 'av1')):
+        return 'av1'
+    return codec
+class EncodeAutotune:
+    """Auf diesem Host gemessene x264-Presets pro Quell-Codec und Zielhöhe.
+
+    `server.py --autotune` kodiert kurze, lokal erzeugte Testclips (lavfi) mit jedem Preset und misst
+    Realtime-Faktor und Bits pro Pixel. Gewählt wird je Stufe das langsamste (also beste) Preset, das noch
+    STRIMDL_AUTOTUNE_MIN_SPEED erreicht. Das Standardprofil nutzt diese Wahl statt FFMPEG_VIDEO_PRESET.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.data: Optional[Dict[str, Any]] = None
+
+    def load(self) -> None:
+        if not STRIMDL_AUTOTUNE or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+
+            logger.info("Loaded encode autotune profile from %s (min speed %sx)", self.path, self.data.get('min_speed'))
+
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring encode autotune profile %s: %s", self.path, e)
+
+    def pick(self, codec: Optional[str], height: Optional[int]) -> Optional[str]:
+        """Preset für die kleinste gemessene Stufe, die die Zielhöhe abdeckt; unbekannte Codecs nutzen die H.264-Messung"""
+        if not self.data or not height:
+            return None
+        choices = self.data.get('choices', {})
+
+        tiers = choices.get(normalize_video_codec(codec)) or choices.get('h264') or {}
+
+        heights = sorted(int(tier) for tier in tiers)
+
+        if not heights:
+            return None
+        tier = next((candidate for candidate in heights if candidate >= height), heights[-1])
+
+        return tiers[str(tier)]
+
+    def apply(self, profile: Dict[str, Any], codec: Optional[str], height: Optional[int]) -> Dict[str, Any]:
+        """Ersetzt im Standardprofil das Preset durch die Host-Messung; andere Profile bleiben unverändert"""
+        if profile['name'] != DEFAULT_ENCODE_PROFILE:
+            return profile
+        preset = self.pick(codec, height)
+
+        if not preset or preset == profile['preset']:
+            return profile
+        logger.info("Autotuned preset for %s %sp: %s", normalize_video_codec(codec), height, preset)
+
+        return {**profile, 'preset': preset}
+
+    def measure(self, source_path: Path, output_path: Path, preset: str, width: int, height: int) -> Optional[Dict[str, Any]]:
+        cmd = [
+            'ffmpeg', '-v', 'error', '-i', str(source_path),
+            '-c:v', 'libx264', '-preset', preset, '-crf', FFMPEG_VIDEO_CRF, '-pix_fmt', 'yuv420p',
+            '-threads', str(encode_governor.threads_per_encode()), '-an', '-y', str(output_path)
+        ]
+        started = time.monotonic()
+
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+        elapsed = time.monotonic() - started
+        if result.returncode != 0 or not output_path.exists():
+            return None
+        frames = AUTOTUNE_CLIP_SECONDS * AUTOTUNE_FPS
+        return {
+            'preset': preset,
+            'speed': round(AUTOTUNE_CLIP_SECONDS / max(elapsed, 0.001), 2),
+            'bpp': round(output_path.stat().st_size * 8 / (width * height * frames), 4),
+        }
+
+    def run(self) -> Dict[str, Any]:
+        """Misst alle Stufen und schreibt das Host-Profil; ohne Netzwerk, nur ffmpeg und lavfi"""
+        import tempfile
+
+        results: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        choices: Dict[str, Dict[str, str]] = {}
+
+        with tempfile.TemporaryDirectory(dir=str(CACHE_DIR)) as work_dir:
+            for codec, codec_args in AUTOTUNE_SOURCE_CODECS.items():
+                for height in AUTOTUNE_HEIGHTS:
+                    width = height * 16 // 9 // 2 * 2
+                    source_path = Path(work_dir) / f"source_{codec}_{height}.mkv"
+                    generate = subprocess.run([
+                        'ffmpeg', '-v', 'error', '-f', 'lavfi',
+                        '-i', f"testsrc2=size={width}x{height}:rate={AUTOTUNE_FPS}:duration={AUTOTUNE_CLIP_SECONDS},noise=alls=12:allf=t+u",
+                        *codec_args, '-pix_fmt', 'yuv420p', '-y', str(source_path)
+                    ], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+                    if generate.returncode != 0:
+                        print(f"  {codec} {height}p: cannot generate test clip, skipping codec")
+
+                        break
+                    measurements = []
+                    for preset in AUTOTUNE_PRESETS:
+                        measurement = self.measure(source_path, Path(work_dir) / f"out_{preset}.mp4", preset, width, height)
+
+                        if not measurement:
+                            continue
+                        measurements.append(measurement)
+
+                        print(f"  {codec:>4} {height:>4}p {preset:>9}: {measurement['speed']:>6.2f}x realtime, {measurement['bpp']:.4f} bpp")
+
+                        # Langsamere Presets werden nur noch langsamer
+                        if measurement['speed'] < STRIMDL_AUTOTUNE_MIN_SPEED:
+                            break
+                    if not measurements:
+                        continue
+                    fast_enough = [m for m in measurements if m['speed'] >= STRIMDL_AUTOTUNE_MIN_SPEED]
+
+                    results.setdefault(codec, {})[str(height)] = measurements
+                    choices.setdefault(codec, {})[str(height)] = (fast_enough[-1] if fast_enough else measurements[0])['preset']
+
+        data = {
+            'host': platform.node(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'threads_per_encode': encode_governor.threads_per_encode(),
+            'cpu_budget': encode_governor.cpu_budget,
+            'crf': FFMPEG_VIDEO_CRF,
+            'min_speed': STRIMDL_AUTOTUNE_MIN_SPEED,
+            'clip_seconds': AUTOTUNE_CLIP_SECONDS,
+            'results': results,
+            'choices': choices,
+        }
+
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+
+        tmp_path.replace(self.path)
+
+        self.data = data
+        return data
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        if not self.data:
+            return None
+        return {key: self.data.get(key) for key in ('host', 'created_at', 'min_speed', 'choices')}
+encode_autotune = EncodeAutotune(STRIMDL_AUTOTUNE_PATH)
+class Tracer:
+    """Schreibt Spans als JSON-Lines und exportiert sie im Chrome-Trace-Event-Format (Perfetto).
+
+    Überschreitet die Datei TRACE_MAX_BYTES, wird sie nach <name>.1 rotiert; gelesen wird nur die aktuelle Datei.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, trace_id: str, name: str, category: str, **args: Any):
+        started = time.time()
+
+        started_monotonic = time.monotonic()
+
+        span_args: Dict[str, Any] = dict(args)
+
+        try:
+            yield span_args
+        finally:
+            record = {
+                'trace_id': trace_id,
+                'name': name,
+                'cat': category,
+                'ts': int(started * 1_000_000),
+                'dur': int((time.monotonic() - started_monotonic) * 1_000_000),
+                'tid': threading.get_ident(),
+                'args': span_args,
+            }
+
+            line = json.dumps(record, default=str)
+
+            with self.lock:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+
+                    size = f.tell()
+
+                if size > TRACE_MAX_BYTES:
+                    self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+
+    def read(self, trace_id: Optional[str] = None, limit: int = 5000) -> List[Dict[str, Any]]:
+        if not self.path.exists():
+            return []
+        with self.lock:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+
+        records = []
+        for line in reversed(lines):
+            try:
+                record = json.loads(line)
+
+            except ValueError:
+                continue
+            if trace_id and record.get('trace_id') != trace_id:
+                continue
+            records.append(record)
+
+            if len(records) >= limit:
+                break
+        records.reverse()
+
+        return records
+
+    def export_chrome(self, trace_id: Optional[str] = None) -> Dict[str, Any]:
+        """Jede trace_id wird ein eigener Prozess im Trace; pid muss dort eine Zahl sein, der Name kommt per Metadaten-Event"""
+        events = []
+        pids: Dict[str, int] = {}
+
+        for record in self.read(trace_id):
+            if record['trace_id'] not in pids:
+                pids[record['trace_id']] = len(pids) + 1
+                events.append({'name': 'process_name', 'ph': 'M', 'pid': pids[record['trace_id']], 'args': {'name': record['trace_id']}})
+
+            events.append({
+                'name': record['name'],
+                'cat': record['cat'],
+                'ph': 'X',
+                'ts': record['ts'],
+                'dur': record['dur'],
+                'pid': pids[record['trace_id']],
+                'tid': record['tid'],
+                'args': record.get('args', {}),
+            })
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+tracer = Tracer(STRIMDL_TRACE_PATH) if STRIMDL_TRACE else None
+def get_command_name(cmd: List[str]) -> str:
+    """Name des eigentlichen Tools, auch wenn nice/ionice/taskset vorangestellt sind"""
+    for part in cmd:
+        name = Path(part).name
+        if name in ('ffmpeg', 'ffprobe', 'yt-dlp'):
+            return name
+    return Path(cmd[0]).name if cmd else 'command'
+
+def get_available_memory() -> Optional[int]:
+    """Verfügbarer Speicher in Bytes; innerhalb eines Containers gilt das cgroup-Limit, falls es kleiner ist"""
+    available = None
+    try:
+        with open('/proc/meminfo', 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    available = int(line.split()[1]) * 1024
+
+                    break
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        limit = Path('/sys/fs/cgroup/memory.max').read_text(encoding='utf-8').strip()
+
+        if limit != 'max':
+            used = int(Path('/sys/fs/cgroup/memory.current').read_text(encoding='utf-8').strip())
+
+            cgroup_available = max(0, int(limit) - used)
+            available = cgroup_available if available is None else min(available, cgroup_available)
+
+    except (OSError, ValueError):
+        pass
+    return available
+class AdmissionController:
+    """Lässt neue Download-Jobs nur zu, solange Jobanzahl, CPU-Last, freier Speicherplatz und RAM unter den Grenzwerten liegen"""
+
+    def __init__(self, max_jobs: int, max_load: float, min_free_disk: int, min_free_memory: int):
+        self.max_jobs = max(1, max_jobs or encode_governor.cpu_budget * 2)
+        self.max_load = max_load
+        self.min_free_disk = min_free_disk
+        self.min_free_memory = min_free_memory
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.last_rejection: Optional[Dict[str, Any]] = None
+        self.lock = threading.Lock()
+
+    def measure(self) -> Dict[str, Any]:
+        try:
+            load = os.getloadavg()[0] / encode_governor.cpu_budget
+
+        except OSError:
+            load = None
+        try:
+            free_disk = shutil.disk_usage(CACHE_DIR).free
+
+        except OSError:
+            free_disk = None
+        return {'load_per_cpu': load, 'free_disk_bytes': free_disk, 'free_memory_bytes': get_available_memory()}
+
+    def check(self, active: int, state: Dict[str, Any]) -> List[str]:
+        reasons = []
+        if drain_coordinator.draining.is_set():
+            reasons.append("server is shutting down")
+
+        if active >= self.max_jobs:
+            reasons.append(f"{active} jobs running (limit {self.max_jobs})")
+
+        if self.max_load and state['load_per_cpu'] is not None and state['load_per_cpu'] >= self.max_load:
+            reasons.append(f"CPU load {state['load_per_cpu']:.2f} per CPU (limit {self.max_load:.2f})")
+
+        if self.min_free_disk and state['free_disk_bytes'] is not None and state['free_disk_bytes'] < self.min_free_disk:
+            reasons.append(f"{state['free_disk_bytes'] // 1024 ** 2} MB free in cache (minimum {self.min_free_disk // 1024 ** 2} MB)")
+
+        if self.min_free_memory and state['free_memory_bytes'] is not None and state['free_memory_bytes'] < self.min_free_memory:
+            reasons.append(f"{state['free_memory_bytes'] // 1024 ** 2} MB memory available (minimum {self.min_free_memory // 1024 ** 2} MB)")
+
+        return reasons
+
+    def active_total(self) -> int:
+        """Laufende Jobs aller Worker (Lock muss gehalten werden)"""
+        return max(self.active, shared_sessions.load('jobs')) if shared_sessions else self.active
+
+    def try_admit(self) -> List[str]:
+        """Reserviert einen Job-Platz; gibt die Ablehnungsgründe zurück (leer = zugelassen)"""
+        state = self.measure()
+
+        with self.lock:
+            reasons = self.check(self.active_total(), state)
+
+            if not reasons and shared_sessions and not shared_sessions.try_acquire('jobs', self.max_jobs, self.active):
+                reasons = [f"{self.max_jobs} jobs running across workers (limit {self.max_jobs})"]
+
+            if reasons:
+                self.rejected += 1
+                self.last_rejection = {'at': time.time(), 'reasons': reasons}
+            else:
+                self.active += 1
+                self.admitted += 1
+        return reasons
+
+    def release(self) -> None:
+        with self.lock:
+            self.active = max(0, self.active - 1)
+
+            if shared_sessions:
+                shared_sessions.set_load('jobs', self.active)
+
+    def is_overloaded(self) -> bool:
+        state = self.measure()
+
+        with self.lock:
+            return bool(self.check(self.active_total(), state))
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.measure()
+
+        with self.lock:
+            active = self.active_total()
+
+            reasons = self.check(active, state)
+
+            return {
+                'accepting': not reasons,
+                'reasons': reasons,
+                'active_jobs': active,
+                'worker_active_jobs': self.active,
+                'max_jobs': self.max_jobs,
+                'max_load_per_cpu': self.max_load,
+                'min_free_disk_bytes': self.min_free_disk,
+                'min_free_memory_bytes': self.min_free_memory,
+                'retry_after_seconds': STRIMDL_RETRY_AFTER_SECONDS,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'last_rejection': self.last_rejection,
+                **state,
+            }
+admission_controller = AdmissionController(
+    STRIMDL_MAX_JOBS,
+    STRIMDL_MAX_LOAD,
+    parse_rate(STRIMDL_MIN_FREE_DISK_RAW),
+    parse_rate(STRIMDL_MIN_FREE_MEMORY_RAW)
+)
+class DrainCoordinator:
+    """Geordnetes Herunterfahren bei SIGTERM.
+
+    Neue Jobs werden abgelehnt, laufende yt-dlp-Downloads sofort beendet (die .part-Dateien
+    bleiben liegen und der Download steht in resume_downloads), laufende Jobs dürfen bis zur
+    Deadline fertig werden. Als Job zählen alle /download-Anfragen (auch Cache-Treffer ohne
+    Admission), Prefetches und fortgesetzte Downloads. Danach werden übrige Prozessgruppen
+    beendet und der Server gestoppt.
+    """
+
+    def __init__(self, grace_seconds: int):
+        self.grace_seconds = grace_seconds
+        self.draining = threading.Event()
+        self.downloads: Dict[str, subprocess.Popen] = {}
+
+        self.jobs = 0
+        self.server: Optional[socketserver.BaseServer] = None
+        self.lock = threading.Lock()
+
+    def track_download(self, job_key: str, process: subprocess.Popen) -> None:
+        with self.lock:
+            self.downloads[job_key] = process
+
+    def untrack_download(self, job_key: str) -> None:
+        with self.lock:
+            self.downloads.pop(job_key, None)
+
+    @contextmanager
+    def track_job(self):
+        """Zählt einen laufenden Job, auf den das Herunterfahren bis zur Deadline wartet"""
+        with self.lock:
+            self.jobs += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.jobs -= 1
+
+    def active_jobs(self) -> int:
+        with self.lock:
+            return self.jobs
+
+    def begin(self, signum: int, frame: Any) -> None:
+        """Signal-Handler: setzt nur das Flag und startet den Drain-Thread, geloggt wird dort"""
+        if self.draining.is_set():
+            return
+        self.draining.set()
+
+        threading.Thread(target=self.drain, args=(signum,), daemon=True).start()
+
+    def signal_process_groups(self, processes: List[subprocess.Popen], sig: int) -> None:
+        for process in processes:
+            if process.poll() is not None:
+                continue
+            try:
+                os.killpg(process.pid, sig)
+
+                os.killpg(process.pid, signal.SIGCONT)
+
+            except ProcessLookupError:
+                pass
+            except Exception as e:
+                logger.warning("Could not signal process %s: %s", process.pid, e)
+
+    def drain(self, signum: int) -> None:
+        logger.info("Received signal %d, draining (deadline %ds)", signum, self.grace_seconds)
+
+        deadline = time.monotonic() + self.grace_seconds
+
+        with self.lock:
+            downloads = list(self.downloads.values())
+
+        if downloads:
+            logger.info("Interrupting %d download(s), they resume after restart", len(downloads))
+
+            self.signal_process_groups(downloads, signal.SIGTERM)
+
+        interrupt_deadline = min(deadline, time.monotonic() + DRAIN_INTERRUPT_SECONDS)
+        while any(process.poll() is None for process in downloads) and time.monotonic() < interrupt_deadline:
+            time.sleep(0.2)
+
+        while self.active_jobs() and time.monotonic() < deadline:
+            time.sleep(0.5)
+
+        remaining = session_registry.running_processes()
+
+        if remaining:
+            logger.warning("Drain deadline reached, terminating %d process group(s)", len(remaining))
+
+            self.signal_process_groups(remaining, signal.SIGTERM)
+
+        logger.info("Drain complete, stopping server")
+
+        if self.server:
+            self.server.shutdown()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {'draining': self.draining.is_set(), 'grace_seconds': self.grace_seconds, 'active_downloads': len(self.downloads), 'active_jobs': self.jobs}
+drain_coordinator = DrainCoordinator(STRIMDL_DRAIN_SECONDS)
+def get_preview_path(session_id: str) -> Path:
+    return PREVIEW_DIR / f"{CACHE_KEY_UNSAFE_PATTERN.sub('-', session_id)}.mp4"
+def stop_preview(session_id: str) -> None:
+    """Beendet die Vorschau einer Session und löscht ihre Datei"""
+    with preview_lock:
+        job = preview_jobs.pop(session_id, None)
+
+    if not job:
+        return
+    if job['process'].poll() is None:
+        try:
+            os.killpg(job['process'].pid, signal.SIGKILL)
+
+        except ProcessLookupError:
+            pass
+    job['process'].wait()
+
+    session = session_registry.get(session_id)
+
+    if session:
+        with session.lock:
+            if job['process'] in session.processes:
+                session.processes.remove(job['process'])
+
+    if shared_sessions:
+        shared_sessions.remove_process(job['process'].pid)
+
+    try:
+        job['path'].unlink()
+
+    except FileNotFoundError:
+        pass
+def terminate_session_process(session_id: str) -> bool:
+    """Markiert eine Session als abgebrochen und beendet ihre Prozessgruppe"""
+    stop_preview(session_id)
+
+    killed = False
+    session = session_registry.get_or_create(session_id)
+
+    with session.lock:
+        session.cancelled = True
+        pids = {process.pid for process in session.processes if process.poll() is None}
+
+    # Im Worker-Modus kann die Prozessgruppe zu einem anderen Worker gehören
+    if shared_sessions:
+        shared_sessions.set_cancelled(session_id, True)
+
+        pids.update(shared_sessions.session_pids(session_id))
+
+    for pid in pids:
+        try:
+            os.killpg(pid, signal.SIGTERM)
+
+            os.killpg(pid, signal.SIGCONT)
+
+            killed = True
+        except ProcessLookupError:
+            pass
+        except Exception as e:
+            logger.warning("Could not terminate process for session %s: %s", session_id, e)
+
+    return killed
+def twitter_syndication_token(tweet_id: str) -> str:
+    """Nachbau von ((id / 1e15) * PI).toString(36) ohne Nullen und Punkt, wie vom X-Embed erwartet"""
+    value = (int(tweet_id) / 1e15) * 3.141592653589793
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    integer_part = int(value)
+
+    fraction = value - integer_part
+    token = ''
+    while integer_part:
+        integer_part, remainder = divmod(integer_part, 36)
+
+        token = digits[remainder] + token
+    for _ in range(12):
+        fraction *= 36
+        digit = int(fraction)
+
+        token += digits[digit]
+        fraction -= digit
+        if not fraction:
+            break
+    return token.replace('0', '') or 'a'
+@contextmanager
+def inflight_guard(key: str):
+    """Verhindert, dass derselbe Cache-Key parallel mehrfach heruntergeladen wird"""
+    with inflight_lock:
+        entry = inflight_keys.setdefault(key, [threading.Lock(), 0])
+
+        entry[1] += 1
+    entry[0].acquire()
+
+    lock_file = None
+    try:
+        # Andere Worker-Prozesse sehen inflight_keys nicht, dort sperrt eine Lock-Datei
+        if STRIMDL_WORKERS > 1:
+            lock_file = open(INFLIGHT_LOCK_DIR / f"{key}.lock", 'w')
+
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        yield
+    finally:
+        if lock_file:
+            lock_file.close()
+
+        entry[0].release()
+
+        with inflight_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                inflight_keys.pop(key, None)
+def build_peer_ring() -> List[Tuple[int, str]]:
+    nodes = set(STRIMDL_PEERS)
+
+    if STRIMDL_PEER_SELF_URL:
+        nodes.add(STRIMDL_PEER_SELF_URL)
+
+    ring = []
+    for node in nodes:
+        for replica in range(PEER_RING_REPLICAS):
+            ring.append((int(hashlib.md5(f"{node}#{replica}".encode()).hexdigest(), 16), node))
+
+    return sorted(ring)
+PEER_RING = build_peer_ring()
+def get_peer_owner(cache_key: str) -> Optional[str]:
+    """Consistent Hashing: der erste Knoten im Ring nach dem Hash des Cache-Keys ist der Owner"""
+    if not PEER_RING or not STRIMDL_PEER_SELF_URL:
+        return None
+    key_hash = int(hashlib.md5(cache_key.encode()).hexdigest(), 16)
+
+    for node_hash, node in PEER_RING:
+        if node_hash >= key_hash:
+            return node
+    return PEER_RING[0][1]
+def cancel_prefetch_job(media_prefix: str, reason: str) -> None:
+    with prefetch_lock:
+        job = prefetch_jobs.get(media_prefix)
+
+    if job and job['thread'].is_alive():
+        logger.info("Cancelling prefetch for %s (%s)", job['url'], reason)
+
+        terminate_session_process(job['session_id'])
+def session_sweeper() -> None:
+    while True:
+        time.sleep(60)
+
+        removed = session_registry.sweep()
+
+        if shared_sessions:
+            shared_sessions.sweep(STRIMDL_SESSION_TTL_SECONDS)
+
+        with preview_lock:
+            expired = [session_id for session_id, job in preview_jobs.items() if time.time() - job['started_at'] > PREVIEW_TTL_SECONDS]
+
+        for session_id in expired:
+            stop_preview(session_id)
+
+        try:
+            cache_catalog.prune_jobs(JOB_HISTORY_MAX_ROWS)
+
+        except sqlite3.Error as e:
+            logger.warning("Could not prune job history: %s", e)
+
+        if removed:
+            logger.info("Session sweeper removed %d expired session(s)", removed)
+def prefetch_watchdog() -> None:
+    """Bricht Prefetch-Jobs ab, die nach STRIMDL_PREFETCH_IDLE_SECONDS nicht abgeholt wurden"""
+    while True:
+        time.sleep(5)
+
+        now = time.time()
+
+        with prefetch_lock:
+            idle_prefixes = [
+                media_prefix for media_prefix, job in prefetch_jobs.items()
+                if not job['claimed'] and now - job['started_at'] > STRIMDL_PREFETCH_IDLE_SECONDS
+            ]
+
+        for media_prefix in idle_prefixes:
+            cancel_prefetch_job(media_prefix, 'idle')
+            with prefetch_lock:
+                job = prefetch_jobs.get(media_prefix)
+
+                if job and not job['thread'].is_alive():
+                    prefetch_jobs.pop(media_prefix, None)
+class MediaWorker:
+    """Download- und Prozesslogik ohne HTTP-Verbindung.
+
+    RequestHandler erbt davon für Anfragen; Hintergrundjobs (Fortsetzen nach Neustart, Prefetch)
+    legen eine eigene Instanz an und bekommen so denselben Zustand pro Job wie eine Anfrage.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        self.reset_job_state()
+
+        super().__init__(*args, **kwargs)
+
+    def reset_job_state(self) -> None:
+        """Zustand pro Job; do_GET setzt ihn für jede Anfrage einer Keep-Alive-Verbindung neu"""
+        self.job_timings: Dict[str, Any] = {}
+
+        self.trace_id: Optional[str] = None
+
+        self.output_path: Optional[Path] = None
+
+        self.temporary_output: Optional[Path] = None
+
+    def is_session_cancelled(self, session_id: Optional[str]) -> bool:
+        if not session_id:
+            return False
+        if shared_sessions:
+            return shared_sessions.is_cancelled(session_id)
+
+        session = session_registry.get(session_id)
+
+        return bool(session and session.cancelled)
+
+    def cleanup_download_session(self, session_id: Optional[str]) -> None:
+        if not session_id:
+            return
+        stop_preview(session_id)
+
+        if shared_sessions:
+            shared_sessions.clear(session_id)
+
+        session = session_registry.get(session_id)
+
+        if not session:
+            return
+        with session.lock:
+            session.processes.clear()
+
+            session.cancelled = False
+        session_registry.discard_if_idle(session)
+
+    @contextmanager
+    def trace_span(self, name: str, category: str = 'stage', **args: Any):
+        trace_id = getattr(self, 'trace_id', None)
+
+        span = tracer.span(trace_id, name, category, **args) if tracer and trace_id else nullcontext({})
+        with log_scope(stage=name) if category == 'stage' else nullcontext(), span as span_args:
+            yield span_args
+
+    def wait_with_rusage(self, process: subprocess.Popen, timeout: Optional[int]) -> Tuple[Any, Any, Optional[Any]]:
+        """Liest die Pipes in Threads und erntet den Prozess selbst per os.wait4, um seine rusage zu erhalten"""
+        output: Dict[str, Any] = {}
+
+        def read_pipe(name: str, pipe) -> None:
+            output[name] = pipe.read()
+
+        readers = [
+            threading.Thread(target=read_pipe, args=('stdout', process.stdout), daemon=True),
+            threading.Thread(target=read_pipe, args=('stderr', process.stderr), daemon=True),
+        ]
+
+        for reader in readers:
+            reader.start()
+
+        deadline = time.monotonic() + timeout if timeout else None
+        delay = 0.005
+        rusage = None
+        while True:
+            try:
+                pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+
+            except ChildProcessError:
+                process.wait()
+
+                break
+            if pid:
+                process.returncode = os.waitstatus_to_exitcode(status)
+
+                break
+            if deadline and time.monotonic() > deadline:
+                # Die Reader-Threads besitzen die Pipes; Prozess beenden, ernten und die Threads auslaufen lassen
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+
+                except ProcessLookupError:
+                    pass
+                process.wait()
+
+                for reader in readers:
+                    reader.join()
+
+                raise subprocess.TimeoutExpired(process.args, timeout, output=output.get('stdout'), stderr=output.get('stderr'))
+            time.sleep(delay)
+
+            delay = min(delay * 2, 0.1)
+        for reader in readers:
+            reader.join()
+
+        return output.get('stdout'), output.get('stderr'), rusage
+
+    def start_session_process(self, cmd: List[str], session_id: Optional[str], **popen_args: Any) -> subprocess.Popen:
+        """Startet einen Prozess in eigener Prozessgruppe und hängt ihn an die Session, damit /cancel ihn erreicht"""
+        process = subprocess.Popen(cmd, start_new_session=True, **popen_args)
+
+        session = session_registry.get_or_create(session_id) if session_id else None
+        if session:
+            with session.lock:
+                session.processes.append(process)
+
+            if shared_sessions:
+                shared_sessions.add_process(session_id, process.pid)
+
+        return process
+
+    def release_session_process(self, session: Optional[Session], process: subprocess.Popen) -> None:
+        if session:
+            with session.lock:
+                if process in session.processes:
+                    session.processes.remove(process)
+
+                session.last_seen = time.time()
+
+            if shared_sessions:
+                shared_sessions.remove_process(process.pid)
+
+    def run_managed_command(
+        self,
+        cmd: List[str],
+        session_id: Optional[str] = None,
+        timeout: Optional[int] = None,
+        text: bool = False,
+        low_priority: bool = False,
+        on_start: Optional[Callable[[subprocess.Popen], None]] = None
+    ) -> subprocess.CompletedProcess:
+        if not tracer or not getattr(self, 'trace_id', None):
+            return self.execute_managed_command(cmd, session_id, timeout, text, low_priority, on_start)
+
+        with self.trace_span(get_command_name(cmd), 'subprocess', argv=cmd) as span:
+            result = self.execute_managed_command(cmd, session_id, timeout, text, low_priority, on_start, span)
+
+            span['returncode'] = result.returncode
+            return result
+
+    def execute_managed_command(
+        self,
+        cmd: List[str],
+        session_id: Optional[str] = None,
+        timeout: Optional[int] = None,
+        text: bool = False,
+        low_priority: bool = False,
+        on_start: Optional[Callable[[subprocess.Popen], None]] = None,
+        span: Optional[Dict[str, Any]] = None
+    ) -> subprocess.CompletedProcess:
+        if self.is_session_cancelled(session_id):
+            empty = '' if text else b''
+            return subprocess.CompletedProcess(cmd, -signal.SIGTERM, empty, 'Cancelled' if text else b'Cancelled')
+
+        if low_priority:
+            cmd = ['nice', '-n', '19', *cmd]
+
+        process = self.start_session_process(cmd, session_id, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=text)
+
+        session = session_registry.get(session_id) if session_id else None
+        if on_start:
+            on_start(process)
+
+        try:
+            if span is not None:
+                stdout, stderr, rusage = self.wait_with_rusage(process, timeout)
+
+                if rusage:
+                    span['user_cpu_seconds'] = rusage.ru_utime
+                    span['sys_cpu_seconds'] = rusage.ru_stime
+                    span['max_rss_kb'] = rusage.ru_maxrss
+            else:
+                stdout, stderr = process.communicate(timeout=timeout)
+
+        except subprocess.TimeoutExpired as e:
+            try:
+                if span is not None:
+                    # wait_with_rusage hat den Prozess schon beendet und seine Pipes ausgelesen
+                    stdout, stderr = e.output, e.stderr
+                else:
+                    os.killpg(process.pid, signal.SIGTERM)
+
+                    stdout, stderr = process.communicate(timeout=5)
+
+            except Exception:
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+
+                except Exception:
+                    pass
+                stdout, stderr = process.communicate()
+
+            timeout_msg = 'Command timed out'
+            if text:
+                stderr = f"{stderr or ''}\n{timeout_msg}".strip()
+
+            else:
+                stderr = (stderr or b'') + f"\n{timeout_msg}".encode()
+
+            return subprocess.CompletedProcess(cmd, 124, stdout, stderr)
+
+        finally:
+            self.release_session_process(session, process)
+
+        if self.is_session_cancelled(session_id) and process.returncode != 0:
+            if text:
+                stderr = f"{stderr or ''}\nCancelled".strip()
+
+            else:
+                stderr = (stderr or b'') + b'\nCancelled'
+        return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+    def build_yt_dlp_cmd(self, *args: str) -> List[str]:
+        cmd = ['yt-dlp', *pipe_args]
+        if YTDLP_COOKIES_PATH:
+            cmd.extend(['--cookies', YTDLP_COOKIES_PATH])
+
+        cmd.extend(args)
+
+        return cmd
+
+    def clean_yt_dlp_error(self, stderr: str) -> str:
+        error_msg = stderr.strip() or 'yt-dlp failed without an error message.'
+        if 'Sign in to confirm' in error_msg and '--cookies' in error_msg:
+            if YTDLP_COOKIES_PATH:
+                error_msg += f"\n\nCookies are configured via YTDLP_COOKIES_PATH={YTDLP_COOKIES_PATH}. Make sure the file is mounted into the container and still valid."
+            else:
+                error_msg += "\n\nYouTube is asking for browser cookies. Export a cookies.txt file and set YTDLP_COOKIES_PATH to its path inside the container."
+        return error_msg
+
+    def send_status_update(self, session_id: str, status: str) -> None:
+        """Sende Status-Update an SSE-Client"""
+        if shared_sessions:
+            shared_sessions.publish(session_id, status)
+
+            return
+        session = session_registry.get_or_create(session_id)
+
+        with session.lock:
+            if session.queue is not None:
+                session.queue.put(status)
+
+            session.buffer.append(status)
+
+            if len(session.buffer) > 10:
+                del session.buffer[:-10]
+
+    def send_progress_update(self, session_id: str, status: str) -> None:
+        """Status-Update aus Fortschritts-Threads; der Log-Eintrag wird pro Session gedrosselt"""
+        self.send_status_update(session_id, status)
+
+        logger.info("Progress: %s", status, extra={'progress': True, 'session_id': session_id})
+
+    def cleanup_status_queue(self, session_id: str) -> None:
+        """Entferne Status-Queue nach Download"""
+        session = session_registry.get(session_id)
+
+        if not session:
+            return
+        with session.lock:
+            session.queue = None
+            session.buffer.clear()
+
+        session_registry.discard_if_idle(session)
+
+    def parse_twitter_url(self, url: str) -> Optional[Tuple[str, str]]:
+        parsed_url = urllib.parse.urlparse(url)
+
+        path_parts = parsed_url.path.split('/')
+
+        if len(path_parts) >= 4 and path_parts[2] == 'status':
+            return path_parts[1], path_parts[3]
+        return None
+
+    def parse_media_id(self, url: str) -> Optional[Tuple[str, str]]:
+        """Leitet (extractor, video_id) lokal aus YouTube- und X-URLs ab, ohne Netzwerkzugriff"""
+        parsed_url = urllib.parse.urlparse(url.strip())
+
+        host = (parsed_url.hostname or '').lower()
+
+        if host.startswith('www.') or host.startswith('m.') or host.startswith('music.') or host.startswith('mobile.'):
+            host = host.split('.', 1)[1]
+        path_parts = [part for part in parsed_url.path.split('/') if part]
+
+        if host == 'youtu.be' and path_parts:
+            video_id = path_parts[0]
+        elif host in ('youtube.com', 'youtube-nocookie.com'):
+            video_id = urllib.parse.parse_qs(parsed_url.query).get('v', [''])[0]
+            if not video_id and len(path_parts) >= 2 and path_parts[0] in ('shorts', 'embed', 'live', 'v'):
+                video_id = path_parts[1]
+        elif host in ('twitter.com', 'x.com'):
+            url_info = self.parse_twitter_url(url)
+
+            if url_info and url_info[1].isdigit():
+                return 'twitter', url_info[1]
+            return None
+        else:
+            return None
+        if YOUTUBE_ID_PATTERN.fullmatch(video_id or ''):
+            return 'youtube', video_id
+        return None
+
+    def resolve_media_id(self, url: str, allow_network: bool = True) -> Tuple[str, str]:
+        media_id = self.parse_media_id(url)
+
+        if media_id:
+            return media_id
+        media_id = self.lookup_media_id(url)
+
+        if media_id:
+            return media_id
+        if not allow_network:
+            return 'url', hashlib.md5(url.strip().encode()).hexdigest()
+        # Gleichzeitige Anfragen für dieselbe URL warten auf einen einzigen yt-dlp-Aufruf
+        with inflight_guard(f"media-id-{hashlib.md5(url.encode()).hexdigest()}"):
+            media_id = self.lookup_media_id(url)
+
+            if media_id:
+                return media_id
+            media_id = self.fetch_media_id(url)
+
+        if not media_id:
+            return 'url', hashlib.md5(url.strip().encode()).hexdigest()
+        return media_id
+
+    def lookup_media_id(self, url: str) -> Optional[Tuple[str, str]]:
+        with media_id_lock:
+            media_id = media_id_cache.get(url)
+
+            if media_id:
+                media_id_cache.move_to_end(url)
+            return media_id
+
+    def store_media_id(self, url: str, media_id: Tuple[str, str]) -> None:
+        with media_id_lock:
+            media_id_cache[url] = media_id
+            media_id_cache.move_to_end(url)
+
+            while len(media_id_cache) > MEDIA_ID_CACHE_MAX_ENTRIES:
+                media_id_cache.popitem(last=False)
+
+    def fetch_media_id(self, url: str) -> Optional[Tuple[str, str]]:
+        """Fragt yt-dlp nach (extractor, id) einer URL und merkt sich das Ergebnis"""
+        media_id = None
+        try:
+            result = subprocess.run(
+                self.build_yt_dlp_cmd('--no-warnings', '--skip-download', '--print', '%(extractor_key)s %(id)s', url),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                timeout=30
+            )
+
+            fields = result.stdout.strip().splitlines()[0].split(' ', 1) if result.returncode == 0 and result.stdout.strip() else []
+
+            if len(fields) == 2:
+                media_id = (fields[0].lower(), fields[1])
+        except Exception as e:
+            logger.warning("Could not resolve extractor id for %s: %s", url, e)
+
+        if media_id:
+            self.store_media_id(url, media_id)
+
+        return media_id
+
+    def get_media_prefix(self, url: str, allow_network: bool = True) -> str:
+        """Cache-Präfix für alle Qualitäten eines Videos"""
+        extractor, video_id = self.resolve_media_id(url, allow_network)
+
+        return hashlib.md5(f"{extractor}:{video_id}".encode()).hexdigest()
+
+    def get_cache_key(self, url: str, quality: Optional[str] = None, allow_network: bool = True) -> str:
+        """Generiere einen Cache-Key aus (extractor, video_id, format_id)"""
+        cache_key = self.get_media_prefix(url, allow_network)
+
+        if quality:
+            cache_key += f"_{CACHE_KEY_UNSAFE_PATTERN.sub('-', quality)}"
+        return cache_key
+
+    def get_legacy_cache_key(self, url: str, quality: Optional[str] = None) -> str:
+        key_string = url
+        if quality:
+            key_string += f"_{quality}"
+        return hashlib.md5(key_string.encode()).hexdigest()
+
+    def get_cached_video_path(self, url: str, quality: Optional[str] = None) -> Path:
+        """Gibt den Pfad zum gecachten Video zurück, übernimmt alte URL-basierte Cache-Dateien"""
+        cache_key = self.get_cache_key(url, quality)
+
+        cache_path = CACHE_DIR / f"{cache_key}.mp4"
+
+        if not cache_path.exists():
+            legacy_path = CACHE_DIR / f"{self.get_legacy_cache_key(url, quality)}.mp4"
+
+            if legacy_path.exists():
+                try:
+                    legacy_path.rename(cache_path)
+
+                    logger.info("Migrated legacy cache file %s to %s", legacy_path.name, cache_path.name)
+
+                except OSError as e:
+                    logger.warning("Could not migrate legacy cache file %s: %s", legacy_path, e)
+
+                    return legacy_path
+        return cache_path
+
+    def run_prefetch(self, url: str, job: Dict[str, Any]) -> None:
+        session_id = job['session_id']
+        try:
+            with drain_coordinator.track_job(), log_scope(session_id=session_id, stage='prefetch'):
+                cache_path = self.download_and_cache_video(url, job['quality'], session_id, low_priority=True)
+
+            with prefetch_lock:
+                if cache_path:
+                    prefetched_cache_keys.add(cache_path.stem)
+
+                    prefetch_metrics['completed'] += 1
+                elif self.is_session_cancelled(session_id):
+                    prefetch_metrics['cancelled'] += 1
+                else:
+                    prefetch_metrics['failed'] += 1
+        except Exception as e:
+            logger.warning("Prefetch failed for %s: %s", url, e)
+
+            with prefetch_lock:
+                prefetch_metrics['failed'] += 1
+        finally:
+            self.cleanup_status_queue(session_id)
+
+            self.cleanup_download_session(session_id)
+
+    def open_peer_url(self, url: str, timeout: int):
+        request = urllib.request.Request(url, headers={
+            'X-StrimDL-Peer-Token': STRIMDL_PEER_TOKEN,
+            'User-Agent': f'StrimDL/{APP_VERSION}',
+        })
+
+        return urllib.request.urlopen(request, timeout=timeout)
+
+    def receive_peer_artifact(self, response, dest_path: Path, session_id: Optional[str] = None) -> bool:
+        """Speichert eine Peer-Antwort als .part-Datei und übernimmt sie nur bei passender SHA-256"""
+        expected = response.headers.get('X-StrimDL-SHA256', '')
+
+        tmp_path = dest_path.with_name(f"{dest_path.name}.peer.part")
+        digest = hashlib.sha256()
+
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in iter(lambda: response.read(PEER_CHUNK_SIZE), b''):
+                    if self.is_session_cancelled(session_id):
+                        raise InterruptedError('Cancelled')
+                    digest.update(chunk)
+
+                    f.write(chunk)
+
+            if not expected or not hmac.compare_digest(digest.hexdigest(), expected):
+                logger.warning("Peer artifact %s failed integrity check", dest_path.name)
+
+                tmp_path.unlink()
+
+                return False
+            tmp_path.replace(dest_path)
+
+            return True
+        except Exception as e:
+            logger.warning("Could not receive peer artifact %s: %s", dest_path.name, e)
+
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+            return False
+
+    def fetch_from_peers(self, dest_path: Path, kind: str, session_id: Optional[str] = None, url: Optional[str] = None, quality: Optional[str] = None) -> bool:
+        """Holt ein Artefakt von Peers; fehlt es überall, übernimmt der Owner-Knoten den Download"""
+        owner = get_peer_owner(dest_path.stem)
+
+        peers = [peer for peer in STRIMDL_PEERS if peer != STRIMDL_PEER_SELF_URL]
+        if owner in peers:
+            peers.remove(owner)
+
+            peers.insert(0, owner)
+
+        for peer in peers:
+            try:
+                with self.open_peer_url(f"{peer}/peer/cache/{dest_path.name}", timeout=10) as response:
+                    if self.receive_peer_artifact(response, dest_path, session_id):
+                        logger.info("Fetched %s from peer %s", dest_path.name, peer)
+
+                        cache_catalog.record_artifact(dest_path, kind, source_url=url, format_id=quality)
+
+                        return True
+            except urllib.error.HTTPError as e:
+                if e.code != 404:
+                    logger.warning("Peer %s returned %s for %s", peer, e.code, dest_path.name)
+            except Exception as e:
+                logger.warning("Peer %s unavailable: %s", peer, e)
+
+        if not url or not owner or owner == STRIMDL_PEER_SELF_URL:
+            return False
+        if session_id:
+            self.send_status_update(session_id, "Downloading via peer...")
+
+        query = urllib.parse.urlencode({'url': url, 'quality': quality or ''})
+
+        try:
+            with self.open_peer_url(f"{owner}/peer/source?{query}", timeout=1800) as response:
+                if self.receive_peer_artifact(response, dest_path, session_id):
+                    logger.info("Owner peer %s downloaded %s", owner, dest_path.name)
+
+                    cache_catalog.record_artifact(dest_path, kind, source_url=url, format_id=quality)
+
+                    return True
+        except Exception as e:
+            logger.warning("Owner peer %s could not provide %s: %s", owner, dest_path.name, e)
+
+        return False
+
+    def download_and_cache_video(self, url: str, quality: Optional[str] = None, session_id: Optional[str] = None, low_priority: bool = False, from_peer: bool = False) -> Optional[Path]:
+        """Lädt Video in gewählter Qualität herunter und cached es, gibt den Pfad zurück"""
+        cache_path = self.get_cached_video_path(url, quality)
+
+        self.job_timings['cache_key'] = cache_path.stem
+
+        if cache_path.exists():
+            logger.info("Using cached video: %s", cache_path)
+
+            cache_catalog.record_hit(cache_path)
+
+            cache_tiers.resolve(cache_path)
+
+            with prefetch_lock:
+                if cache_path.stem in prefetched_cache_keys:
+                    prefetched_cache_keys.discard(cache_path.stem)
+
+                    prefetch_metrics['hits'] += 1
+                    logger.info("Prefetch hit: %s", cache_path)
+
+            if session_id:
+                self.send_status_update(session_id, "Using cached video")
+
+            return cache_path
+        with inflight_guard(cache_path.stem):
+            if cache_path.exists():
+                cache_catalog.record_hit(cache_path)
+
+                cache_tiers.resolve(cache_path)
+
+                return cache_path
+            cache_tiers.record_miss()
+
+            if STRIMDL_PEERS and not from_peer:
+                download_started = time.monotonic()
+
+                if self.fetch_from_peers(cache_path, 'source', session_id, url=url, quality=quality):
+                    self.job_timings['download_seconds'] = time.monotonic() - download_started
+                    if session_id:
+                        self.send_status_update(session_id, "Video downloaded successfully")
+
+                    return cache_path
+            return self.download_source_video(url, quality, cache_path, session_id, low_priority)
+
+    def download_source_video(self, url: str, quality: Optional[str], cache_path: Path, session_id: Optional[str] = None, low_priority: bool = False) -> Optional[Path]:
+        logger.info("Downloading video to cache: %s, quality: %s", url, quality)
+
+        if quality:
+            format_spec = f'{quality}+bestaudio/best'
+        else:
+            format_spec = 'bestvideo+bestaudio/best'
+        report = (lambda status: self.send_progress_update(session_id, status)) if session_id else None
+
+        download_started = time.monotonic()
+
+        with bandwidth_governor.share(abort=lambda: self.is_session_cancelled(session_id), report=report) as limit:
+            args = ['-f', format_spec, '--merge-output-format', 'mp4', '--continue', *bandwidth_governor.limit_args(limit), '-o', str(cache_path)]
+            if STRIMDL_DOWNLOAD_ACCELERATION:
+                args.extend(['--concurrent-fragments', str(YTDLP_CONCURRENT_FRAGMENTS)])
+
+            cmd = self.build_yt_dlp_cmd(*args, url)
+
+            job_key = f"{cache_path.stem}:{uuid.uuid4().hex}"
+
+            def on_start(process: subprocess.Popen) -> None:
+                bandwidth_governor.register(job_key, process, cache_path.stem, report, limit)
+
+                drain_coordinator.track_download(job_key, process)
+
+            if limit is None:
+                result = subprocess.CompletedProcess(cmd, -signal.SIGTERM, b'', b'Cancelled')
+
+            else:
+                logger.info("Running: %s", LogCommand(cmd))
+
+                cache_catalog.record_resume(cache_path.stem, url, quality)
+
+                try:
+                    result = self.run_managed_command(
+                        cmd,
+                        session_id=session_id,
+                        timeout=1800,
+                        low_priority=low_priority,
+                        on_start=on_start
+                    )
+
+                finally:
+                    bandwidth_governor.unregister(job_key)
+
+                    drain_coordinator.untrack_download(job_key)
+
+        if result.returncode == 0 and cache_path.exists():
+            logger.info("Video cached successfully: %s", cache_path)
+
+            cache_catalog.clear_resume(cache_path.stem)
+
+            download_seconds = time.monotonic() - download_started
+            self.job_timings['download_seconds'] = download_seconds
+            cache_catalog.record_artifact(
+                cache_path,
+                'source',
+                source_id=':'.join(self.resolve_media_id(url, allow_network=False)),
+                source_url=url,
+                format_id=quality,
+                download_seconds=download_seconds
+            )
+
+            if session_id:
+                self.send_status_update(session_id, "Video downloaded successfully")
+
+            return cache_path
+        else:
+            error_msg = self.clean_yt_dlp_error(result.stderr.decode('utf-8', errors='ignore'))
+
+            if drain_coordinator.draining.is_set() and not self.is_session_cancelled(session_id):
+                logger.info("Download interrupted by shutdown, keeping partial files to resume: %s", url)
+
+                if session_id:
+                    self.send_status_update(session_id, "Server is restarting, the download will resume afterwards")
+
+                return None
+            cache_catalog.clear_resume(cache_path.stem)
+
+            if self.is_session_cancelled(session_id):
+                logger.info("Download cancelled while caching: %s", url)
+
+                for partial_file in CACHE_DIR.glob(f"{cache_path.stem}*"):
+                    try:
+                        partial_file.unlink()
+
+                    except Exception as e:
+                        logger.warning("Could not remove partial cache file %s: %s", partial_file, e)
+
+            else:
+                logger.error("Failed to cache video: %s", error_msg)
+
+            if session_id:
+                self.send_status_update(session_id, STATUS_CANCELLED if self.is_session_cancelled(session_id) else STATUS_FAILED)
+
+            return None
+class RequestHandler(MediaWorker, http.server.SimpleHTTPRequestHandler):
+    def cancel_download_session(self, session_id: str) -> bool:
+        killed = terminate_session_process(session_id)
+
+        self.send_status_update(session_id, STATUS_CANCELLED)
+
+        return killed
+    def log_message(self, format: str, *args: Any) -> None:
+        """Zugriffs-Log über die Log-Queue statt synchron nach stderr"""
+        logger.info("%s - " + format, self.address_string(), *args)
+
+    def run_encode_command(self, cmd: List[str], session_id: Optional[str] = None, timeout: Optional[int] = None, kind: str = 'h264', duration: Optional[float] = None, on_grant: Optional[Callable[[Dict[str, Any]], None]] = None) -> subprocess.CompletedProcess:
+        """Startet ffmpeg über den Encode-Scheduler mit eigenem Thread-Anteil, niedriger Priorität und optionaler CPU-Affinität.
+
+        on_grant wird mit dem Scheduler-Job aufgerufen, sobald der Encode-Platz zugeteilt ist.
+        """
+        report = (lambda status: self.send_progress_update(session_id, status)) if session_id else None
+        with encode_governor.slot(kind, duration, report=report, abort=lambda: self.is_session_cancelled(session_id), timeout=timeout) as job:
+            if job is None or self.is_session_cancelled(session_id):
+                return subprocess.CompletedProcess(cmd, -signal.SIGTERM, b'', b'Cancelled')
+
+            if on_grant:
+                on_grant(job)
+
+            # Der Timeout zählt im Scheduler nur aktive Laufzeit, Pausen durch Preemption verlängern ihn
+            result = self.run_managed_command(
+                encode_governor.wrap(cmd, job['threads']),
+                session_id=session_id,
+                on_start=lambda process: encode_governor.attach(job, process)
+            )
+
+            if job['timed_out']:
+                return subprocess.CompletedProcess(cmd, 124, result.stdout, (result.stderr or b'') + b'\nCommand timed out')
+            return result
+
+    def check_for_strimdl_update(self, force: bool = False) -> Dict[str, Any]:
+        global update_status_checked_at, update_status
+        now = time.time()
+
+        with update_status_lock:
+            if not force and update_status_checked_at and now - update_status_checked_at < UPDATE_CHECK_INTERVAL_SECONDS:
+                cached = dict(update_status)
+
+                cached['cached'] = True
+                cached['next_check_seconds'] = max(0, int(UPDATE_CHECK_INTERVAL_SECONDS - (now - update_status_checked_at)))
+
+                return cached
+        request_id = str(uuid.uuid4())
+
+        payload = {
+            'project': {
+                'id': STRIMDL_UPDATE_PROJECT_ID,
+                'instance_id': get_instance_id(),
+            },
+            'current': {
+                'version': APP_VERSION,
+            },
+            'channel': 'stable',
+            'platform': {
+                'os': platform.system().lower() or 'linux',
+                'arch': platform.machine(),
+                'container': 'docker',
+            },
+            'capabilities': {
+                'accept_prerelease': False,
+                'supports_delta': False,
+            },
+        }
+
+        endpoint = f"{STRIMDL_UPDATE_SERVER_URL}/api/updates/v1/updates/check"
+        body = json.dumps(payload).encode('utf-8')
+
+        request = urllib.request.Request(
+            endpoint,
+            data=body,
+            method='POST',
+            headers={
+                'Authorization': f'Bearer {STRIMDL_UPDATE_API_KEY}',
+                'Content-Type': 'application/json',
+                'X-Request-ID': request_id,
+                'User-Agent': f'StrimDL/{APP_VERSION}',
+            },
+        )
+
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                data = json.loads(response.read().decode('utf-8'))
+
+            normalized = {
+                'ok': True,
+                'status': data.get('status', 'unknown'),
+                'current_version': data.get('current', {}).get('version', APP_VERSION),
+                'project': data.get('project') or {},
+                'update': data.get('update'),
+                'message': data.get('message'),
+                'server_time': data.get('server_time'),
+                'request_id': data.get('request_id', request_id),
+                'devmode': STRIMDL_UPDATE_DEVMODE,
+                'check_interval_seconds': UPDATE_CHECK_INTERVAL_SECONDS,
+                'cached': False,
+                'next_check_seconds': UPDATE_CHECK_INTERVAL_SECONDS,
+            }
+
+            logger.info("StrimDL update check: %s", normalized['status'])
+
+        except urllib.error.HTTPError as e:
+            try:
+                error_data = json.loads(e.read().decode('utf-8'))
+
+            except Exception:
+                error_data = {'message': str(e)}
+
+            normalized = {
+                'ok': False,
+                'status': error_data.get('status', 'error'),
+                'current_version': APP_VERSION,
+                'message': error_data.get('message', str(e)),
+                'devmode': STRIMDL_UPDATE_DEVMODE,
+                'check_interval_seconds': UPDATE_CHECK_INTERVAL_SECONDS,
+                'cached': False,
+                'next_check_seconds': UPDATE_CHECK_INTERVAL_SECONDS,
+            }
+
+            logger.warning("StrimDL update check failed: %s", normalized['message'])
+
+        except Exception as e:
+            normalized = {
+                'ok': False,
+                'status': 'error',
+                'current_version': APP_VERSION,
+                'message': f'Update check unavailable: {e}',
+                'devmode': STRIMDL_UPDATE_DEVMODE,
+                'check_interval_seconds': UPDATE_CHECK_INTERVAL_SECONDS,
+                'cached': False,
+                'next_check_seconds': UPDATE_CHECK_INTERVAL_SECONDS,
+            }
+
+            logger.warning("StrimDL update check failed: %s", e)
+
+        with update_status_lock:
+            update_status = normalized
+            update_status_checked_at = time.time()
+
+        return dict(normalized)
+
+    def send_response(self, code: int, message: Optional[str] = None) -> None:
+        self.response_status = code
+        super().send_response(code, message)
+
+    def send_json_response(self, status_code: int, data: Dict[str, Any]) -> None:
+        self.send_response(status_code)
+
+        self.send_header('Content-type', 'application/json')
+
+        self.end_headers()
+
+        self.wfile.write(json.dumps(data).encode())
+
+    def get_status_queue(self, session_id: str) -> Queue:
+        """Hole oder erstelle Status-Queue für Session"""
+        session = session_registry.get_or_create(session_id)
+
+        if shared_sessions:
+            return shared_sessions.subscribe(session)
+
+        with session.lock:
+            if session.queue is None:
+                session.queue = Queue()
+
+                for buffered_status in session.buffer:
+                    session.queue.put(buffered_status)
+
+            return session.queue
+    def do_POST(self):
+        parsed_path = urllib.parse.urlparse(self.path)
+
+        if parsed_path.path == '/login':
+            content_length = int(self.headers.get('Content-Length', 0))
+
+            body = self.rfile.read(content_length)
+
+            try:
+                data = json.loads(body)
+
+                username = data.get('username', '')
+
+                password = data.get('password', '')
+
+                env_user = os.environ.get('STRIMDL_USER', '')
+
+                env_pass = os.environ.get('STRIMDL_PASS', '')
+
+                if username == env_user and password == env_pass:
+                    session = hashlib.sha256(f'{username}:{password}'.encode()).hexdigest()
+
+                    self.send_response(200)
+
+                    self.send_header('Content-type', 'application/json')
+
+                    self.send_header('Set-Cookie', f'session={session}; Path=/; HttpOnly')
+
+                    self.end_headers()
+
+                    self.wfile.write(json.dumps({'ok': True}).encode())
+
+                else:
+                    self.send_json_response(401, {'ok': False, 'reason': 'Invalid credentials'})
+
+            except Exception as e:
+                self.send_json_response(400, {'ok': False, 'reason': str(e)})
+
+        elif parsed_path.path == '/cancel':
+            if not self.is_authenticated():
+                self.send_json_response(401, {'ok': False, 'reason': 'Not authenticated'})
+
+                return
+            content_length = int(self.headers.get('Content-Length', 0))
+
+            body = self.rfile.read(content_length) if content_length else b'{}'
+            try:
+                data = json.loads(body)
+
+            except Exception:
+                data = {}
+
+            session_id = data.get('session_id', '')
+
+            if not session_id:
+                self.send_json_response(400, {'ok': False, 'reason': 'Missing session_id'})
+
+                return
+            with log_scope(session_id=session_id, stage='cancel'):
+                killed = self.cancel_download_session(session_id)
+
+                self.send_json_response(200, {'ok': True, 'cancelled': True, 'killed_process': killed})
+
+        elif parsed_path.path == '/metadata':
+            self.handle_metadata_batch()
+
+        elif parsed_path.path == '/logout':
+            self.send_response(200)
+
+            self.send_header('Content-type', 'application/json')
+
+            self.send_header('Set-Cookie', 'session=deleted; Path=/; Expires=Thu, 01 Jan 1970 00:00:00 GMT; HttpOnly')
+
+            self.end_headers()
+
+            self.wfile.write(json.dumps({'ok': True}).encode())
+
+        else:
+            self.send_json_response(404, {'ok': False, 'reason': f'Unknown POST endpoint: {self.path}'})
+
+    def is_authenticated(self):
+        env_user = os.environ.get('STRIMDL_USER', '')
+
+        env_pass = os.environ.get('STRIMDL_PASS', '')
+
+        if not env_user or not env_pass:
+            return True
+        cookie = self.headers.get('Cookie', '')
+
+        session = hashlib.sha256(f'{env_user}:{env_pass}'.encode()).hexdigest()
+
+        return f'session={session}' in cookie
+    def handle_index_page(self) -> None:
+        if not self.is_authenticated():
+            try:
                 with open(APP_ROOT / 'login.html', 'r', encoding='utf-8') as f:
                     html = f.read()
 
-                self.send_response(200)
+                self.send_response(200)
+
+                self.send_header('Content-type', 'text/html')
+
+                self.end_headers()
+
+                self.wfile.write(html.encode())
+
+            except Exception as e:
+                self.send_json_response(500, {'ok': False, 'reason': f'Error loading login page: {e}'})
+
+            return
+        try:
+            with open(APP_ROOT / 'index.html', 'r', encoding='utf-8') as f:
+                html = f.read().replace('{{APP_VERSION}}', APP_VERSION).replace('{{SAVE_ON_SERVER_DISPLAY}}', 'inline-flex' if is_save_dir_available() else 'none')
+
+            self.send_response(200)
+
+            self.send_header('Content-type', 'text/html')
+
+            self.end_headers()
+
+            self.wfile.write(html.encode())
+
+        except Exception as e:
+            self.send_json_response(500, {'ok': False, 'reason': f'Error loading index page: {e}'})
+
+    def collect_metrics(self) -> Dict[str, Any]:
+        with prefetch_lock:
+            prefetch = dict(prefetch_metrics)
+
+            prefetch['enabled'] = STRIMDL_PREFETCH
+            prefetch['running'] = sum(1 for job in prefetch_jobs.values() if job['thread'].is_alive())
+
+        return {'ok': True, 'worker': int(STRIMDL_WORKER_INDEX) if STRIMDL_WORKER_INDEX else None, 'sessions': session_registry.snapshot(), 'prefetch': prefetch, 'bandwidth': bandwidth_governor.snapshot(), 'encode': encode_governor.snapshot(), 'admission': admission_controller.snapshot(), 'drain': drain_coordinator.snapshot(), 'cache_tiers': cache_tiers.snapshot(), 'autotune': encode_autotune.snapshot()}
+    def get_youtube_title(self, url: str, session_id: Optional[str] = None) -> Optional[str]:
+        try:
+            result = self.run_managed_command(
+                self.build_yt_dlp_cmd('--get-title', url),
+                session_id=session_id,
+                text=True,
+                timeout=60
+            )
+
+            if result.returncode != 0:
+                raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+
+            return result.stdout.strip().replace('"', "'")
+
+        except subprocess.CalledProcessError as e:
+            logger.error("Could not fetch YouTube title: %s", self.clean_yt_dlp_error(e.stderr or ''))
+
+            return None
+    def remember_media_id(self, url: str, info: Dict[str, Any]) -> None:
+        """Merkt sich die vom Extractor gemeldete ID, damit spätere Lookups keinen Netzwerkaufruf brauchen"""
+        extractor = (info.get('extractor_key') or info.get('extractor') or '').lower()
+
+        video_id = info.get('id')
+
+        if extractor and video_id:
+            self.store_media_id(url, (extractor, str(video_id)))
+
+    def get_metadata_cache_key(self, url: str) -> str:
+        media_id = self.parse_media_id(url)
+
+        return ':'.join(media_id) if media_id else url.strip()
+
+    def fetch_video_info(self, url: str) -> Tuple[Dict[str, Any], bool]:
+        """Liefert die (gekürzten) yt-dlp-Metadaten eines Videos, aus dem Metadaten-Cache falls vorhanden.
+
+        Gibt zusätzlich zurück, ob der Eintrag aus dem Cache kam. Fehler von yt-dlp werden als
+        CalledProcessError bzw. TimeoutExpired weitergereicht.
+        """
+        cache_key = self.get_metadata_cache_key(url)
+
+        now = time.time()
+
+        with metadata_lock:
+            entry = metadata_cache.get(cache_key)
+
+            if entry and entry[0] > now:
+                return entry[1], True
+        result = subprocess.run(
+            self.build_yt_dlp_cmd('--no-warnings', '--skip-download', '-j', url),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True,
+            timeout=STRIMDL_METADATA_TIMEOUT
+        )
+
+        full_info = json.loads(result.stdout)
+
+        info = {key: full_info.get(key) for key in ('id', 'extractor_key', 'title', 'duration', 'thumbnail', 'uploader')}
+        info['formats'] = [
+            {key: fmt.get(key) for key in ('format_id', 'format_note', 'ext', 'height', 'vcodec', 'acodec', 'tbr', 'filesize_approx')}
+            for fmt in full_info.get('formats', [])
+        ]
+
+        self.remember_media_id(url, info)
+
+        if STRIMDL_METADATA_CACHE_SECONDS:
+            with metadata_lock:
+                if len(metadata_cache) >= METADATA_CACHE_MAX_ENTRIES:
+                    for stale_key in sorted(metadata_cache, key=lambda key: metadata_cache[key][0])[:METADATA_CACHE_MAX_ENTRIES // 10]:
+                        del metadata_cache[stale_key]
+
+                metadata_cache[cache_key] = (now + STRIMDL_METADATA_CACHE_SECONDS, info)
+
+        return info, False
+
+    def build_quality_list(self, info: Dict[str, Any]) -> List[Dict[str, Any]]:
+        qualities: List[Dict[str, Any]] = []
+        for fmt in info.get('formats', []):
+            fmt_id = fmt.get('format_id')
+
+            height = fmt.get('height')
+
+            note = fmt.get('format_note') or (f"{height}p" if height else '')
+
+            ext = fmt.get('ext', '')
+
+            size = fmt.get('filesize_approx') or 0
+            if ext == 'mhtml' or 'storyboard' in (note or '').lower():
+                continue
+            if height:
+                if note:
+                    label = f"{note} ({ext})"
+                else:
+                    label = f"{height}p ({ext})"
+                if size:
+                    label += f" ~{size//1024//1024}MB"
+                qualities.append({'format_id': fmt_id, 'label': label})
+
+        return qualities
+
+    def validate_video_url(self, url: str) -> Optional[str]:
+        """Fehlermeldung für URLs, die /yt-qualities und /metadata nicht annehmen"""
+        if not url or ('youtube.com' not in url and 'youtu.be' not in url):
+            return 'Invalid YouTube URL'
+        if 'list' in urllib.parse.parse_qs(urllib.parse.urlparse(url).query):
+            return 'Playlist links are not supported. Please use a single video URL.'
+        return None
+
+    def describe_metadata(self, index: int, url: str, info: Dict[str, Any], cached: bool) -> Dict[str, Any]:
+        return {
+            'index': index,
+            'url': url,
+            'ok': True,
+            'cached': cached,
+            'id': info.get('id'),
+            'title': info.get('title'),
+            'duration': info.get('duration'),
+            'thumbnail': info.get('thumbnail'),
+            'uploader': info.get('uploader'),
+            'qualities': self.build_quality_list(info),
+        }
+
+    def lookup_metadata(self, index: int, url: str) -> Dict[str, Any]:
+        """Ein Eintrag der Batch-Antwort; Fehler werden pro URL gemeldet statt die Anfrage abzubrechen"""
+        try:
+            return self.describe_metadata(index, url, *self.fetch_video_info(url))
+
+        except subprocess.TimeoutExpired:
+            return {'index': index, 'url': url, 'ok': False, 'reason': f'Timed out after {STRIMDL_METADATA_TIMEOUT}s'}
+
+        except subprocess.CalledProcessError as e:
+            return {'index': index, 'url': url, 'ok': False, 'reason': self.clean_yt_dlp_error(e.stderr or '')}
+
+        except Exception as e:
+            return {'index': index, 'url': url, 'ok': False, 'reason': str(e)}
+
+    def get_cached_metadata(self, index: int, url: str) -> Optional[Dict[str, Any]]:
+        with metadata_lock:
+            entry = metadata_cache.get(self.get_metadata_cache_key(url))
+
+            if not entry or entry[0] <= time.time():
+                return None
+        return self.describe_metadata(index, url, entry[1], True)
+
+    def handle_metadata_batch(self) -> None:
+        """Löst viele URLs parallel auf und streamt die Ergebnisse als NDJSON in Fertigstellungsreihenfolge"""
+        if not self.is_authenticated():
+            self.send_json_response(401, {'ok': False, 'reason': 'Not authenticated'})
+
+            return
+        content_length = int(self.headers.get('Content-Length', 0))
+
+        try:
+            data = json.loads(self.rfile.read(content_length) if content_length else b'{}')
+
+            urls = [str(url).strip() for url in data.get('urls', [])]
+
+        except Exception:
+            self.send_json_response(400, {'ok': False, 'reason': 'Expected JSON body {"urls": [...]}'})
+
+            return
+        if not urls:
+            self.send_json_response(400, {'ok': False, 'reason': 'Missing urls'})
+
+            return
+        if len(urls) > METADATA_BATCH_MAX_URLS:
+            self.send_json_response(400, {'ok': False, 'reason': f'At most {METADATA_BATCH_MAX_URLS} URLs per request'})
+
+            return
+        self.send_response(200)
+
+        self.send_header('Content-Type', 'application/x-ndjson')
+
+        self.send_header('Cache-Control', 'no-cache')
+
+        self.send_header('X-Accel-Buffering', 'no')
+        self.end_headers()
+
+        pending: Dict[Any, int] = {}
+        try:
+            for index, url in enumerate(urls):
+                error_msg = self.validate_video_url(url)
+
+                item = {'index': index, 'url': url, 'ok': False, 'reason': error_msg} if error_msg else self.get_cached_metadata(index, url)
+
+                if item:
+                    self.wfile.write((json.dumps(item) + '\n').encode())
+
+                else:
+                    pending[metadata_executor.submit(self.lookup_metadata, index, url)] = index
+            self.wfile.flush()
+
+            for future in as_completed(pending):
+                self.wfile.write((json.dumps(future.result()) + '\n').encode())
+
+                self.wfile.flush()
+
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Metadata batch client disconnected, dropping queued lookups")
+
+            for future in pending:
+                future.cancel()
+
+    def get_legacy_qualities(self, url: str) -> List[str]:
+        """Format-IDs eines Videos für die alten Cache-Namen md5(url_quality); leer, wenn keine Metadaten erreichbar sind"""
+        try:
+            info, _ = self.fetch_video_info(url)
+
+        except Exception as e:
+            logger.warning("Could not list formats of %s for legacy cache cleanup: %s", url, e)
+
+            return []
+        return [fmt['format_id'] for fmt in info.get('formats', []) if fmt.get('format_id')]
+
+    def clear_cache_for_url(self, url: str) -> None:
+        """Löscht alle Cache-Dateien für ein Video (alle Qualitäten und URL-Varianten).
+
+        Neben den Namen aus (extractor, id) werden auch die alten URL-basierten Namen gelöscht,
+        ohne Qualität (md5(url)) und je Format-ID des Videos (md5(url_quality)).
+        """
+        try:
+            prefixes = [self.get_media_prefix(url, allow_network=False), self.get_legacy_cache_key(url)]
+            prefixes.extend(self.get_legacy_cache_key(url, quality) for quality in self.get_legacy_qualities(url))
+
+            for prefix in prefixes:
+                for cache_file in CACHE_DIR.glob(f"{prefix}*"):
+                    cache_file.unlink()
+
+                    logger.info("Deleted cache file: %s", cache_file)
+
+                cache_catalog.remove_prefix(prefix)
+
+                cache_tiers.discard_prefix(prefix)
+
+        except Exception as e:
+            logger.error("Error clearing cache: %s", e)
+
+    def pick_prefetch_quality(self, info: Dict[str, Any]) -> Optional[str]:
+        """Wählt den wahrscheinlichsten Download: bester H.264-Stream bis FFMPEG_MAX_HEIGHT"""
+        candidates = []
+        for fmt in info.get('formats', []):
+            height = fmt.get('height')
+
+            vcodec = (fmt.get('vcodec') or '').lower()
+
+            if not height or not vcodec.startswith('avc1'):
+                continue
+            if FFMPEG_MAX_HEIGHT and height > FFMPEG_MAX_HEIGHT:
+                continue
+            candidates.append((height, fmt.get('tbr') or 0, fmt.get('format_id')))
+
+        if not candidates:
+            return None
+        return max(candidates)[2]
+
+    def start_prefetch(self, url: str, info: Dict[str, Any]) -> None:
+        """Startet nach einer Qualitätsabfrage einen Hintergrund-Download mit niedriger Priorität"""
+        quality = self.pick_prefetch_quality(info)
+
+        if not quality or self.get_cached_video_path(url, quality).exists():
+            return
+        if admission_controller.is_overloaded():
+            logger.info("Skipping prefetch of %s, server is under load", url)
+
+            return
+        media_prefix = self.get_media_prefix(url)
+
+        with prefetch_lock:
+            job = prefetch_jobs.get(media_prefix)
+
+            if job and job['thread'].is_alive():
+                return
+            running = sum(1 for other in prefetch_jobs.values() if other['thread'].is_alive())
+
+            if running >= encode_governor.slots:
+                logger.info("Skipping prefetch of %s, %d prefetches already running", url, running)
+
+                return
+            session_id = f"prefetch-{self.get_cache_key(url, quality)}"
+            job = {
+                'url': url,
+                'quality': quality,
+                'session_id': session_id,
+                'started_at': time.time(),
+                'claimed': False,
+            }
+
+            # Eigener Worker, damit der Prefetch nicht in die Job-Daten der nächsten Anfrage dieser Verbindung schreibt
+            job['thread'] = threading.Thread(target=MediaWorker().run_prefetch, args=(url, job), daemon=True)
+
+            prefetch_jobs[media_prefix] = job
+            prefetch_metrics['started'] += 1
+
+        logger.info("Prefetching %s with quality %s", url, quality)
+
+        job['thread'].start()
+
+    def claim_prefetch(self, url: str, quality: Optional[str], session_id: str) -> None:
+        """Wartet auf einen passenden Prefetch oder bricht einen unpassenden ab"""
+        with prefetch_lock:
+            job = prefetch_jobs.pop(self.get_media_prefix(url, allow_network=False), None)
+
+        if not job or not job['thread'].is_alive():
+            return
+        if job['quality'] != quality:
+            killed = terminate_session_process(job['session_id'])
+
+            logger.info("Cancelled prefetch for %s, different quality requested (killed=%s)", url, killed)
+
+            job['thread'].join(timeout=10)
+
+            return
+        job['claimed'] = True
+        self.send_status_update(session_id, "Waiting for prefetched download...")
+
+        while job['thread'].is_alive():
+            if self.is_session_cancelled(session_id):
+                terminate_session_process(job['session_id'])
+
+                break
+            job['thread'].join(timeout=1)
+
+    def is_peer_request(self) -> bool:
+        token = self.headers.get('X-StrimDL-Peer-Token', '')
+
+        return bool(STRIMDL_PEER_TOKEN) and hmac.compare_digest(token, STRIMDL_PEER_TOKEN)
+
+    def send_peer_artifact(self, file_path: Path) -> None:
+        sha256 = cache_catalog.get_sha256(file_path)
+
+        cache_catalog.record_hit(file_path)
+
+        read_path = cache_tiers.resolve(file_path)
+
+        self.send_response(200)
+
+        self.send_header('Content-Type', 'application/octet-stream')
+
+        self.send_header('Content-Length', str(file_path.stat().st_size))
+
+        self.send_header('X-StrimDL-SHA256', sha256)
+
+        self.end_headers()
+
+        with open(read_path, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, PEER_CHUNK_SIZE)
+
+    def handle_peer_request(self, parsed_path: urllib.parse.ParseResult) -> None:
+        if not STRIMDL_PEER_TOKEN:
+            self.send_json_response(404, {'ok': False, 'reason': 'Not found'})
+
+            return
+        if not self.is_peer_request():
+            self.send_json_response(401, {'ok': False, 'reason': 'Invalid peer token'})
+
+            return
+        if parsed_path.path.startswith('/peer/cache/'):
+            file_name = parsed_path.path[len('/peer/cache/'):]
+            file_path = CACHE_DIR / file_name
+            if not PEER_FILE_PATTERN.fullmatch(file_name) or not file_path.is_file():
+                self.send_json_response(404, {'ok': False, 'reason': 'Not cached'})
+
+                return
+            self.send_peer_artifact(file_path)
+
+        elif parsed_path.path == '/peer/source':
+            query = urllib.parse.parse_qs(parsed_path.query)
+
+            url = query.get('url', [''])[0]
+            quality = query.get('quality', [''])[0] or None
+
+            if not url:
+                self.send_json_response(400, {'ok': False, 'reason': 'Missing url'})
+
+                return
+            cache_path = self.get_cached_video_path(url, quality)
+
+            if not cache_path.exists():
+                # Der Owner lädt für einen Peer wie für /download: gleiche Zulassung, gleiches Drain-Tracking
+                reasons = admission_controller.try_admit()
+
+                if reasons:
+                    self.send_overloaded_response(reasons)
+
+                    return
+                try:
+                    with drain_coordinator.track_job(), log_scope(session_id=f"peer-{cache_path.stem}", stage='peer'):
+                        cache_path = self.download_and_cache_video(url, quality, from_peer=True)
+
+                finally:
+                    admission_controller.release()
+
+            else:
+                cache_path = self.download_and_cache_video(url, quality, from_peer=True)
+
+            if not cache_path:
+                self.send_json_response(502, {'ok': False, 'reason': 'Owner could not download source'})
+
+                return
+            self.send_peer_artifact(cache_path)
+
+        else:
+            self.send_json_response(404, {'ok': False, 'reason': f'Unknown peer endpoint: {parsed_path.path}'})
+
+    def pipeline_may_encode(self, url: str, quality: Optional[str], output_format: str, profile: Dict[str, Any]) -> bool:
+        """Vorabprüfung aus dem Metadaten-Cache, ob das gewählte Format überhaupt neu kodiert wird.
+
+        Liefert nur dann False, wenn der Cache-Eintrag sicher ein reines Remuxing zeigt; ohne Eintrag
+        oder bei zusammengesetzter Formatauswahl entscheidet plan_pipeline wie bisher.
+        """
+        if output_format == 'mp3' or profile['target_bytes'] or profile_requires_encode(profile) or not quality or any(char in quality for char in '+/[,'):
+            return True
+        with metadata_lock:
+            entry = metadata_cache.get(self.get_metadata_cache_key(url))
+
+        if not entry or entry[0] <= time.time():
+            return True
+        video = next((fmt for fmt in entry[1].get('formats', []) if fmt.get('format_id') == quality), None)
+
+        if not video or video.get('vcodec') in (None, 'none') or not video.get('height'):
+            return True
+        if normalize_video_codec(video.get('vcodec')) in ('vp9', 'av1', 'vp8'):
+            return True
+        return bool(profile['max_height'] and video['height'] > profile['max_height'])
+
+    def plan_pipeline(self, url: str, quality: Optional[str], output_format: str, profile: Dict[str, Any], session_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Bestimmt vor dem Download anhand der yt-dlp-Metadaten die Streams und ob neu kodiert werden muss"""
+        if not self.pipeline_may_encode(url, quality, output_format, profile):
+            return None
+        format_spec = f'{quality}+bestaudio/best' if quality else 'bestvideo+bestaudio/best'
+        result = self.run_managed_command(
+            self.build_yt_dlp_cmd('--no-warnings', '--skip-download', '-j', '-f', format_spec, url),
+            session_id=session_id,
+            text=True,
+            timeout=60
+        )
+
+        if result.returncode != 0 or not result.stdout.strip():
+            return None
+        try:
+            info = json.loads(result.stdout.strip().splitlines()[0])
+
+        except json.JSONDecodeError:
+            return None
+        streams = info.get('requested_formats') or [info]
+        if not all(stream.get('format_id') for stream in streams):
+            return None
+        video_index = next((index for index, stream in enumerate(streams) if stream.get('vcodec') not in (None, 'none')), None)
+        audio_index = next((index for index, stream in enumerate(streams) if stream.get('acodec') not in (None, 'none')), None)
+
+        duration = info.get('duration')
+        if profile['target_bytes'] and not duration:
+            return None
+        if output_format == 'mp3':
+            if audio_index is None:
+                return None
+            inputs = [audio_index]
+            encode_args = ['-map', '0:a:0', *build_mp3_encode_args(profile, duration)]
+        else:
+            if video_index is None:
+                return None
+            video = streams[video_index]
+            codec = (video.get('vcodec') or '').split('.')[0].lower()
+
+            source_height = video.get('height')
+            target_height = source_height
+            if target_height and profile['max_height'] and target_height > profile['max_height']:
+                target_height = profile['max_height']
+            source_size = sum(stream.get('filesize') or stream.get('filesize_approx') or 0 for stream in streams)
+            over_size = profile['target_bytes'] and (not source_size or source_size > profile['target_bytes'])
+            if codec not in ('vp9', 'vp09', 'av01', 'av1', 'vp8') and target_height == source_height and not over_size and not profile_requires_encode(profile):
+                return None
+            inputs = sorted({video_index, audio_index} - {None})
+            encode_args = ['-map', f'{inputs.index(video_index)}:v:0']
+            if audio_index is not None:
+                encode_args.extend(['-map', f'{inputs.index(audio_index)}:a:0'])
+
+            if target_height != source_height:
+                encode_args.extend(['-vf', f'scale=-2:{target_height}'])
+
+            encode_args.extend(build_video_encode_args(encode_autotune.apply(profile, codec, target_height), duration))
+
+        return {'streams': streams, 'inputs': inputs, 'encode_args': encode_args, 'kind': 'mp3' if output_format == 'mp3' else 'h264', 'duration': duration}
+
+    def tee_stream(self, process: subprocess.Popen, part_path: Path, pipe_fd: Optional[int]) -> None:
+        """Schreibt die Ausgabe von yt-dlp in die Cache-Datei und gleichzeitig in die Pipe zu ffmpeg"""
+        sink = os.fdopen(pipe_fd, 'wb', buffering=PIPELINE_CHUNK_SIZE) if pipe_fd is not None else None
+        try:
+            with open(part_path, 'wb') as part:
+                while True:
+                    chunk = process.stdout.read(PIPELINE_CHUNK_SIZE)
+
+                    if not chunk:
+                        break
+                    part.write(chunk)
+
+                    if sink:
+                        try:
+                            sink.write(chunk)
+
+                        except (BrokenPipeError, OSError):
+                            sink = None
+        finally:
+            if sink:
+                try:
+                    sink.close()
+
+                except (BrokenPipeError, OSError):
+                    pass
+
+    def download_and_convert_pipelined(self, url: str, output_format: str, quality: Optional[str] = None, session_id: Optional[str] = None, profile: Optional[Dict[str, Any]] = None) -> Optional[Path]:
+        """Startet ffmpeg schon während yt-dlp lädt; die Rohdaten landen parallel im Cache.
+
+        Liefert den Pfad der konvertierten Datei; gelesen wird sie erst beim Senden.
+
+        Gibt None zurück, wenn sich die Pipeline nicht lohnt (Cache-Treffer, reines Remuxing) oder
+        fehlschlägt. Der Aufrufer fällt dann auf Download und Konvertierung nacheinander zurück.
+        """
+        profile = profile or get_encode_profile(None)
+
+        cache_path = self.get_cached_video_path(url, quality)
+
+        output_path = self.get_converted_path(cache_path, output_format, profile)
+
+        self.output_path = output_path
+
+        if cache_path.exists() or (STRIMDL_CACHE_CONVERTED and output_path.exists()):
+            return None
+        plan = self.plan_pipeline(url, quality, output_format, profile, session_id)
+
+        if not plan:
+            return None
+        with inflight_guard(cache_path.stem):
+            if cache_path.exists():
+                return None
+            cache_tiers.record_miss()
+
+            logger.info("Pipelining download and conversion: %s, quality: %s", url, quality)
+
+            if session_id:
+                self.send_status_update(session_id, "Downloading and converting...")
+
+            self.job_timings['cache_key'] = cache_path.stem
+            streams = plan['streams']
+            part_paths = [CACHE_DIR / f"{cache_path.stem}.{CACHE_KEY_UNSAFE_PATTERN.sub('-', stream['format_id'])}.part" for stream in streams]
+            pipes = {index: os.pipe() for index in plan['inputs']}
+            read_fds = [read_fd for read_fd, _ in pipes.values()]
+            write_fds = {index: write_fd for index, (_, write_fd) in pipes.items()}
+            remux_path = cache_path.with_suffix('.remux.mp4')
+            tmp_path = CACHE_DIR / f"{cache_path.stem}.pipeline-{uuid.uuid4().hex[:8]}.{'mp3' if output_format == 'mp3' else 'mp4'}"
+            processes: List[subprocess.Popen] = []
+            threads: List[threading.Thread] = []
+            errors: Dict[int, bytes] = {}
+            job_keys: List[str] = []
+            session = session_registry.get_or_create(session_id) if session_id else None
+            started = time.monotonic()
+
+            encode_errors: List[bytes] = []
+
+            def read_errors(index: int, process: subprocess.Popen) -> None:
+                errors[index] = process.stderr.read()
+
+            def read_encode_errors(process: subprocess.Popen) -> None:
+                for line in process.stderr:
+                    encode_errors.append(line)
+
+                    del encode_errors[:-20]
+
+            try:
+                report = (lambda status: self.send_progress_update(session_id, status)) if session_id else None
+                # Ein gemeinsamer Anteil für alle Streams: ffmpeg liest sie gleichzeitig, einzeln wartende Streams würden es blockieren
+                with encode_governor.slot(plan['kind'], plan['duration'], preemptible=False, abort=lambda: self.is_session_cancelled(session_id)) as encode_job, bandwidth_governor.share(len(streams), abort=lambda: self.is_session_cancelled(session_id), report=report) as limit:
+                    if encode_job is None or limit is None:
+                        return None
+                    cmd = ['ffmpeg', '-nostats']
+                    for index in plan['inputs']:
+                        cmd.extend(['-i', f'pipe:{pipes[index][0]}'])
+
+                    cmd = encode_governor.wrap([*cmd, *plan['encode_args'], '-y', str(tmp_path)], encode_job['threads'])
+                    logger.info("Running: %s", LogCommand(cmd))
+
+                    encoder = self.start_session_process(cmd, session_id, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, pass_fds=read_fds)
+
+                    processes.append(encoder)
+
+                    encode_reader = threading.Thread(target=read_encode_errors, args=(encoder,), daemon=True)
+                    encode_reader.start()
+
+                    while read_fds:
+                        os.close(read_fds.pop())
+
+                    for index, stream in enumerate(streams):
+                        args = ['--no-progress', '-f', stream['format_id'], *bandwidth_governor.limit_args(limit), '-o', '-']
+                        if STRIMDL_DOWNLOAD_ACCELERATION:
+                            args.extend(['--concurrent-fragments', str(YTDLP_CONCURRENT_FRAGMENTS)])
+
+                        downloader = self.start_session_process(self.build_yt_dlp_cmd(*args, url), session_id, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+                        processes.append(downloader)
+
+                        job_key = f"{cache_path.stem}:{uuid.uuid4().hex}"
+                        job_keys.append(job_key)
+                        bandwidth_governor.register(job_key, downloader, part_paths[index].stem, report if index == 0 else None, limit)
+
+                        threads.append(threading.Thread(target=self.tee_stream, args=(downloader, part_paths[index], write_fds.pop(index, None)), daemon=True))
+
+                        threads.append(threading.Thread(target=read_errors, args=(index, downloader), daemon=True))
+
+                    for thread in threads:
+                        thread.start()
+
+                    for thread in threads:
+                        thread.join(timeout=max(1, 1800 - (time.monotonic() - started)))
+
+                    if any(thread.is_alive() for thread in threads):
+                        logger.error("Pipelined download timeout")
+
+                        for downloader in processes[1:]:
+                            os.killpg(downloader.pid, signal.SIGKILL)
+
+                    downloads_ok = all(process.wait() == 0 for process in processes[1:])
+                    download_seconds = time.monotonic() - started
+                    try:
+                        encoder.wait(timeout=max(1, 1800 - download_seconds))
+
+                    except subprocess.TimeoutExpired:
+                        os.killpg(encoder.pid, signal.SIGKILL)
+
+                        encoder.wait()
+
+                    encode_reader.join(timeout=5)
+                    encode_stderr = b''.join(encode_errors)
+
+                if self.is_session_cancelled(session_id):
+                    logger.info("Pipelined download cancelled: %s", url)
+
+                    return None
+                if not downloads_ok:
+                    logger.warning("Pipelined download failed: %s", self.clean_yt_dlp_error(b''.join(errors.values()).decode('utf-8', errors='ignore')))
+
+                    return None
+                remux_cmd = ['ffmpeg']
+                for part_path in part_paths:
+                    remux_cmd.extend(['-i', str(part_path)])
+
+                remux_cmd.extend(['-map', '0', *[arg for index in range(1, len(part_paths)) for arg in ('-map', str(index))], '-c', 'copy', '-movflags', '+faststart', '-y', str(remux_path)])
+
+                remux_result = self.run_managed_command(remux_cmd, session_id=session_id, timeout=600)
+
+                if remux_result.returncode != 0:
+                    logger.warning("Could not store pipelined source in cache: %s", remux_result.stderr.decode('utf-8', errors='ignore'))
+
+                    return None
+                remux_path.replace(cache_path)
+
+                self.job_timings['download_seconds'] = download_seconds
+                cache_catalog.record_artifact(
+                    cache_path,
+                    'source',
+                    source_id=':'.join(self.resolve_media_id(url, allow_network=False)),
+                    source_url=url,
+                    format_id=quality,
+                    download_seconds=download_seconds
+                )
+
+                if session_id:
+                    self.send_status_update(session_id, "Video downloaded successfully")
+
+                if encoder.returncode != 0 or not tmp_path.exists():
+                    logger.warning("Pipelined conversion failed, converting from cache: %s", encode_stderr.decode('utf-8', errors='ignore')[-500:])
+
+                    return None
+                logger.info("Pipelined conversion successful, size: %d bytes", tmp_path.stat().st_size)
+
+                self.record_encode_timing(cache_path, time.monotonic() - started)
+
+                return self.store_converted_output(tmp_path, output_path, url, quality)
+            except Exception as e:
+                logger.error("Error in download/convert pipeline: %s", e)
+
+                return None
+            finally:
+                for job_key in job_keys:
+                    bandwidth_governor.unregister(job_key)
+
+                for process in processes:
+                    if process.poll() is None:
+                        try:
+                            os.killpg(process.pid, signal.SIGKILL)
+
+                        except ProcessLookupError:
+                            pass
+                    self.release_session_process(session, process)
+
+                for fd in (*read_fds, *write_fds.values()):
+                    os.close(fd)
+
+                for leftover in (*part_paths, tmp_path, remux_path):
+                    if leftover.exists() and leftover != self.temporary_output:
+                        leftover.unlink()
+
+    def probe_duration(self, cache_path: Path) -> Optional[float]:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'quiet', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', str(cache_path)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+
+        try:
+            return float(result.stdout.strip())
+
+        except ValueError:
+            return None
+
+    def clip_needs_exact_cut(self, full_path: Path, url: str, quality: Optional[str], output_format: str, profile: Dict[str, Any]) -> bool:
+        """True, wenn auf den Ausschnitt ohnehin eine Neukodierung folgt; dann wird er framegenau geschnitten"""
+        if output_format == 'mp3' or profile['target_bytes'] or profile_requires_encode(profile):
+            return True
+        if not full_path.exists():
+            return self.pipeline_may_encode(url, quality, output_format, profile)
+        result = subprocess.run(
+            ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-select_streams', 'v:0', '-show_entries', 'stream=codec_name,height', str(full_path)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+
+        try:
+            stream = json.loads(result.stdout).get('streams', [{}])[0]
+
+        except (json.JSONDecodeError, IndexError):
+            return True
+        if normalize_video_codec(stream.get('codec_name')) in ('vp9', 'av1', 'vp8'):
+            return True
+        return bool(profile['max_height'] and (stream.get('height') or 0) > profile['max_height'])
+
+    def get_clip_source(self, url: str, quality: Optional[str], clip: Tuple[float, Optional[float]], session_id: Optional[str] = None, output_format: str = 'mp4', profile: Optional[Dict[str, Any]] = None) -> Tuple[Optional[Path], Optional[Tuple[float, Optional[float]]]]:
+        """Liefert die Quelle des Ausschnitts und den Schnitt, den convert_cached_video noch ausführen muss.
+
+        Liegt das ganze Video schon im Cache, wird der Abschnitt ohne Neukodierung herausgeschnitten
+        (Start auf dem vorherigen Keyframe). Sonst lädt yt-dlp nur diesen Abschnitt (--download-sections).
+        Folgt ohnehin eine Neukodierung (MP3, anderes Profil, VP9/AV1-Quelle), wird framegenau geschnitten:
+        aus dem Cache schneidet erst der einzige Encode in convert_cached_video (-ss nach -i), beim Download
+        kodiert yt-dlp mit --force-keyframes-at-cuts in einem Encode-Slot des encode_governor.
+        """
+        profile = profile or get_encode_profile(None)
+
+        full_path = self.get_cached_video_path(url, quality)
+
+        exact = self.clip_needs_exact_cut(full_path, url, quality, output_format, profile)
+
+        if exact and full_path.exists():
+            logger.info("Using cached video for exact clip %s-%s: %s", format_clip_time(clip[0]), format_clip_time(clip[1]), full_path)
+
+            self.job_timings['cache_key'] = full_path.stem
+
+            cache_catalog.record_hit(full_path)
+
+            cache_tiers.resolve(full_path)
+
+            if session_id:
+                self.send_status_update(session_id, "Using cached video")
+
+            return full_path, clip
+
+        clip_path = CACHE_DIR / f"{full_path.stem}{get_clip_suffix(clip)}{'-exact' if exact else ''}.mp4"
+
+        self.job_timings['cache_key'] = clip_path.stem
+        if clip_path.exists():
+            logger.info("Using cached clip: %s", clip_path)
+
+            cache_catalog.record_hit(clip_path)
+
+            cache_tiers.resolve(clip_path)
+
+            if session_id:
+                self.send_status_update(session_id, "Using cached clip")
+
+            return clip_path, None
+        start, end = clip
+        with inflight_guard(clip_path.stem):
+            if clip_path.exists():
+                cache_catalog.record_hit(clip_path)
+
+                cache_tiers.resolve(clip_path)
+
+                return clip_path, None
+            cache_tiers.record_miss()
+
+            download_started = time.monotonic()
+
+            if full_path.exists():
+                logger.info("Cutting clip %s-%s from cached video: %s", format_clip_time(start), format_clip_time(end), full_path)
+
+                if session_id:
+                    self.send_status_update(session_id, "Cutting clip from cached video...")
+
+                tmp_path = clip_path.with_suffix('.cut.mp4')
+                cmd = ['ffmpeg', '-ss', f'{start:.3f}', '-i', str(full_path)]
+                if end is not None:
+                    cmd.extend(['-t', f'{end - start:.3f}'])
+
+                cmd.extend(['-map', '0', '-c', 'copy', '-avoid_negative_ts', 'make_zero', '-movflags', '+faststart', '-y', str(tmp_path)])
+
+                result = self.run_managed_command(cmd, session_id=session_id, timeout=600)
+
+                if result.returncode == 0 and tmp_path.exists():
+                    tmp_path.replace(clip_path)
+
+                else:
+                    logger.warning("Could not cut clip from cache, downloading section instead: %s", result.stderr.decode('utf-8', errors='ignore')[-300:])
+
+                    if tmp_path.exists():
+                        tmp_path.unlink()
+
+            if not clip_path.exists():
+                logger.info("Downloading clip %s-%s: %s, quality: %s", format_clip_time(start), format_clip_time(end), url, quality)
+
+                if session_id:
+                    self.send_status_update(session_id, "Downloading clip...")
+
+                format_spec = f'{quality}+bestaudio/best' if quality else 'bestvideo+bestaudio/best'
+                section = f"*{start:.3f}-{f'{end:.3f}' if end is not None else 'inf'}"
+                job_key = f"{clip_path.stem}:{uuid.uuid4().hex}"
+                report = (lambda status: self.send_progress_update(session_id, status)) if session_id else None
+                # Mit --force-keyframes-at-cuts kodiert yt-dlp den Abschnitt neu, das braucht einen Encode-Slot wie jeder andere Encode
+                encode_slot = encode_governor.slot('h264', (end - start) if end is not None else None, preemptible=False, report=report, abort=lambda: self.is_session_cancelled(session_id)) if exact else nullcontext({'threads': None})
+                with encode_slot as encode_job, bandwidth_governor.share(abort=lambda: self.is_session_cancelled(session_id), report=report) as limit:
+                    args = ['-f', format_spec, '--download-sections', section, '--merge-output-format', 'mp4', *bandwidth_governor.limit_args(limit), '-o', str(clip_path)]
+                    if exact and encode_job:
+                        args.extend(['--force-keyframes-at-cuts', '--downloader-args', f"ffmpeg_o:-threads {encode_job['threads']}"])
+                    if STRIMDL_DOWNLOAD_ACCELERATION:
+                        args.extend(['--concurrent-fragments', str(YTDLP_CONCURRENT_FRAGMENTS)])
+
+                    if encode_job is None or limit is None:
+                        result = subprocess.CompletedProcess(args, -signal.SIGTERM, b'', b'Cancelled')
+
+                    else:
+                        try:
+                            cmd = self.build_yt_dlp_cmd(*args, url)
+                            result = self.run_managed_command(
+                                encode_governor.wrap(cmd, encode_job['threads']) if exact else cmd,
+                                session_id=session_id,
+                                timeout=1800,
+                                on_start=lambda process: bandwidth_governor.register(job_key, process, clip_path.stem, report, limit)
+                            )
+
+                        finally:
+                            bandwidth_governor.unregister(job_key)
+
+                if result.returncode != 0 or not clip_path.exists():
+                    if self.is_session_cancelled(session_id):
+                        logger.info("Clip download cancelled: %s", url)
+
+                    else:
+                        logger.error("Failed to download clip: %s", self.clean_yt_dlp_error(result.stderr.decode('utf-8', errors='ignore')))
+
+                    for partial_file in CACHE_DIR.glob(f"{clip_path.stem}.*"):
+                        try:
+                            partial_file.unlink()
+
+                        except Exception as e:
+                            logger.warning("Could not remove partial clip file %s: %s", partial_file, e)
+
+                    if session_id:
+                        self.send_status_update(session_id, STATUS_CANCELLED if self.is_session_cancelled(session_id) else STATUS_FAILED)
+
+                    return None, None
+            download_seconds = time.monotonic() - download_started
+            self.job_timings['download_seconds'] = download_seconds
+            cache_catalog.record_artifact(
+                clip_path,
+                'clip',
+                source_id=':'.join(self.resolve_media_id(url, allow_network=False)),
+                source_url=url,
+                format_id=quality,
+                download_seconds=download_seconds
+            )
+
+            if session_id:
+                self.send_status_update(session_id, "Clip ready")
+
+            return clip_path, None
+
+    def start_preview(self, cache_path: Path, session_id: Optional[str], estimate: float, clip: Optional[Tuple[float, Optional[float]]] = None) -> None:
+        """Startet neben dem eigentlichen Encode eine schnelle 360p-Vorschau als fragmentiertes MP4.
+
+        Nur für Encodes mit geschätzt mehr als PREVIEW_MIN_ENCODE_SECONDS Laufzeit, bei kürzeren ist das
+        Ergebnis schneller fertig als die Vorschau nützt. Die Vorschau läuft mit einem Thread und niedrigster
+        Priorität in der Prozessgruppe der Session und wird beim Ende des Jobs, beim Abbruch, beim Drain
+        oder spätestens nach PREVIEW_TTL_SECONDS verworfen.
+        """
+        if not STRIMDL_PREVIEW or not session_id or estimate < PREVIEW_MIN_ENCODE_SECONDS:
+            return
+        PREVIEW_DIR.mkdir(exist_ok=True)
+
+        preview_path = get_preview_path(session_id)
+        input_args, seek_args = get_clip_seek_args(clip) if clip else ([], [])
+        cmd = encode_governor.wrap([
+            'ffmpeg', *input_args, '-i', str(cache_path), *seek_args,
+            '-vf', f'scale=-2:{PREVIEW_HEIGHT}',
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-tune', 'zerolatency', '-crf', '32', '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac', '-b:a', '64k', '-ac', '2',
+            '-movflags', 'frag_keyframe+empty_moov+default_base_moof', '-f', 'mp4',
+            '-y', str(preview_path)
+
+        ], 1, nice=PREVIEW_NICE)
+
+        stop_preview(session_id)
+
+        try:
+            process = self.start_session_process(cmd, session_id, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        except OSError as e:
+            logger.warning("Could not start preview: %s", e)
+
+            return
+        with preview_lock:
+            preview_jobs[session_id] = {'process': process, 'path': preview_path, 'started_at': time.time()}
+
+        self.send_status_update(session_id, "Preview available")
 
-                self.send_header('Content-type', 'text/html')
+    def send_preview(self, session_id: str) -> None:
+        """Streamt die wachsende Vorschau-Datei, bis ihr ffmpeg fertig ist oder sie verworfen wird.
 
-                self.end_headers()
+        Im Worker-Modus kann die Vorschau in einem anderen Worker laufen; dann gilt sie als aktiv,
+        solange die Datei existiert und in den letzten PREVIEW_STALL_SECONDS gewachsen ist.
+        """
+        with preview_lock:
+            job = preview_jobs.get(session_id)
 
-                self.wfile.write(html.encode())
+        if not job and shared_sessions and session_id and get_preview_path(session_id).exists():
+            job = {'process': None, 'path': get_preview_path(session_id)}
 
-            except Exception as e:
-                self.send_json_response(500, {'ok': False, 'reason': f'Error loading login page: {e}'})
+        if not job:
+            self.send_json_response(404, {'ok': False, 'reason': 'No preview for this session'})
 
             return
+        def is_running() -> bool:
+            if job['process'] is not None:
+                return job['process'].poll() is None
+            try:
+                return time.time() - job['path'].stat().st_mtime < PREVIEW_STALL_SECONDS
+
+            except FileNotFoundError:
+                return False
+
+        deadline = time.monotonic() + 10
+        while not job['path'].exists() and is_running() and time.monotonic() < deadline:
+            time.sleep(0.2)
+
         try:
-            with open(APP_ROOT / 'index.html', 'r', encoding='utf-8') as f:
-                html = f.read().replace('{{APP_VERSION}}', APP_VERSION)
+            preview_file = open(job['path'], 'rb')
 
-            self.send_response(200)
+        except FileNotFoundError:
+            self.send_json_response(404, {'ok': False, 'reason': 'Preview not started yet'})
 
-            self.send_header('Content-type', 'text/html')
+            return
+        self.send_response(200)
 
-            self.end_headers()
+        self.send_header('Content-Type', 'video/mp4')
 
-            self.wfile.write(html.encode())
+        self.send_header('Cache-Control', 'no-store')
 
-        except Exception as e:
-            self.send_json_response(500, {'ok': False, 'reason': f'Error loading index page: {e}'})
+        self.end_headers()
 
-    def parse_twitter_url(self, url: str) -> Optional[Tuple[str, str]]:
-        parsed_url = urllib.parse.urlparse(url)
+        try:
+            with preview_file:
+                while True:
+                    chunk = preview_file.read(PEER_CHUNK_SIZE)
 
-        path_parts = parsed_url.path.split('/')
+                    if chunk:
+                        self.wfile.write(chunk)
 
-        if len(path_parts) >= 4 and path_parts[2] == 'status':
-            return path_parts[1], path_parts[3]
-        return None
-    def get_youtube_title(self, url: str, session_id: Optional[str] = None) -> Optional[str]:
+                        continue
+                    with preview_lock:
+                        active = preview_jobs.get(session_id) is job or job['process'] is None
+                    if not active or not is_running():
+                        self.wfile.write(preview_file.read())
+
+                        break
+                    time.sleep(0.2)
+
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def record_probe_info(self, cache_path: Path, probe_info: Dict[str, Any]) -> None:
+        codec = None
+        height = None
+        for stream in probe_info.get('streams', []):
+            if stream.get('codec_type') == 'video':
+                codec = stream.get('codec_name')
+                height = stream.get('height')
+
+                break
         try:
-            result = self.run_managed_command(
-                self.build_yt_dlp_cmd('--get-title', url),
-                session_id=session_id,
-                text=True,
-                timeout=60
-            )
+            duration = float(probe_info.get('format', {}).get('duration'))
 
-            if result.returncode != 0:
-                raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+        except (TypeError, ValueError):
+            duration = None
+        cache_catalog.record_probe(cache_path, codec, duration, height)
 
-            return result.stdout.strip().replace('"', "'")
+    def record_encode_timing(self, cache_path: Path, encode_seconds: float) -> None:
+        self.job_timings['encode_seconds'] = encode_seconds
+        cache_catalog.record_encode(cache_path, encode_seconds)
 
-        except subprocess.CalledProcessError as e:
-            logger.error(f"Could not fetch YouTube title: {self.clean_yt_dlp_error(e.stderr or '')}")
+    def get_converted_path(self, cache_path: Path, output_format: str, profile: Optional[Dict[str, Any]] = None) -> Path:
+        """Cache-Pfad des konvertierten Ergebnisses, abhängig vom Encode-Profil"""
+        tag = get_profile_tag(profile or get_encode_profile(None), output_format)
 
-            return None
-    def get_cache_key(self, url: str, quality: Optional[str] = None) -> str:
-        """Generiere einen Cache-Key basierend auf der URL und Qualität"""
-        key_string = url
-        if quality:
-            key_string += f"_{quality}"
-        return hashlib.md5(key_string.encode()).hexdigest()
+        if output_format == 'mp3':
+            return CACHE_DIR / f"{cache_path.stem}__mp3{f'-{tag}' if tag else ''}.mp3"
+        return CACHE_DIR / f"{cache_path.stem}__mp4-{tag}.mp4"
 
-    def get_cached_video_path(self, url: str, quality: Optional[str] = None) -> Path:
-        """Gibt den Pfad zum gecachten Video zurück"""
-        cache_key = self.get_cache_key(url, quality)
+    def store_converted_output(self, tmp_path: Path, output_path: Path, url: Optional[str], quality: Optional[str]) -> Path:
+        """Übernimmt eine fertige Konvertierung in den Cache oder behält sie nur für diese Anfrage"""
+        if not STRIMDL_CACHE_CONVERTED:
+            # Ohne STRIMDL_CACHE_CONVERTED wird das Ergebnis nach dem Senden wieder gelöscht
+            self.output_path = tmp_path
 
-        return CACHE_DIR / f"{cache_key}.mp4"
-    def clear_cache_for_url(self, url: str) -> None:
-        """Löscht alle Cache-Dateien für eine URL (alle Qualitäten)"""
-        try:
-            url_hash = hashlib.md5(url.encode()).hexdigest()
+            self.temporary_output = tmp_path
 
-            for cache_file in CACHE_DIR.glob(f"{url_hash}*.mp4"):
-                cache_file.unlink()
+            return tmp_path
+        tmp_path.replace(output_path)
 
-                logger.info(f"Deleted cache file: {cache_file}")
+        self.output_path = output_path
 
-        except Exception as e:
-            logger.error(f"Error clearing cache: {e}")
+        cache_catalog.record_artifact(output_path, 'converted', source_url=url, format_id=quality)
 
-    def download_and_cache_video(self, url: str, quality: Optional[str] = None, session_id: Optional[str] = None) -> Optional[Path]:
-        """Lädt Video in gewählter Qualität herunter und cached es, gibt den Pfad zurück"""
-        cache_path = self.get_cached_video_path(url, quality)
+        return output_path
 
-        if cache_path.exists():
-            logger.info(f"Using cached video: {cache_path}")
+    def plans_stream_copy(self, cache_path: Path, output_format: str, profile: Dict[str, Any]) -> bool:
+        """Sagt aus den gespeicherten ffprobe-Daten voraus, ob convert_cached_video nur remuxt (-c copy).
 
-            if session_id:
-                self.send_status_update(session_id, "Using cached video")
+        Spiegelt die Entscheidung in convert_cached_video; ohne Probe-Daten wird vorsichtig False geliefert.
+        """
+        if output_format == 'mp3' or profile_requires_encode(profile):
+            return False
+        probe = cache_catalog.get_probe(cache_path)
 
-            return cache_path
-        logger.info(f"Downloading video to cache: {url}, quality: {quality}")
+        if not probe or probe['codec'].lower() in ('vp9', 'av1', 'vp8'):
+            return False
+        if profile['max_height'] and probe['height'] > profile['max_height']:
+            return False
+        try:
+            return not (profile['target_bytes'] and cache_path.stat().st_size > profile['target_bytes'])
 
-        if quality:
-            format_spec = f'{quality}+bestaudio/best'
-        else:
-            format_spec = 'bestvideo+bestaudio/best'
-        cmd = self.build_yt_dlp_cmd('-f', format_spec, '--merge-output-format', 'mp4', '-o', str(cache_path), url)
+        except OSError:
+            return False
+
+    def has_cached_conversion(self, output_path: Path, session_id: Optional[str] = None) -> bool:
+        """Prüft lokal und bei den Peers, ob eine Konvertierung bereits vorliegt (nur mit STRIMDL_CACHE_CONVERTED)"""
+        if not STRIMDL_CACHE_CONVERTED:
+            return False
+        return output_path.exists() or bool(STRIMDL_PEERS and self.fetch_from_peers(output_path, 'converted', session_id))
 
-        logger.info(f"Running: {' '.join(cmd)}")
+    def convert_cached_video(self, cache_path: Path, output_format: str, quality: Optional[str] = None, url: Optional[str] = None, session_id: Optional[str] = None, profile: Optional[Dict[str, Any]] = None, clip: Optional[Tuple[float, Optional[float]]] = None) -> Optional[Path]:
+        """Konvertiert gecachtes Video zu MP3 oder MP4 mit spezifischer Qualität und Encode-Profil.
 
-        result = self.run_managed_command(cmd, session_id=session_id, timeout=1800)
+        Mit clip wird der Ausschnitt im selben Encode framegenau aus dem ganzen Video geschnitten.
+        Liefert den Pfad der konvertierten Datei im Cache, ohne sie einzulesen.
+        """
+        import tempfile
 
-        if result.returncode == 0 and cache_path.exists():
-            logger.info(f"Video cached successfully: {cache_path}")
+        profile = profile or get_encode_profile(None)
 
-            if session_id:
-                self.send_status_update(session_id, "Video downloaded successfully")
+        # Ausschnitte werden unter dem Namen des framegenauen Clips abgelegt, nicht unter dem des ganzen Videos
+        artifact_path = cache_path.with_name(f"{cache_path.stem}{get_clip_suffix(clip)}-exact.mp4") if clip else cache_path
+        input_args, seek_args = get_clip_seek_args(clip) if clip else ([], [])
+        # ffmpeg liest eine vorhandene RAM-Kopie der Quelle statt der Disk-Datei
+        source_path = cache_tiers.locate(cache_path)
 
-            return cache_path
-        else:
-            error_msg = self.clean_yt_dlp_error(result.stderr.decode('utf-8', errors='ignore'))
+        try:
+            output_path = self.get_converted_path(artifact_path, output_format, profile)
 
-            if self.is_session_cancelled(session_id):
-                logger.info(f"Download cancelled while caching: {url}")
+            self.output_path = output_path
 
-                for partial_file in CACHE_DIR.glob(f"{cache_path.stem}*"):
-                    try:
-                        partial_file.unlink()
+            if self.has_cached_conversion(output_path, session_id):
+                logger.info("Using cached conversion: %s", output_path)
 
-                    except Exception as e:
-                        logger.warning(f"Could not remove partial cache file {partial_file}: {e}")
+                cache_catalog.record_hit(output_path)
 
-            else:
-                logger.error(f"Failed to cache video: {error_msg}")
+                if session_id:
+                    self.send_status_update(session_id, "Using cached conversion")
 
-            if session_id:
-                self.send_status_update(session_id, "Download cancelled" if self.is_session_cancelled(session_id) else "Download failed")
+                cache_tiers.resolve(output_path)
 
-            return None
-    def convert_cached_video(self, cache_path: Path, output_format: str, quality: Optional[str] = None, url: Optional[str] = None, session_id: Optional[str] = None) -> Optional[bytes]:
-        """Konvertiert gecachtes Video zu MP3 oder MP4 mit spezifischer Qualität"""
-        import tempfile
+                return output_path
+            cache_tiers.record_miss()
 
-        try:
             if output_format == 'mp3':
-                logger.info(f"Converting to MP3 with best quality: {cache_path}")
+                logger.info("Converting to MP3 with best quality: %s", cache_path)
 
                 if session_id:
                     self.send_status_update(session_id, "Start converting...")
@@ -614,24 +4602,21 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
                     tmp_path = Path(tmp_file.name)
 
                 try:
-                    cmd = [
-                        'ffmpeg', '-i', str(cache_path),
-                        '-codec:a', 'libmp3lame', '-q:a', '0', '-write_xing', '1',
-                        '-ar', '44100', '-ac', '2', '-id3v2_version', '3',
-                        '-y', str(tmp_path)
+                    duration = self.probe_duration(source_path)
 
-                    ]
-                    result = self.run_managed_command(cmd, session_id=session_id, timeout=1800)
+                    if clip:
+                        duration = get_clip_duration(clip, duration)
+                    cmd = ['ffmpeg', *input_args, '-i', str(source_path), *seek_args, *build_mp3_encode_args(profile, duration), '-y', str(tmp_path)]
+                    encode_started = time.monotonic()
 
-                    if result.returncode == 0 and tmp_path.exists():
-                        with open(tmp_path, 'rb') as f:
-                            output_data = f.read()
+                    result = self.run_encode_command(cmd, session_id=session_id, timeout=1800, kind='mp3', duration=duration)
 
-                        logger.info(f"MP3 conversion successful, size: {len(output_data)} bytes")
+                    if result.returncode == 0 and tmp_path.exists():
+                        logger.info("MP3 conversion successful, size: %d bytes", tmp_path.stat().st_size)
 
-                        tmp_path.unlink()
+                        self.record_encode_timing(artifact_path, time.monotonic() - encode_started)
 
-                        return output_data
+                        return self.store_converted_output(tmp_path, output_path, url, quality)
                     else:
                         error_msg = result.stderr.decode('utf-8', errors='ignore')
 
@@ -639,44 +4624,56 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
                             logger.info("MP3 conversion cancelled")
 
                         else:
-                            logger.error(f"MP3 conversion failed: {error_msg}")
+                            logger.error("MP3 conversion failed: %s", error_msg)
 
                         if tmp_path.exists():
                             tmp_path.unlink()
 
                         return None
                 except Exception as e:
-                    logger.error(f"Error during MP3 conversion: {e}")
+                    logger.error("Error during MP3 conversion: %s", e)
 
                     if tmp_path.exists():
                         tmp_path.unlink()
 
                     return None
             else:
-                logger.info(f"Converting video with quality: {quality}")
+                logger.info("Converting video with quality: %s", quality)
 
                 if session_id:
                     self.send_status_update(session_id, "Start converting...")
 
-                probe_cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_streams', str(cache_path)]
-                probe_result = subprocess.run(probe_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+                probe_cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_streams', '-show_format', str(source_path)]
+                with self.trace_span('probe'):
+                    probe_result = subprocess.run(probe_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
 
                 needs_recode = False
                 target_height = None
                 source_height = None
+                source_codec = None
+                duration = None
                 if probe_result.returncode == 0:
                     probe_info = json.loads(probe_result.stdout)
 
+                    self.record_probe_info(cache_path, probe_info)
+
+                    try:
+                        duration = float(probe_info.get('format', {}).get('duration'))
+
+                    except (TypeError, ValueError):
+                        duration = None
+
                     for stream in probe_info.get('streams', []):
                         if stream.get('codec_type') == 'video':
                             codec = stream.get('codec_name', '').lower()
 
+                            source_codec = codec
                             source_height = stream.get('height')
 
                             target_height = source_height
                             if codec in ['vp9', 'av1', 'vp8']:
                                 needs_recode = True
-                                logger.info(f"Non-H.264 codec detected ({codec}), re-encoding to H.264")
+                                logger.info("Non-H.264 codec detected (%s), re-encoding to H.264", codec)
 
                                 if quality and url:
                                     try:
@@ -694,77 +4691,475 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
                                             target_height = fmt_info.get('height')
 
                                             if target_height:
-                                                logger.info(f"Target height from quality: {target_height}p")
+                                                logger.info("Target height from quality: %sp", target_height)
 
                                     except Exception as e:
-                                        logger.warning(f"Could not get quality info: {e}")
+                                        logger.warning("Could not get quality info: %s", e)
 
-                if target_height and FFMPEG_MAX_HEIGHT and target_height > FFMPEG_MAX_HEIGHT:
-                    logger.info(f"Limiting target height from {target_height}p to {FFMPEG_MAX_HEIGHT}p via FFMPEG_MAX_HEIGHT")
+                if target_height and profile['max_height'] and target_height > profile['max_height']:
+                    logger.info("Limiting target height from %sp to %sp via profile %s", target_height, profile['max_height'], profile['name'])
 
-                    target_height = FFMPEG_MAX_HEIGHT
+                    target_height = profile['max_height']
                 if target_height and (source_height is None or target_height != source_height):
+                    needs_recode = True
+                if profile['target_bytes'] and cache_path.stat().st_size > profile['target_bytes']:
+                    logger.info("Source exceeds max size %s bytes, re-encoding with capped bitrate", profile['target_bytes'])
+
+                    needs_recode = True
+                if not needs_recode and profile_requires_encode(profile):
+                    logger.info("Re-encoding with profile %s", profile['name'])
+
+                    needs_recode = True
+                if clip:
+                    # Der framegenaue Schnitt ist nur mit Neukodierung möglich
+                    duration = get_clip_duration(clip, duration)
+
                     needs_recode = True
                 with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4', dir=str(CACHE_DIR)) as tmp_file:
                     tmp_path = Path(tmp_file.name)
 
                 try:
                     if needs_recode:
-                        cmd = ['ffmpeg', '-i', str(cache_path)]
+                        cmd = ['ffmpeg', *input_args, '-i', str(source_path), *seek_args]
                         if target_height and (source_height is None or target_height != source_height):
                             cmd.extend(['-vf', f'scale=-2:{target_height}'])
 
-                        cmd.extend([
-                            '-c:v', 'libx264', '-preset', FFMPEG_VIDEO_PRESET, '-crf', FFMPEG_VIDEO_CRF,
-                            '-c:a', 'aac', '-b:a', '128k',
-                            '-movflags', '+faststart', '-pix_fmt', 'yuv420p',
-                            '-y', str(tmp_path)
+                        cmd.extend([*build_video_encode_args(encode_autotune.apply(profile, source_codec, target_height), duration), '-y', str(tmp_path)])
+
+                    else:
+                        cmd = ['ffmpeg', '-i', str(source_path), '-c', 'copy', '-movflags', '+faststart', '-y', str(tmp_path)]
+                    logger.info("Running: %s", LogCommand(cmd))
+
+                    encode_started = time.monotonic()
+
+                    result = self.run_encode_command(
+                        cmd,
+                        session_id=session_id,
+                        timeout=1800,
+                        kind='h264' if needs_recode else 'copy',
+                        duration=duration,
+                        on_grant=(lambda job: self.start_preview(source_path, session_id, job['estimate'], clip)) if needs_recode else None
+                    )
+
+                    if result.returncode == 0 and tmp_path.exists():
+                        logger.info("Video conversion successful, size: %d bytes", tmp_path.stat().st_size)
+
+                        self.record_encode_timing(artifact_path, time.monotonic() - encode_started)
+
+                        return self.store_converted_output(tmp_path, output_path, url, quality)
+                    else:
+                        error_msg = result.stderr.decode('utf-8', errors='ignore')
+
+                        if self.is_session_cancelled(session_id):
+                            logger.info("Video conversion cancelled")
+
+                        else:
+                            logger.error("Video conversion failed: %s", error_msg)
+
+                        if tmp_path.exists():
+                            tmp_path.unlink()
+
+                        return None
+                except Exception as e:
+                    logger.error("Error during conversion: %s", e)
+
+                    if tmp_path.exists():
+                        tmp_path.unlink()
+
+                    return None
+        except subprocess.TimeoutExpired:
+            logger.error("Conversion timeout")
+
+            return None
+        except Exception as e:
+            logger.error("Error converting video: %s", e)
+
+            return None
+    def get_tweet_video_count(self, url: str, session_id: Optional[str] = None) -> Tuple[int, Optional[str]]:
+        """Ermittelt die Anzahl der Videos eines Tweets (mehrere Videos liefert yt-dlp als Playlist)"""
+        result = self.run_managed_command(
+            self.build_yt_dlp_cmd('--no-warnings', '--flat-playlist', '-J', url),
+            session_id=session_id,
+            text=True,
+            timeout=120
+        )
+
+        if result.returncode != 0:
+            error_msg = self.clean_yt_dlp_error(result.stderr or '')
+
+            if 'No video could be found' in error_msg:
+                return 0, None
+            return 0, error_msg
+        try:
+            info = json.loads(result.stdout)
+
+        except ValueError as e:
+            return 0, f'Could not parse tweet info: {e}'
+        self.remember_media_id(url, info)
+
+        entries = info.get('entries')
+
+        return (len(entries) if entries else 1), None
+
+    def get_tweet_photo_urls(self, tweet_id: str) -> List[str]:
+        """Holt Foto-URLs eines Tweets über die öffentliche Syndication-API (best effort)"""
+        endpoint = f"{X_SYNDICATION_URL}?id={tweet_id}&token={twitter_syndication_token(tweet_id)}"
+        request = urllib.request.Request(endpoint, headers={'User-Agent': f'StrimDL/{APP_VERSION}'})
+
+        try:
+            with urllib.request.urlopen(request, timeout=15) as response:
+                data = json.loads(response.read().decode('utf-8'))
+
+        except Exception as e:
+            logger.warning("Could not fetch photos for tweet %s: %s", tweet_id, e)
+
+            return []
+        photo_urls = []
+        for media in data.get('mediaDetails') or []:
+            if media.get('type') == 'photo' and media.get('media_url_https'):
+                photo_urls.append(media['media_url_https'])
+
+        return photo_urls
+
+    def download_tweet_asset(self, url: str, asset: Dict[str, Any], session_id: Optional[str] = None) -> Optional[Path]:
+        cache_path = asset['cache_path']
+        if cache_path.exists():
+            logger.info("Using cached X media: %s", cache_path)
+
+            cache_catalog.record_hit(cache_path)
+
+            cache_tiers.resolve(cache_path)
+
+            return cache_path
+        cache_tiers.record_miss()
+
+        if self.is_session_cancelled(session_id):
+            return None
+        if asset['kind'] == 'video':
+            args = ['--merge-output-format', 'mp4', '-o', str(cache_path)]
+            if asset['count'] > 1:
+                args.extend(['--playlist-items', str(asset['index'])])
+
+            download_started = time.monotonic()
+
+            result = self.run_managed_command(self.build_yt_dlp_cmd(*args, url), session_id=session_id, timeout=1800)
+
+            if result.returncode == 0 and cache_path.exists():
+                cache_catalog.record_artifact(cache_path, 'x-video', source_id=asset['source_id'], source_url=url, format_id=f"video{asset['index']}", download_seconds=time.monotonic() - download_started)
+
+                return cache_path
+            if not self.is_session_cancelled(session_id):
+                logger.error("Failed to download X video %s: %s", asset['index'], self.clean_yt_dlp_error(result.stderr.decode('utf-8', errors='ignore')))
+
+            for partial_file in CACHE_DIR.glob(f"{cache_path.stem}*"):
+                try:
+                    partial_file.unlink()
+
+                except Exception as e:
+                    logger.warning("Could not remove partial cache file %s: %s", partial_file, e)
+
+            return None
+        tmp_path = cache_path.with_name(f"{cache_path.name}.part")
+        request = urllib.request.Request(f"{asset['source']}?name=orig", headers={'User-Agent': f'StrimDL/{APP_VERSION}'})
+
+        try:
+            download_started = time.monotonic()
+
+            with urllib.request.urlopen(request, timeout=60) as response, open(tmp_path, 'wb') as f:
+                shutil.copyfileobj(response, f)
+
+            tmp_path.replace(cache_path)
+
+            cache_catalog.record_artifact(cache_path, 'x-image', source_id=asset['source_id'], source_url=asset['source'], format_id=f"image{asset['index']}", download_seconds=time.monotonic() - download_started)
+
+            return cache_path
+        except Exception as e:
+            logger.error("Failed to download X image %s: %s", asset['source'], e)
+
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+            return None
+
+    def load_tweet_manifest(self, media_prefix: str) -> Optional[List[Tuple[Path, str]]]:
+        """Liefert die Medien eines vollständig gecachten Tweets ohne Anfrage an X, sonst None"""
+        try:
+            entries = json.loads((CACHE_DIR / f"{media_prefix}_manifest.json").read_text())
+
+        except (OSError, ValueError):
+            return None
+        try:
+            assets = [(CACHE_DIR / entry['file'], entry['name']) for entry in entries]
+
+        except (KeyError, TypeError):
+            return None
+        # Sobald die Eviction eine Datei entfernt hat, wird der Tweet neu abgefragt
+        if not assets or not all(path.exists() for path, _ in assets):
+            return None
+        return assets
+
+    def save_tweet_manifest(self, media_prefix: str, assets: List[Tuple[Path, str]]) -> None:
+        """Merkt sich die Medienliste eines vollständig geladenen Tweets für spätere Cache-Treffer"""
+        manifest_path = CACHE_DIR / f"{media_prefix}_manifest.json"
+
+        tmp_path = manifest_path.with_name(f"{manifest_path.name}.part")
+        try:
+            tmp_path.write_text(json.dumps([{'file': path.name, 'name': name} for path, name in assets]))
+
+            tmp_path.replace(manifest_path)
+
+        except OSError as e:
+            logger.warning("Could not write X media manifest %s: %s", manifest_path.name, e)
+
+    def download_tweet_media(self, url: str, user_id: str, tweet_id: str, session_id: str) -> Tuple[List[Tuple[Path, str]], Optional[str], List[str]]:
+        """Lädt alle Videos und Bilder eines Tweets parallel in den Cache; liefert Dateien, Fehler und fehlgeschlagene Medien"""
+        media_prefix = self.get_media_prefix(url, allow_network=False)
+
+        cached_assets = self.load_tweet_manifest(media_prefix)
+
+        if cached_assets:
+            logger.info("Using cached X media for tweet %s (%d file(s))", tweet_id, len(cached_assets))
+
+            for path, _ in cached_assets:
+                cache_catalog.record_hit(path)
+
+                cache_tiers.resolve(path)
+
+            return cached_assets, None, []
+        video_count, error_msg = self.get_tweet_video_count(url, session_id)
+
+        if self.is_session_cancelled(session_id):
+            return [], None, []
+        photo_urls = self.get_tweet_photo_urls(tweet_id)
+
+        source_id = ':'.join(self.resolve_media_id(url))
+
+        assets: List[Dict[str, Any]] = []
+        for index in range(1, video_count + 1):
+            name = VIDEO_NAMING_PATTERN.format(userId=user_id, tweetId=tweet_id)
+            assets.append({
+                'kind': 'video',
+                'index': index,
+                'count': video_count,
+                'cache_path': CACHE_DIR / f"{media_prefix}_video{index}.mp4",
+                'source_id': source_id,
+                'name': name,
+            })
+
+        for index, photo_url in enumerate(photo_urls, start=1):
+            ext = Path(urllib.parse.urlparse(photo_url).path).suffix.lower() or '.jpg'
+            assets.append({
+                'kind': 'image',
+                'index': index,
+                'count': len(photo_urls),
+                'source': photo_url,
+                'cache_path': CACHE_DIR / f"{media_prefix}_image{index}{ext}",
+                'source_id': source_id,
+                'name': IMAGE_NAMING_PATTERN.format(userId=user_id, tweetId=tweet_id),
+            })
+
+        if not assets:
+            return [], error_msg, []
+        self.send_status_update(session_id, f"Downloading {len(assets)} media file(s)..." if len(assets) > 1 else "Downloading media...")
+
+        results: List[Optional[Path]] = [None] * len(assets)
+        with ThreadPoolExecutor(max_workers=min(X_MEDIA_WORKERS, len(assets))) as executor:
+            # Jeder Auftrag läuft in einer Kopie des Log-Kontexts, damit auch diese Einträge session_id und stage tragen
+            futures = {executor.submit(contextvars.copy_context().run, self.download_tweet_asset, url, asset, session_id): i for i, asset in enumerate(assets)}
+
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+
+        downloaded: List[Tuple[Path, str]] = []
+        failed: List[str] = []
+        for asset, path in zip(assets, results):
+            if not path:
+                failed.append(f"{asset['kind']}{asset['index']}")
+
+                continue
+            name = asset['name']
+            if asset['count'] > 1:
+                name += f"-{asset['index']}"
+            downloaded.append((path, f"{name}{path.suffix}"))
+
+        if failed:
+            logger.warning("Only %d of %d X media files downloaded for tweet %s, failed: %s", len(downloaded), len(assets), tweet_id, ', '.join(failed))
+
+            if downloaded:
+                self.send_status_update(session_id, f"Downloaded {len(downloaded)} of {len(assets)} media files (failed: {', '.join(failed)})")
+
+        elif not self.is_session_cancelled(session_id):
+            self.save_tweet_manifest(media_prefix, downloaded)
+
+        return downloaded, (None if downloaded else 'Failed to download media. Check logs for details.'), failed
+
+    def bundle_tweet_media(self, url: str, assets: List[Tuple[Path, str]]) -> Path:
+        """Packt mehrere Medien eines Tweets in ein ZIP (ohne Kompression, Medien sind bereits komprimiert)"""
+        names_hash = hashlib.md5('|'.join(name for _, name in assets).encode()).hexdigest()[:8]
+
+        bundle_path = CACHE_DIR / f"{self.get_media_prefix(url)}_bundle-{names_hash}.zip"
+
+        if bundle_path.exists():
+            cache_catalog.record_hit(bundle_path)
+
+            cache_tiers.resolve(bundle_path)
+
+            return bundle_path
+        cache_tiers.record_miss()
+
+        tmp_path = bundle_path.with_name(f"{bundle_path.name}.part")
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_STORED) as bundle:
+            for file_path, name in assets:
+                bundle.write(file_path, arcname=name)
+
+        tmp_path.replace(bundle_path)
+
+        cache_catalog.record_artifact(bundle_path, 'bundle', source_id=':'.join(self.resolve_media_id(url)), source_url=url)
+
+        return bundle_path
+
+    def is_cache_hit(self, query: Dict[str, List[str]]) -> bool:
+        """Prüft ohne Netzwerkzugriff, ob das Ergebnis ohne Download und ohne Encode lieferbar ist.
+
+        Das ist der Fall, wenn die Konvertierung gecacht ist (STRIMDL_CACHE_CONVERTED) oder die Quelle
+        im Cache liegt und nur in einen neuen Container kopiert wird.
+        """
+        url = query.get('url', [''])[0]
+        quality = query.get('quality', [''])[0]
+        if not ('youtube.com' in url or 'youtu.be' in url):
+            return False
+        try:
+            profile = get_encode_profile(query.get('profile', [''])[0], query.get('max_size', [''])[0])
+
+            clip = get_clip_range(query.get('start', [''])[0], query.get('end', [''])[0])
+
+        except ValueError:
+            return False
+        cache_key = self.get_cache_key(url, quality or None, allow_network=False)
+
+        # Ausschnitte liegen je nach Schnittart mit oder ohne '-exact' im Cache
+        suffixes = [get_clip_suffix(clip), f"{get_clip_suffix(clip)}-exact"] if clip else ['']
+        output_format = query.get('format', ['mp4'])[0].lower()
+        for suffix in suffixes:
+            source_path = CACHE_DIR / f"{cache_key}{suffix}.mp4"
+            if STRIMDL_CACHE_CONVERTED and self.get_converted_path(source_path, output_format, profile).exists():
+                return True
+            if source_path.exists() and self.plans_stream_copy(source_path, output_format, profile):
+                return True
+        return False
+
+    def send_overloaded_response(self, reasons: List[str]) -> None:
+        logger.warning("Rejecting download, server overloaded: %s", '; '.join(reasons))
+
+        body = json.dumps({
+            'ok': False,
+            'reason': f"Server is {'restarting' if drain_coordinator.draining.is_set() else 'busy'}, please retry in {STRIMDL_RETRY_AFTER_SECONDS} seconds.",
+            'details': reasons,
+            'retry_after': STRIMDL_RETRY_AFTER_SECONDS,
+        }).encode()
+
+        self.send_response(503)
+
+        self.send_header('Content-Type', 'application/json')
+
+        self.send_header('Retry-After', str(STRIMDL_RETRY_AFTER_SECONDS))
+
+        self.send_header('Content-Length', str(len(body)))
+
+        self.end_headers()
+
+        self.wfile.write(body)
+
+    def stream_status_events(self, status_queue: Queue) -> None:
+        """Schreibt Statusmeldungen als Server-Sent Events, bis eine abschließende Meldung kommt oder der Client geht"""
+        timeout_count = 0
+        max_timeout = 300                  
+        try:
+            self.wfile.write(b": connection established\n\n")
+
+            self.wfile.flush()
+
+        except (BrokenPipeError, OSError):
+            logger.info("SSE client disconnected immediately")
+
+            return
+        while timeout_count < max_timeout:
+            try:
+                status = status_queue.get(timeout=1)
+
+                timeout_count = 0                          
+                try:
+                    self.wfile.write(f"data: {json.dumps({'status': status})}\n\n".encode())
+
+                    self.wfile.flush()
+
+                except (BrokenPipeError, OSError):
+                    logger.info("SSE client disconnected")
+
+                    break
+                if status in TERMINAL_STATUSES:
+                    break
+            except:
+                timeout_count += 1
+                try:
+                    self.wfile.write(b": keepalive\n\n")
+
+                    self.wfile.flush()
+
+                except (BrokenPipeError, OSError):
+                    logger.info("SSE client disconnected (keepalive)")
+
+                    break
 
-                        ])
+    def send_saved_response(self, session_id: str, file_name: str, extra: Optional[Dict[str, Any]] = None) -> None:
+        """Legt self.output_path im Download-Verzeichnis des Servers ab und antwortet nur mit einem kleinen JSON"""
+        source_path = self.output_path
 
-                    else:
-                        cmd = ['ffmpeg', '-i', str(cache_path), '-c', 'copy', '-movflags', '+faststart', '-y', str(tmp_path)]
-                    logger.info(f"Running: {' '.join(cmd)}")
+        if not source_path or not source_path.exists():
+            self.cleanup_status_queue(session_id)
 
-                    result = self.run_managed_command(cmd, session_id=session_id, timeout=1800)
+            self.cleanup_download_session(session_id)
 
-                    if result.returncode == 0 and tmp_path.exists():
-                        with open(tmp_path, 'rb') as f:
-                            output_data = f.read()
+            self.send_json_response(500, {'ok': False, 'reason': 'Result file not found in cache.'})
 
-                        logger.info(f"Video conversion successful, size: {len(output_data)} bytes")
+            return
+        self.send_status_update(session_id, "Saving on server...")
 
-                        tmp_path.unlink()
+        try:
+            with self.trace_span('save', bytes=source_path.stat().st_size) as span:
+                dest_path, method = save_to_download_dir(source_path, file_name)
 
-                        return output_data
-                    else:
-                        error_msg = result.stderr.decode('utf-8', errors='ignore')
+                span['method'] = method
+        except OSError as e:
+            logger.error("Could not save %s to %s: %s", source_path.name, STRIMDL_SAVE_DIR, e)
 
-                        if self.is_session_cancelled(session_id):
-                            logger.info("Video conversion cancelled")
+            self.cleanup_status_queue(session_id)
 
-                        else:
-                            logger.error(f"Video conversion failed: {error_msg}")
+            self.cleanup_download_session(session_id)
 
-                        if tmp_path.exists():
-                            tmp_path.unlink()
+            self.send_json_response(500, {'ok': False, 'reason': f'Could not save on server: {e}'})
 
-                        return None
-                except Exception as e:
-                    logger.error(f"Error during conversion: {e}")
+            return
+        logger.info("Saved %s on server as %s (%s)", source_path.name, dest_path, method)
 
-                    if tmp_path.exists():
-                        tmp_path.unlink()
+        self.send_status_update(session_id, STATUS_SAVED)
 
-                    return None
-        except subprocess.TimeoutExpired:
-            logger.error("Conversion timeout")
+        time.sleep(0.1)
 
-            return None
-        except Exception as e:
-            logger.error(f"Error converting video: {e}")
+        self.cleanup_status_queue(session_id)
+
+        self.cleanup_download_session(session_id)
+
+        self.send_json_response(200, {
+            'ok': True,
+            'saved': True,
+            'file_name': dest_path.name,
+            'path': str(dest_path),
+            'bytes': dest_path.stat().st_size,
+            'method': method,
+            **(extra or {}),
+        })
 
-            return None
     def handle_download_request(self, query: Dict[str, List[str]]) -> None:
         if not self.is_authenticated():
             self.send_json_response(401, {'ok': False, 'reason': 'Not authenticated'})
@@ -774,7 +5169,25 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
         format_param = query.get('format', ['mp4'])[0].lower()
 
         quality = query.get('quality', [''])[0]
-        logger.info(f"Download request: url={url}, format={format_param}, quality={quality}")
+        try:
+            profile = get_encode_profile(query.get('profile', [''])[0], query.get('max_size', [''])[0])
+
+            clip = get_clip_range(query.get('start', [''])[0], query.get('end', [''])[0])
+
+        except ValueError as e:
+            self.send_json_response(400, {'ok': False, 'reason': str(e)})
+
+            return
+        if clip and not ('youtube.com' in url or 'youtu.be' in url):
+            self.send_json_response(400, {'ok': False, 'reason': 'Clips (start/end) are only supported for YouTube videos.'})
+
+            return
+        save_on_server = query.get('save', [''])[0].lower() == 'server'
+        if save_on_server and not is_save_dir_available():
+            self.send_json_response(400, {'ok': False, 'reason': f'Saving on server is not available, {STRIMDL_SAVE_DIR or "STRIMDL_SAVE_DIR"} is not a writable directory.'})
+
+            return
+        logger.info("Download request: url=%s, format=%s, quality=%s, profile=%s%s", url, format_param, quality, profile['name'], f', clip={clip}' if clip else '')
 
         session_id = query.get('session_id', [''])[0]
         if not session_id:
@@ -785,7 +5198,8 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
         self.send_status_update(session_id, "Starting download...")
 
         if 'youtube.com' in url or 'youtu.be' in url:
-            video_title = self.get_youtube_title(url, session_id)
+            with self.trace_span('title'):
+                video_title = self.get_youtube_title(url, session_id)
 
             if self.is_session_cancelled(session_id):
                 logger.info("Download cancelled while fetching title")
@@ -808,57 +5222,92 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
 
                 return
             file_ext = 'mp3' if format_param == 'mp3' else 'mp4'
-            filename = f"{video_title}.{file_ext}"
+            filename = f"{video_title} [{format_clip_time(clip[0])}-{format_clip_time(clip[1])}].{file_ext}" if clip else f"{video_title}.{file_ext}"
             ascii_filename = filename.encode('ascii', 'ignore').decode('ascii')
 
             utf8_filename = quote(filename)
 
-            cache_path = self.download_and_cache_video(url, quality if quality else None, session_id)
+            if STRIMDL_PREFETCH and not clip:
+                with self.trace_span('prefetch-wait'):
+                    self.claim_prefetch(url, quality if quality else None, session_id)
 
-            if not cache_path:
-                if self.is_session_cancelled(session_id):
-                    logger.info("Download cancelled")
+            content_type = 'audio/mpeg' if format_param == 'mp3' else 'video/mp4'
+            result_path = None
+            if STRIMDL_PIPELINE and not clip:
+                with self.trace_span('pipeline', output_format=format_param) as span:
+                    result_path = self.download_and_convert_pipelined(url, format_param, quality if quality else None, session_id, profile)
 
-                    self.cleanup_status_queue(session_id)
+                    span['output_bytes'] = result_path.stat().st_size if result_path else 0
 
-                    self.cleanup_download_session(session_id)
+            if not result_path:
+                clip_seek = None
+                with self.trace_span('download', quality=quality) as span:
+                    if clip:
+                        cache_path, clip_seek = self.get_clip_source(url, quality if quality else None, clip, session_id, format_param, profile)
 
-                    self.send_json_response(499, {'ok': False, 'reason': 'Download cancelled.'})
+                    else:
+                        cache_path = self.download_and_cache_video(url, quality if quality else None, session_id)
 
-                    return
-                logger.error("Failed to download/cache video")
+                    span['cache_key'] = self.job_timings.get('cache_key')
 
-                self.cleanup_status_queue(session_id)
+                if not cache_path:
+                    if self.is_session_cancelled(session_id):
+                        logger.info("Download cancelled")
 
-                self.cleanup_download_session(session_id)
+                        self.cleanup_status_queue(session_id)
 
-                self.send_json_response(500, {'ok': False, 'reason': 'Failed to download video. Check logs for details.'})
+                        self.cleanup_download_session(session_id)
 
-                return
-            content_type = 'audio/mpeg' if format_param == 'mp3' else 'video/mp4'
-            output_data = self.convert_cached_video(cache_path, format_param, quality, url, session_id)
+                        self.send_json_response(499, {'ok': False, 'reason': 'Download cancelled.'})
 
-            if not output_data:
-                if self.is_session_cancelled(session_id):
-                    logger.info("Download cancelled during conversion")
+                        return
+                    if drain_coordinator.draining.is_set():
+                        self.cleanup_status_queue(session_id)
+
+                        self.cleanup_download_session(session_id)
+
+                        self.send_overloaded_response(["server is shutting down"])
+
+                        return
+                    logger.error("Failed to download/cache video")
 
                     self.cleanup_status_queue(session_id)
 
                     self.cleanup_download_session(session_id)
 
-                    self.send_json_response(499, {'ok': False, 'reason': 'Download cancelled.'})
+                    self.send_json_response(500, {'ok': False, 'reason': 'Failed to download video. Check logs for details.'})
 
                     return
-                logger.error("Failed to convert video")
+                with self.trace_span('convert', output_format=format_param) as span:
+                    result_path = self.convert_cached_video(cache_path, format_param, quality, url, session_id, profile, clip_seek)
 
-                self.cleanup_status_queue(session_id)
+                    span['output_bytes'] = result_path.stat().st_size if result_path else 0
 
-                self.cleanup_download_session(session_id)
+                if not result_path:
+                    if self.is_session_cancelled(session_id):
+                        logger.info("Download cancelled during conversion")
+
+                        self.cleanup_status_queue(session_id)
+
+                        self.cleanup_download_session(session_id)
+
+                        self.send_json_response(499, {'ok': False, 'reason': 'Download cancelled.'})
+
+                        return
+                    logger.error("Failed to convert video")
+
+                    self.cleanup_status_queue(session_id)
+
+                    self.cleanup_download_session(session_id)
+
+                    self.send_json_response(500, {'ok': False, 'reason': 'Video conversion failed. The video may be corrupted or the format is not supported. Check server logs for details.'})
 
-                self.send_json_response(500, {'ok': False, 'reason': 'Video conversion failed. The video may be corrupted or the format is not supported. Check server logs for details.'})
+                    return
+            if save_on_server:
+                self.send_saved_response(session_id, filename)
 
                 return
-            self.send_status_update(session_id, "Processing complete")
+            self.send_status_update(session_id, STATUS_COMPLETE)
 
             time.sleep(0.1)
             self.cleanup_status_queue(session_id)
@@ -871,16 +5320,22 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
 
             self.send_header('X-Session-ID', session_id)
 
-            self.send_header(
-                'Content-Disposition',
-                f'attachment; filename="{ascii_filename}"; filename*=UTF-8\'\'{utf8_filename}'
-            )
+            with open(cache_tiers.locate(result_path), 'rb') as f:
+                output_size = os.fstat(f.fileno()).st_size
 
-            self.end_headers()
+                self.send_header('Content-Length', str(output_size))
+
+                self.send_header(
+                    'Content-Disposition',
+                    f'attachment; filename="{ascii_filename}"; filename*=UTF-8\'\'{utf8_filename}'
+                )
+
+                self.end_headers()
 
-            self.wfile.write(output_data)
+                with self.trace_span('send', bytes=output_size):
+                    shutil.copyfileobj(f, self.wfile)
 
-            logger.info(f"Successfully sent {format_param} file: {filename}")
+            logger.info("Successfully sent %s file: %s", format_param, filename)
 
             return
         url_info = self.parse_twitter_url(url)
@@ -894,61 +5349,90 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
 
             return
         user_id, tweet_id = url_info
-        output_file_name = f"{VIDEO_NAMING_PATTERN.format(userId=user_id, tweetId=tweet_id)}.mp4"
-        ascii_filename = output_file_name.encode('ascii', 'ignore').decode('ascii')
+        with self.trace_span('x-media') as span:
+            assets, error_msg, failed_assets = self.download_tweet_media(url, user_id, tweet_id, session_id)
 
-        utf8_filename = quote(output_file_name)
+            span['assets'] = len(assets)
 
-        cmd = self.build_yt_dlp_cmd('--output', '-', url)
+            span['failed'] = len(failed_assets)
 
-        result = self.run_managed_command(cmd, session_id=session_id, timeout=1800)
+        if self.is_session_cancelled(session_id):
+            self.cleanup_status_queue(session_id)
 
-        if result.returncode == 0:
-            self.send_status_update(session_id, "Processing complete")
+            self.cleanup_download_session(session_id)
 
-            time.sleep(0.1)
+            self.send_json_response(499, {'ok': False, 'reason': 'Download cancelled.'})
 
+            return
+        if not assets:
             self.cleanup_status_queue(session_id)
 
             self.cleanup_download_session(session_id)
 
-            self.send_response(200)
+            self.send_json_response(500, {'ok': False, 'reason': error_msg or 'No media found in this post.'})
 
-            self.send_header('Content-Type', 'video/mp4')
+            return
+        if len(assets) == 1:
+            file_path, output_file_name = assets[0]
+            content_type = X_MEDIA_CONTENT_TYPES.get(file_path.suffix.lower(), 'application/octet-stream')
+        else:
+            file_path = self.bundle_tweet_media(url, assets)
 
-            self.send_header(
-                'Content-Disposition',
-                f'attachment; filename="{ascii_filename}"; filename*=UTF-8\'\'{utf8_filename}'
-            )
+            output_file_name = f"{VIDEO_NAMING_PATTERN.format(userId=user_id, tweetId=tweet_id)}.zip"
+            content_type = 'application/zip'
+        if save_on_server:
+            self.output_path = file_path
 
-            self.end_headers()
+            self.send_saved_response(session_id, output_file_name, {'failed_assets': failed_assets} if failed_assets else None)
 
-            self.wfile.write(result.stdout)
+            return
+        ascii_filename = output_file_name.encode('ascii', 'ignore').decode('ascii')
 
-        else:
-            if self.is_session_cancelled(session_id):
-                self.cleanup_status_queue(session_id)
+        utf8_filename = quote(output_file_name)
 
-                self.cleanup_download_session(session_id)
+        self.send_status_update(session_id, STATUS_COMPLETE)
 
-                self.send_json_response(499, {'ok': False, 'reason': 'Download cancelled.'})
+        time.sleep(0.1)
 
-                return
-            self.cleanup_status_queue(session_id)
+        self.cleanup_status_queue(session_id)
 
-            self.cleanup_download_session(session_id)
+        self.cleanup_download_session(session_id)
+
+        self.send_response(200)
 
-            self.send_json_response(500, {'ok': False, 'reason': self.clean_yt_dlp_error(result.stderr.decode('utf-8', errors='ignore'))})
+        self.send_header('Content-Type', content_type)
+
+        self.send_header('Content-Length', str(file_path.stat().st_size))
+
+        self.send_header(
+            'Content-Disposition',
+            f'attachment; filename="{ascii_filename}"; filename*=UTF-8\'\'{utf8_filename}'
+        )
+
+        if failed_assets:
+            self.send_header('X-StrimDL-Failed-Assets', ','.join(failed_assets))
+
+        self.end_headers()
+
+        with self.trace_span('send', bytes=file_path.stat().st_size), open(cache_tiers.locate(file_path), 'rb') as f:
+            shutil.copyfileobj(f, self.wfile)
+
+        logger.info("Successfully sent X media: %s (%d asset(s))", output_file_name, len(assets))
 
     def do_GET(self) -> None:
         parsed_path = urllib.parse.urlparse(self.path)
 
+        self.reset_job_state()
+
         if parsed_path.path.startswith('/css/') or parsed_path.path.startswith('/image/'):
             return super().do_GET()
 
         if parsed_path.path == '/':
             self.handle_index_page()
 
+        elif parsed_path.path.startswith('/peer/'):
+            self.handle_peer_request(parsed_path)
+
         elif parsed_path.path == '/login.html':
             try:
                 with open(APP_ROOT / 'login.html', 'r', encoding='utf-8') as f:
@@ -969,78 +5453,80 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
         elif parsed_path.path == '/download':
             query = urllib.parse.parse_qs(parsed_path.query)
 
-            self.handle_download_request(query)
-
-        elif parsed_path.path == '/status':
+            if not query.get('session_id', [''])[0]:
+                query['session_id'] = [uuid.uuid4().hex]
+            self.trace_id = query['session_id'][0]
             if not self.is_authenticated():
                 self.send_json_response(401, {'ok': False, 'reason': 'Not authenticated'})
 
                 return
-            query = urllib.parse.parse_qs(parsed_path.query)
-
-            session_id = query.get('session_id', [''])[0]
-            if not session_id:
-                self.send_json_response(400, {'ok': False, 'reason': 'Missing session_id'})
+            job_id = cache_catalog.start_job(
+                query.get('session_id', [''])[0],
+                query.get('url', [''])[0],
+                query.get('format', ['mp4'])[0].lower(),
+                query.get('quality', [''])[0]
+            )
 
-                return
-            self.send_response(200)
+            with drain_coordinator.track_job(), log_scope(session_id=self.trace_id):
+                admitted = False
+                try:
+                    if not self.is_cache_hit(query):
+                        reasons = admission_controller.try_admit()
 
-            self.send_header('Content-Type', 'text/event-stream')
+                        if reasons:
+                            self.send_overloaded_response(reasons)
 
-            self.send_header('Cache-Control', 'no-cache')
+                            return
+                        admitted = True
+                    with self.trace_span('request', url=query.get('url', [''])[0], output_format=query.get('format', ['mp4'])[0]) as span:
+                        self.handle_download_request(query)
 
-            self.send_header('Connection', 'keep-alive')
+                        span['http_status'] = getattr(self, 'response_status', None)
+                finally:
+                    if admitted:
+                        admission_controller.release()
 
-            self.send_header('X-Accel-Buffering', 'no')
-            self.end_headers()
+                    if self.temporary_output:
+                        self.temporary_output.unlink(missing_ok=True)
 
-            try:
-                status_queue = self.get_status_queue(session_id)
+                    cache_catalog.finish_job(job_id, getattr(self, 'response_status', None), self.job_timings)
 
-                timeout_count = 0
-                max_timeout = 300                  
-                try:
-                    self.wfile.write(b": connection established\n\n")
+        elif parsed_path.path == '/status':
+            if not self.is_authenticated():
+                self.send_json_response(401, {'ok': False, 'reason': 'Not authenticated'})
 
-                    self.wfile.flush()
+                return
+            query = urllib.parse.parse_qs(parsed_path.query)
 
-                except (BrokenPipeError, OSError):
-                    logger.info("SSE client disconnected immediately")
+            session_id = query.get('session_id', [''])[0]
+            if not session_id:
+                self.send_json_response(400, {'ok': False, 'reason': 'Missing session_id'})
 
-                    return
-                while timeout_count < max_timeout:
-                    try:
-                        status = status_queue.get(timeout=1)
+                return
+            with log_scope(session_id=session_id, stage='status'):
+                self.send_response(200)
 
-                        timeout_count = 0                          
-                        try:
-                            self.wfile.write(f"data: {json.dumps({'status': status})}\n\n".encode())
+                self.send_header('Content-Type', 'text/event-stream')
 
-                            self.wfile.flush()
+                self.send_header('Cache-Control', 'no-cache')
 
-                        except (BrokenPipeError, OSError):
-                            logger.info("SSE client disconnected")
+                self.send_header('Connection', 'keep-alive')
 
-                            break
-                        if status in ["Processing complete", "Download failed", "Download cancelled"]:
-                            break
-                    except:
-                        timeout_count += 1
-                        try:
-                            self.wfile.write(b": keepalive\n\n")
+                self.send_header('X-Accel-Buffering', 'no')
+                self.end_headers()
 
-                            self.wfile.flush()
+                try:
+                    status_queue = self.get_status_queue(session_id)
 
-                        except (BrokenPipeError, OSError):
-                            logger.info("SSE client disconnected (keepalive)")
+                    self.stream_status_events(status_queue)
 
-                            break
-            except Exception as e:
-                logger.error(f"SSE error: {e}")
+                except Exception as e:
+                    logger.error("SSE error: %s", e)
 
-            finally:
-                pass
-            return
+                finally:
+                    # Der Stream hat keine Länge; erst das Schließen zeigt dem Client sein Ende
+                    self.close_connection = True
+                return
         elif parsed_path.path == '/cache-reset':
             if not self.is_authenticated():
                 self.send_json_response(401, {'ok': False, 'reason': 'Not authenticated'})
@@ -1050,9 +5536,11 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
 
             url = query.get('url', [''])[0]
             if url:
+                cancel_prefetch_job(self.get_media_prefix(url, allow_network=False), 'cache reset')
+
                 self.clear_cache_for_url(url)
 
-                logger.info(f"Cache reset for URL: {url}")
+                logger.info("Cache reset for URL: %s", url)
 
             self.send_json_response(200, {'ok': True})
 
@@ -1067,68 +5555,118 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
 
             self.send_json_response(200, self.check_for_strimdl_update(force))
 
-        elif parsed_path.path == '/yt-qualities':
+        elif parsed_path.path == '/cache':
+            if not self.is_authenticated():
+                self.send_json_response(401, {'ok': False, 'reason': 'Not authenticated'})
+
+                return
             query = urllib.parse.parse_qs(parsed_path.query)
 
-            url = query.get('url', [''])[0]
-            if not url or ('youtube.com' not in url and 'youtu.be' not in url):
-                self.send_json_response(400, {'ok': False, 'reason': 'Invalid YouTube URL'})
+            order = query.get('order', ['recent'])[0]
+            limit_raw = query.get('limit', ['100'])[0]
+            limit = min(int(limit_raw), 1000) if limit_raw.isdigit() else 100
+            self.send_json_response(200, {
+                'ok': True,
+                'summary': cache_catalog.summary(),
+                'tiers': cache_tiers.snapshot(),
+                'artifacts': cache_catalog.list_artifacts(order, limit),
+                'jobs': cache_catalog.recent_jobs(),
+            })
+
+        elif parsed_path.path == '/preview':
+            if not self.is_authenticated():
+                self.send_json_response(401, {'ok': False, 'reason': 'Not authenticated'})
 
                 return
-            parsed_url = urllib.parse.urlparse(url)
+            session_id = urllib.parse.parse_qs(parsed_path.query).get('session_id', [''])[0]
 
-            query_params_url = urllib.parse.parse_qs(parsed_url.query)
+            with log_scope(session_id=session_id, stage='preview'):
+                self.send_preview(session_id)
 
-            if 'list' in query_params_url:
-                self.send_json_response(400, {'ok': False, 'reason': 'Playlist links are not supported. Please use a single video URL.'})
+        elif parsed_path.path == '/admission':
+            if not self.is_authenticated():
+                self.send_json_response(401, {'ok': False, 'reason': 'Not authenticated'})
 
                 return
-            try:
-                result = subprocess.run(
-                    self.build_yt_dlp_cmd('--no-warnings', '--skip-download', '-j', url),
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True,
-                    check=True
-                )
+            self.send_json_response(200, {'ok': True, **admission_controller.snapshot()})
 
-                info = json.loads(result.stdout)
+        elif parsed_path.path == '/traces':
+            if not self.is_authenticated():
+                self.send_json_response(401, {'ok': False, 'reason': 'Not authenticated'})
 
-                qualities: List[Dict[str, Any]] = []
-                for fmt in info.get('formats', []):
-                    fmt_id = fmt.get('format_id')
+                return
+            if not tracer:
+                self.send_json_response(404, {'ok': False, 'reason': 'Tracing is disabled (STRIMDL_TRACE=false)'})
 
-                    height = fmt.get('height')
+                return
+            query = urllib.parse.parse_qs(parsed_path.query)
 
-                    note = fmt.get('format_note') or (f"{height}p" if height else '')
+            trace_id = query.get('session_id', [''])[0] or None
+            if query.get('format', ['jsonl'])[0] == 'chrome':
+                self.send_response(200)
 
-                    ext = fmt.get('ext', '')
+                self.send_header('Content-Type', 'application/json')
 
-                    size = fmt.get('filesize_approx') or 0
-                    if ext == 'mhtml' or 'storyboard' in (note or '').lower():
-                        continue
-                    if height:
-                        if note:
-                            label = f"{note} ({ext})"
-                        else:
-                            label = f"{height}p ({ext})"
-                        if size:
-                            label += f" ~{size//1024//1024}MB"
-                        qualities.append({'format_id': fmt_id, 'label': label})
+                self.send_header('Content-Disposition', 'attachment; filename="strimdl-trace.json"')
 
-                self.send_json_response(200, {'ok': True, 'qualities': qualities})
+                self.end_headers()
 
-            except subprocess.CalledProcessError as e:
-                error_msg = self.clean_yt_dlp_error(e.stderr or '')
+                self.wfile.write(json.dumps(tracer.export_chrome(trace_id)).encode())
 
-                logger.error(f"Failed to fetch YouTube qualities: {error_msg}")
+            else:
+                self.send_response(200)
 
-                self.send_json_response(200, {'ok': False, 'reason': error_msg})
+                self.send_header('Content-Type', 'application/x-ndjson')
 
-            except Exception as e:
-                logger.error(f"Failed to fetch YouTube qualities: {e}")
+                self.end_headers()
+
+                self.wfile.write(''.join(json.dumps(record) + '\n' for record in tracer.read(trace_id)).encode())
+
+        elif parsed_path.path == '/metrics':
+            if not self.is_authenticated():
+                self.send_json_response(401, {'ok': False, 'reason': 'Not authenticated'})
+
+                return
+            self.send_json_response(200, self.collect_metrics())
+
+        elif parsed_path.path == '/yt-qualities':
+            query = urllib.parse.parse_qs(parsed_path.query)
+
+            url = query.get('url', [''])[0]
+            error_msg = self.validate_video_url(url)
+
+            if error_msg:
+                self.send_json_response(400, {'ok': False, 'reason': error_msg})
+
+                return
+            # Die Qualitätsabfrage läuft vor dem Download; ohne mitgegebene session_id bekommt sie eine eigene Kennung
+            session_id = query.get('session_id', [''])[0] or f"qualities-{uuid.uuid4().hex[:12]}"
+            with log_scope(session_id=session_id, stage='yt-qualities'):
+                try:
+                    info, _ = self.fetch_video_info(url)
 
-                self.send_json_response(500, {'ok': False, 'reason': str(e)})
+                    self.send_json_response(200, {'ok': True, 'qualities': self.build_quality_list(info)})
+
+                    # Nur angemeldete Nutzer dürfen Downloads auslösen, auch spekulative
+                    if STRIMDL_PREFETCH and self.is_authenticated():
+                        self.start_prefetch(url, info)
+
+                except subprocess.TimeoutExpired:
+                    logger.error("Timed out fetching YouTube qualities for %s", url)
+
+                    self.send_json_response(200, {'ok': False, 'reason': f'Timed out after {STRIMDL_METADATA_TIMEOUT}s'})
+
+                except subprocess.CalledProcessError as e:
+                    error_msg = self.clean_yt_dlp_error(e.stderr or '')
+
+                    logger.error("Failed to fetch YouTube qualities: %s", error_msg)
+
+                    self.send_json_response(200, {'ok': False, 'reason': error_msg})
+
+                except Exception as e:
+                    logger.error("Failed to fetch YouTube qualities: %s", e)
+
+                    self.send_json_response(500, {'ok': False, 'reason': str(e)})
 
         else:
             self.send_json_response(
@@ -1137,6 +5675,97 @@ class RequestHandler(http.server.SimpleHTTPRequestHandler):
 
             )
 
+def resume_interrupted_downloads() -> None:
+    """Setzt beim letzten Shutdown unterbrochene Downloads im Hintergrund fort (yt-dlp --continue über die .part-Dateien)"""
+    pending = cache_catalog.pending_resumes()
+
+    if not pending:
+        return
+    worker = MediaWorker()
+
+    for entry in pending:
+        if drain_coordinator.draining.is_set():
+            return
+        cache_key = entry['cache_key']
+        if (CACHE_DIR / f"{cache_key}.mp4").exists() or not any(CACHE_DIR.glob(f"{cache_key}.*part*")):
+            cache_catalog.clear_resume(cache_key)
+
+            continue
+        try:
+            with drain_coordinator.track_job(), log_scope(session_id=f"resume-{cache_key}", stage='resume'):
+                logger.info("Resuming interrupted download: %s, quality: %s", entry['url'], entry['quality'])
+
+                worker.reset_job_state()
+
+                worker.download_and_cache_video(entry['url'], entry['quality'], f"resume-{cache_key}", low_priority=True)
+
+        except Exception as e:
+            logger.error("Resuming download of %s failed: %s", entry['url'], e)
+
+def run_worker_supervisor() -> None:
+    """Startet STRIMDL_WORKERS Server-Prozesse auf demselben Port (SO_REUSEPORT) und startet abgestürzte neu.
+
+    SIGTERM/SIGINT werden an alle Worker weitergereicht, die dann jeweils selbst geordnet herunterfahren.
+    """
+    workers: Dict[int, subprocess.Popen] = {}
+
+    started_at: Dict[int, float] = {}
+
+    backoff: Dict[int, float] = {}
+
+    restart_at: Dict[int, float] = {}
+
+    stopping = threading.Event()
+
+    def spawn(index: int) -> subprocess.Popen:
+        env = dict(os.environ, STRIMDL_WORKER_INDEX=str(index))
+
+        started_at[index] = time.monotonic()
+        return subprocess.Popen([sys.executable, str(Path(__file__).resolve()), *sys.argv[1:]], env=env)
+
+    def forward(signum: int, frame: Any) -> None:
+        stopping.set()
+
+        for process in workers.values():
+            if process.poll() is None:
+                process.send_signal(signum)
+
+    signal.signal(signal.SIGTERM, forward)
+
+    signal.signal(signal.SIGINT, forward)
+
+    print(f"Starting {STRIMDL_WORKERS} worker processes on port {PORT}")
+
+    for index in range(STRIMDL_WORKERS):
+        workers[index] = spawn(index)
+
+    while workers:
+        now = time.monotonic()
+
+        for index, process in list(workers.items()):
+            if process.poll() is None:
+                continue
+            if stopping.is_set():
+                del workers[index]
+
+                continue
+            if index not in restart_at:
+                # Stürzt ein Worker kurz nach dem Start wieder ab (z.B. Port belegt), wächst die Wartezeit
+                if now - started_at[index] < WORKER_STABLE_SECONDS:
+                    backoff[index] = min(WORKER_BACKOFF_MAX_SECONDS, backoff.get(index, 0.5) * 2)
+
+                else:
+                    backoff[index] = 1.0
+                restart_at[index] = now + backoff[index]
+                logger.warning("Worker %s exited with code %s, restarting in %.0fs", index, process.returncode, backoff[index])
+
+            if now >= restart_at[index]:
+                del restart_at[index]
+
+                workers[index] = spawn(index)
+
+        time.sleep(0.5)
+
 def get_yt_dlp_version() -> str:
     result = subprocess.run(['yt-dlp', '--version'], capture_output=True, text=True)
 
@@ -1151,45 +5780,98 @@ def update_yt_dlp() -> None:
         output = (result.stdout or result.stderr).strip()
 
         if result.returncode == 0:
-            logger.info(f"yt-dlp update check: {output}")
+            logger.info("yt-dlp update check: %s", output)
 
         else:
-            logger.warning(f"yt-dlp update check failed: {output}")
+            logger.warning("yt-dlp update check failed: %s", output)
 
     except Exception as e:
-        logger.warning(f"yt-dlp update check failed: {e}")
+        logger.warning("yt-dlp update check failed: %s", e)
+
+if __name__ == '__main__':
+    if '--autotune' in sys.argv:
+        print(f"Calibrating x264 presets on this host (minimum speed {STRIMDL_AUTOTUNE_MIN_SPEED}x realtime, CRF {FFMPEG_VIDEO_CRF})")
+
+        tuned = encode_autotune.run()
+
+        for codec, tiers in tuned['choices'].items():
+            print(f"  {codec}: " + ', '.join(f"{height}p={preset}" for height, preset in sorted(tiers.items(), key=lambda item: int(item[0]))))
+
+        print(f"Saved to {STRIMDL_AUTOTUNE_PATH}")
+
+        sys.exit(0)
+
+    encode_autotune.load()
 
-update_yt_dlp()
+    if os.environ.get('STRIMDL_PEERS', '').strip() and not STRIMDL_PEER_TOKEN:
+        logger.warning("STRIMDL_PEERS is set but STRIMDL_PEER_TOKEN is empty, peer cache sharing is disabled")
 
-with ThreadingHTTPServer((HOSTNAME, PORT), RequestHandler) as httpd:
-    print(f"Server läuft auf http://{HOSTNAME}:{PORT}/")
+    if not STRIMDL_WORKER_INDEX:
+        update_yt_dlp()
 
-    print()
+        cache_catalog.reconcile(CACHE_DIR)
 
-    print(f"Benutzung:")
+    if IS_WORKER_SUPERVISOR:
+        run_worker_supervisor()
 
-    print(f"  Web-Interface:")
+        sys.exit(0)
 
-    print(f"    http://{HOSTNAME}:{PORT}/")
+    encode_governor.isolate_server()
 
-    print()
+    bandwidth_governor.start()
 
-    print(f"  Async-Download via URL:")
+    encode_governor.start()
 
-    print(f"    GET http://{HOSTNAME}:{PORT}/download?url=https://...")
+    cache_tiers.start()
 
-    print()
+    threading.Thread(target=session_sweeper, daemon=True).start()
 
-    print(f"Versionen:")
+    if STRIMDL_WORKER_INDEX in ('', '0'):
+        threading.Thread(target=resume_interrupted_downloads, daemon=True).start()
 
-    print(f"  yt-dlp: {get_yt_dlp_version()}")
+    if shared_sessions:
+        shared_sessions.start()
 
-    print(f"  ffmpeg preset: {FFMPEG_VIDEO_PRESET}, CRF: {FFMPEG_VIDEO_CRF}, max height: {FFMPEG_MAX_HEIGHT or 'source'}")
+    signal.signal(signal.SIGTERM, drain_coordinator.begin)
+
+    if STRIMDL_PREFETCH:
+        threading.Thread(target=prefetch_watchdog, daemon=True).start()
+
+    with ThreadingHTTPServer((HOSTNAME, PORT), RequestHandler) as httpd:
+        drain_coordinator.server = httpd
+
+        if STRIMDL_WORKER_INDEX in ('', '0'):
+            print(f"Server läuft auf http://{HOSTNAME}:{PORT}/")
+
+            print()
+
+            print(f"Benutzung:")
+
+            print(f"  Web-Interface:")
+
+            print(f"    http://{HOSTNAME}:{PORT}/")
+
+            print()
+
+            print(f"  Async-Download via URL:")
+
+            print(f"    GET http://{HOSTNAME}:{PORT}/download?url=https://...")
+
+            print()
+
+            print(f"Versionen:")
+
+            print(f"  yt-dlp: {get_yt_dlp_version()}")
+
+            print(f"  ffmpeg preset: {FFMPEG_VIDEO_PRESET}, CRF: {FFMPEG_VIDEO_CRF}, max height: {FFMPEG_MAX_HEIGHT or 'source'}")
+
+            if YTDLP_COOKIES_PATH:
+                cookies_status = "found" if Path(YTDLP_COOKIES_PATH).is_file() else "missing"
+                print(f"  yt-dlp cookies: {YTDLP_COOKIES_PATH} ({cookies_status})")
 
-    if YTDLP_COOKIES_PATH:
-        cookies_status = "found" if Path(YTDLP_COOKIES_PATH).is_file() else "missing"
-        print(f"  yt-dlp cookies: {YTDLP_COOKIES_PATH} ({cookies_status})")
+            if STRIMDL_WORKERS > 1:
+                print(f"  workers: {STRIMDL_WORKERS} (SO_REUSEPORT)")
 
-    print()
+            print()
 
-    httpd.serve_forever()
+        httpd.serve_forever()
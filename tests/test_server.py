@@ -0,0 +1,94 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from queue import Queue
+
+os.environ['STRIMDL_CACHE_DIR'] = tempfile.mkdtemp(prefix='strimdl-test-')
+os.environ.pop('STRIMDL_CACHE_CONVERTED', None)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server
+
+
+class CacheHitTest(unittest.TestCase):
+    """is_cache_hit mit der Standardkonfiguration (STRIMDL_CACHE_CONVERTED=false)"""
+
+    def setUp(self):
+        self.handler = server.RequestHandler.__new__(server.RequestHandler)
+        self.handler.reset_job_state()
+
+        self.query = {'url': ['https://www.youtube.com/watch?v=dQw4w9WgXcQ'], 'format': ['mp4'], 'quality': ['137']}
+        cache_key = self.handler.get_cache_key(self.query['url'][0], '137', allow_network=False)
+        self.source = server.CACHE_DIR / f"{cache_key}.mp4"
+
+        self.source.write_bytes(b'\0' * 1024)
+        server.cache_catalog.record_artifact(self.source, 'source')
+
+    def tearDown(self):
+        self.source.unlink(missing_ok=True)
+
+        server.cache_catalog.remove_prefix(self.source.stem)
+
+    def record_probe(self, codec, height):
+        server.cache_catalog.record_probe(self.source, codec, 10.0, height)
+
+    def test_default_config_does_not_cache_conversions(self):
+        self.assertFalse(server.STRIMDL_CACHE_CONVERTED)
+
+    def test_cached_source_with_stream_copy_is_hit(self):
+        self.record_probe('h264', 720)
+
+        self.assertTrue(self.handler.is_cache_hit(self.query))
+
+    def test_cached_source_needing_encode_is_miss(self):
+        self.record_probe('vp9', 720)
+
+        self.assertFalse(self.handler.is_cache_hit(self.query))
+
+        self.assertFalse(self.handler.is_cache_hit({**self.query, 'format': ['mp3']}))
+
+    def test_unprobed_source_is_miss(self):
+        self.assertFalse(self.handler.is_cache_hit(self.query))
+
+    def test_missing_source_is_miss(self):
+        self.source.unlink()
+
+        self.assertFalse(self.handler.is_cache_hit(self.query))
+
+
+class StatusStreamTest(unittest.TestCase):
+    """/status beendet den Event-Stream nach jeder abschließenden Meldung"""
+
+    def stream(self, *statuses):
+        handler = server.RequestHandler.__new__(server.RequestHandler)
+        handler.wfile = io.BytesIO()
+
+        status_queue = Queue()
+        for status in statuses:
+            status_queue.put(status)
+
+        handler.stream_status_events(status_queue)
+
+        return handler.wfile.getvalue().decode(), status_queue
+
+    def test_saved_on_server_is_terminal(self):
+        self.assertIn(server.STATUS_SAVED, server.TERMINAL_STATUSES)
+
+    def test_stream_ends_after_each_terminal_status(self):
+        for terminal in server.TERMINAL_STATUSES:
+            with self.subTest(status=terminal):
+                output, status_queue = self.stream('Start converting...', terminal, 'Starting download...')
+
+                self.assertIn(terminal, output)
+
+                self.assertNotIn('Starting download...', output)
+
+                self.assertEqual(status_queue.qsize(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()